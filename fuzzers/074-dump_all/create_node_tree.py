@@ -239,7 +239,7 @@ def main():
 
     print('{} Loading node<->wire mapping'.format(datetime.datetime.now()))
     node_lookup = prjxray.lib.NodeLookup()
-    node_lookup_file = os.path.join(args.output_dir, 'nodes.pickle')
+    node_lookup_file = os.path.join(args.output_dir, 'node_lookup')
     if os.path.exists(node_lookup_file):
         node_lookup.load_from_file(node_lookup_file)
     else:
@@ -268,9 +268,9 @@ def main():
 
     print('{} Creating node tree'.format(datetime.datetime.now()))
     nodes = collections.OrderedDict()
-    for node in progressbar.progressbar(sorted(node_lookup.nodes)):
+    for node in progressbar.progressbar(list(node_lookup.get_nodes())):
         nodes[node] = create_ordered_wires_for_node(
-            node, tuple(wire['wire'] for wire in node_lookup.nodes[node]),
+            node, node_lookup.wires_for_node(node),
             tuple(
                 read_node(
                     node, downhill_wires, downhill_wire_node_index[node]
@@ -218,7 +218,18 @@ def read_json5(fname, database_file):
             yield get_prototype_site(site)
 
     site_types = tuple(get_site_types())
-    sites = tuple(get_sites(tile, node_lookup.site_pin_node_to_wires))
+
+    # Look up the wires of all site pin nodes of the tile at once.
+    site_pin_wires = node_lookup.site_pin_nodes_to_wires(
+        tile['tile'], (
+            site_pin['node']
+            for site in tile['sites']
+            for site_pin in site['site_pins']))
+
+    def site_pin_node_to_wires(tile, node):
+        return site_pin_wires.get(node, ())
+
+    sites = tuple(get_sites(tile, site_pin_node_to_wires))
     pips = get_pips(tile['tile'], tile['pips'])
 
     def inner():
@@ -453,7 +464,8 @@ def main():
         node_lookup = prjxray.node_lookup.NodeLookup(database_file)
     else:
         node_lookup = prjxray.node_lookup.NodeLookup(database_file)
-        node_lookup.build_database(nodes=nodes, tiles=tiles)
+        node_lookup.build_database(
+            nodes=nodes, tiles=tiles, processes=multiprocessing.cpu_count())
 
     site_types = {}
 
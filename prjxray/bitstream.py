@@ -8,8 +8,11 @@
 # https://opensource.org/licenses/ISC
 #
 # SPDX-License-Identifier: ISC
+from collections import namedtuple
 import json
 import os
+import struct
+import numpy as np
 from prjxray.util import block_type_s2i
 
 # Break frames into WORD_SIZE bit words.
@@ -90,7 +93,216 @@ def load_bitdata2(f):
     return bitdata
 
 
-def gen_part_base_addrs():
+def unpack_words(words):
+    """ Unpack array of uint32 words to bool array with one entry per bit.
+
+    Bit b of word w (along the last axis) is at index w * WORD_SIZE_BITS + b.
+    """
+    words = np.ascontiguousarray(words, dtype='<u4')
+    return np.unpackbits(
+        words.view(np.uint8), axis=-1, bitorder='little').astype(bool)
+
+
+class Frames(object):
+    """ Frame data of a bitstream backed by a contiguous word array.
+
+    words is a uint32 array of shape (n_frames, FRAME_WORD_COUNT), row i
+    holds the words of frame address addresses[i].  index maps each frame
+    address to its row.
+
+    This holds the same information as the bitdata maps returned by
+    load_bitdata and load_bitdata2, using 4 bytes per word instead of a
+    Python int in a set for every set bit.
+    """
+
+    def __init__(self, addresses=(), words=None):
+        self.addresses = [int(addr) for addr in addresses]
+        self.index = {addr: row for row, addr in enumerate(self.addresses)}
+        assert len(self.index) == len(self.addresses)
+
+        if words is None:
+            words = np.zeros(
+                (len(self.addresses), FRAME_WORD_COUNT), dtype=np.uint32)
+        assert words.shape == (len(self.addresses), FRAME_WORD_COUNT)
+        self.words = words
+
+    @classmethod
+    def from_frames(cls, frames, frame_range=None, mask_ecc=True):
+        """ Create Frames from iterable of (frame address, words).
+
+        Frames written more than once keep the last write, frames without
+        any bit set are dropped (like bitread -z).
+
+        frame_range: If not None, (first, last + 1) range of frame addresses
+                     to keep.
+        mask_ecc: Ignore the ECC bits of each frame, like bitread does by
+                  default.
+        """
+        frame_words = {}
+        for frame, words in frames:
+            if frame_range is not None and not (frame_range[0] <= frame <
+                                                frame_range[1]):
+                continue
+
+            frame_words[frame] = words
+
+        addresses = sorted(frame_words.keys())
+        array = np.zeros((len(addresses), FRAME_WORD_COUNT), dtype=np.uint32)
+        for row, frame in enumerate(addresses):
+            words = frame_words[frame]
+            array[row, :len(words)] = words
+
+        if mask_ecc:
+            array[:, ECC_WORD] &= ECC_MASK
+
+        keep = array.any(axis=1)
+        return cls(
+            [addr for addr, k in zip(addresses, keep) if k], array[keep])
+
+    @classmethod
+    def from_bitdata(cls, bitdata):
+        """ Create Frames from bitdata, see load_bitdata. """
+        addresses = sorted(bitdata.keys())
+        frames = cls(addresses)
+        for row, frame in enumerate(addresses):
+            for bitidx in bitdata[frame][1]:
+                frames.words[row, bitidx // WORD_SIZE_BITS] |= np.uint32(
+                    1 << (bitidx % WORD_SIZE_BITS))
+
+        return frames
+
+    @classmethod
+    def load_bits(cls, f):
+        """ Create Frames from a .bits file, see load_bitdata. """
+        frame_idx = []
+        word_idx = []
+        bit_idx = []
+        for line in f:
+            line = line.split("_")
+            frame_idx.append(int(line[1], 16))
+            word_idx.append(int(line[2], 10))
+            bit_idx.append(int(line[3], 10))
+
+        frame_idx = np.array(frame_idx, dtype=np.int64)
+        addresses, rows = np.unique(frame_idx, return_inverse=True)
+
+        frames = cls(addresses)
+        np.bitwise_or.at(
+            frames.words, (rows, np.array(word_idx, dtype=np.int64)),
+            np.left_shift(1, np.array(bit_idx, dtype=np.uint32)).astype(
+                np.uint32))
+
+        return frames
+
+    @classmethod
+    def empty_like(cls, other):
+        """ Create Frames with the frame addresses of other and no bits set.
+        """
+        return cls(other.addresses)
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def __contains__(self, frame):
+        return frame in self.index
+
+    def __iter__(self):
+        return iter(self.addresses)
+
+    def frame_words(self, frame):
+        """ Returns words of frame, or None if frame is not present. """
+        row = self.index.get(frame)
+        if row is None:
+            return None
+
+        return self.words[row]
+
+    def get_bit(self, frame, bitidx):
+        """ Returns True if bit bitidx (word * WORD_SIZE_BITS + bit) is set.
+        """
+        row = self.index.get(frame)
+        if row is None:
+            return False
+
+        word = int(self.words[row, bitidx // WORD_SIZE_BITS])
+        return bool((word >> (bitidx % WORD_SIZE_BITS)) & 1)
+
+    def set_bit(self, frame, bitidx):
+        """ Sets bit bitidx of frame, frame must be present. """
+        self.words[self.index[frame], bitidx // WORD_SIZE_BITS] |= np.uint32(
+            1 << (bitidx % WORD_SIZE_BITS))
+
+    def nonzero_words(self, frame):
+        """ Returns bool array of FRAME_WORD_COUNT, True for words with bits.
+        """
+        row = self.index.get(frame)
+        if row is None:
+            return np.zeros(FRAME_WORD_COUNT, dtype=bool)
+
+        return self.words[row] != 0
+
+    def frame_bits(self, frame):
+        """ Returns sorted array of bit indices set in frame. """
+        words = self.frame_words(frame)
+        if words is None:
+            return np.zeros(0, dtype=np.int64)
+
+        return np.flatnonzero(unpack_words(words))
+
+    def window(self, base_address, frames, offset, words):
+        """ Returns uint32 array (frames, words) of words in a tile.
+
+        Frames that are not present read as zero, as do words outside of
+        the frame (offset may be negative for aliased tiles).
+        """
+        window = np.zeros((frames, words), dtype=np.uint32)
+        start = min(max(offset, 0), FRAME_WORD_COUNT)
+        end = min(max(offset + words, start), FRAME_WORD_COUNT)
+        if start == end:
+            return window
+
+        columns = slice(start - offset, end - offset)
+        for frame_offset in range(frames):
+            row = self.index.get(base_address + frame_offset)
+            if row is not None:
+                window[frame_offset, columns] = self.words[row, start:end]
+
+        return window
+
+    def iter_window_bits(self, base_address, frames, offset, words):
+        """ Yields (frame offset, bit offset) of bits set in a tile.
+
+        Bit offsets are relative to the first bit of word offset, like the
+        bits in segbits files.
+        """
+        window_bits = unpack_words(
+            self.window(base_address, frames, offset, words))
+        for frame_offset, bit in zip(*np.nonzero(window_bits)):
+            yield int(frame_offset), int(bit)
+
+    def iter_bits(self):
+        """ Yields (frame, word index, bit index) of all set bits, in order.
+        """
+        for row, frame in enumerate(self.addresses):
+            for bitidx in np.flatnonzero(unpack_words(self.words[row])):
+                yield (
+                    frame, int(bitidx) // WORD_SIZE_BITS,
+                    int(bitidx) % WORD_SIZE_BITS)
+
+    def to_bitdata(self):
+        """ Returns bitdata map, see load_bitdata. """
+        bitdata = dict()
+        for frame, wordidx, bitidx in self.iter_bits():
+            if frame not in bitdata:
+                bitdata[frame] = set(), set()
+
+            bitdata[frame][0].add(wordidx)
+            bitdata[frame][1].add(wordidx * WORD_SIZE_BITS + bitidx)
+
+        return bitdata
+
+
+def gen_part_base_addrs(part_json=None):
     """
     Return (block_type, top_bottom, cfg_row, cfg_col, frame_count)
     Where:
@@ -105,8 +317,10 @@ def gen_part_base_addrs():
     ('BLOCK_RAM', 'top', 0, 1, 128)
     ('CLB_IO_CLK', 'top', 1, 34, 28)
     """
-    fn = os.getenv("XRAY_PART_YAML").replace(".yaml", ".json")
-    j = json.load(open(fn, "r"))
+    if part_json is None:
+        part_json = os.getenv("XRAY_PART_YAML").replace(".yaml", ".json")
+    with open(part_json, "r") as f:
+        j = json.load(f)
     for tbk, tbv in j["global_clock_regions"].items():
         for rowk, rowv in tbv["rows"].items():
             for busk, busv in rowv["configuration_buses"].items():
@@ -125,3 +339,241 @@ def addr_bits2word(block_type, top_bottom, cfg_row, cfg_col, minor_addr):
     ret |= cfg_col << 7
     ret |= minor_addr
     return ret
+
+
+def get_part_frame_addresses(part_json):
+    """ Return sorted list of valid frame addresses of part.
+
+    part_json: part.json file from the database, see gen_part_base_addrs.
+
+    The configuration logic walks frames in numerical address order when
+    auto-incrementing FAR, so the sorted list is also the write order.
+    """
+    addrs = []
+    for block_type, top_bottom, cfg_row, cfg_col, frame_count in (
+            gen_part_base_addrs(part_json)):
+        for minor_addr in range(frame_count):
+            addrs.append(
+                addr_bits2word(
+                    block_type, top_bottom, cfg_row, cfg_col, minor_addr))
+
+    return sorted(addrs)
+
+
+# Packet level decoding of 7-series bitstreams, see UG470 chapter 5 and
+# lib/include/prjxray/xilinx/configuration.h.
+
+SYNC_WORD = 0xAA995566
+
+# Configuration packet header types.
+PACKET_TYPE_1 = 1
+PACKET_TYPE_2 = 2
+
+# Configuration packet opcodes.
+OPCODE_NOP = 0
+OPCODE_READ = 1
+OPCODE_WRITE = 2
+
+# Configuration registers used when extracting frames.
+REG_FAR = 0x01
+REG_FDRI = 0x02
+REG_CMD = 0x04
+REG_MASK = 0x06
+REG_MFWR = 0x0a
+REG_IDCODE = 0x0c
+REG_CTL1 = 0x18
+
+# CMD register values.
+CMD_WCFG = 0x1
+CMD_MFW = 0x2
+
+# The ECC word of each frame, bits [12:0] of that word hold the frame ECC.
+ECC_WORD = 50
+ECC_MASK = 0xffffe000
+
+ConfigurationPacket = namedtuple(
+    'ConfigurationPacket', 'header_type opcode address data')
+
+
+def bitstream_words(data):
+    """ Return configuration words following the sync word in bitstream data.
+
+    data: bytes of a .bit (with header) or .bin bitstream.
+    """
+    sync_pos = data.find(struct.pack('>I', SYNC_WORD))
+    if sync_pos == -1:
+        raise ValueError("Input doesn't look like a bitstream")
+
+    start = sync_pos + 4
+    count = (len(data) - start) // 4
+
+    return struct.unpack_from('>{}I'.format(count), data, start)
+
+
+def gen_configuration_packets(words):
+    """ Yield ConfigurationPacket's from configuration words.
+
+    Type 2 packets inherit the register address of the previous packet.
+    """
+    idx = 0
+    address = None
+    while idx < len(words):
+        header = words[idx]
+        header_type = header >> 29
+
+        if header_type == 0:
+            # Zero padding emitted with BITSTREAM.GENERAL.DEBUGBITSTREAM.
+            idx += 1
+            continue
+        elif header_type == PACKET_TYPE_1:
+            opcode = (header >> 27) & 0x3
+            address = (header >> 13) & 0x3fff
+            word_count = header & 0x7ff
+        elif header_type == PACKET_TYPE_2:
+            opcode = (header >> 27) & 0x3
+            word_count = header & 0x7ffffff
+        else:
+            raise ValueError(
+                'Invalid packet header 0x{:08x} at word {}'.format(
+                    header, idx))
+
+        if idx + 1 + word_count > len(words):
+            # Truncated packet, same as bitread ignore it.
+            return
+
+        yield ConfigurationPacket(
+            header_type=header_type,
+            opcode=opcode,
+            address=address,
+            data=words[idx + 1:idx + 1 + word_count],
+        )
+
+        idx += 1 + word_count
+
+
+def gen_frames_from_packets(packets, frame_addresses, idcode=None):
+    """ Yield (frame address, words) for each frame written by packets.
+
+    packets: Iterable of ConfigurationPacket.
+    frame_addresses: Sorted list of valid frame addresses, see
+                     get_part_frame_addresses.
+    idcode: If not None, raise ValueError if the bitstream IDCODE differs.
+
+    Handles FDRI writes (including auto-incrementing block writes, which
+    have 2 frames of padding between rows) and multi-frame writes (MFWR)
+    used by compressed bitstreams, which copy the last frame written
+    through FDRI to the frame address in FAR.
+
+    Frames may be yielded more than once, the last write wins.
+    """
+    next_address = {}
+    for addr, next_addr in zip(frame_addresses, frame_addresses[1:]):
+        next_address[addr] = next_addr
+
+    def row_key(addr):
+        # block type, top/bottom and row
+        return addr >> 17
+
+    command_register = 0
+    frame_address_register = 0
+    mask_register = 0
+    ctl1_register = 0
+
+    start_new_write = False
+    current_frame_address = 0
+    last_frame = None
+
+    for packet in packets:
+        if packet.opcode != OPCODE_WRITE or len(packet.data) < 1:
+            continue
+
+        if packet.address == REG_MASK:
+            mask_register = packet.data[0]
+        elif packet.address == REG_CTL1:
+            ctl1_register = packet.data[0] & mask_register
+        elif packet.address == REG_CMD:
+            command_register = packet.data[0]
+            if command_register == CMD_WCFG:
+                start_new_write = True
+        elif packet.address == REG_IDCODE:
+            if idcode is not None and packet.data[0] != idcode:
+                raise ValueError(
+                    'Bitstream IDCODE 0x{:08x} does not match part 0x{:08x}'.
+                    format(packet.data[0], idcode))
+        elif packet.address == REG_FAR:
+            frame_address_register = packet.data[0]
+
+            # Writing FAR re-executes CMD, unless bit 21 of CTL1 is set.
+            if not (ctl1_register >> 21) & 1 and command_register == CMD_WCFG:
+                start_new_write = True
+        elif packet.address == REG_FDRI:
+            if start_new_write:
+                current_frame_address = frame_address_register
+                start_new_write = False
+
+            idx = 0
+            while idx < len(packet.data):
+                last_frame = packet.data[idx:idx + FRAME_WORD_COUNT]
+                yield current_frame_address, last_frame
+
+                if current_frame_address not in next_address:
+                    break
+
+                next_frame_address = next_address[current_frame_address]
+                if row_key(next_frame_address) != row_key(
+                        current_frame_address):
+                    idx += 2 * FRAME_WORD_COUNT
+
+                current_frame_address = next_frame_address
+                idx += FRAME_WORD_COUNT
+        elif packet.address == REG_MFWR:
+            if command_register == CMD_MFW and last_frame is not None:
+                yield frame_address_register, last_frame
+
+
+def frames_to_bitdata(frames, frame_range=None, mask_ecc=True):
+    """ Convert iterable of (frame address, words) to bitdata.
+
+    See load_bitdata for details on bitdata structure, and Frames.from_frames
+    for the arguments.
+    """
+    return Frames.from_frames(
+        frames, frame_range=frame_range, mask_ecc=mask_ecc).to_bitdata()
+
+
+def load_bitstream_frames(f, frame_addresses, idcode=None):
+    """ Return list of (frame address, words) from a binary bitstream file.
+
+    f: Binary file object of a .bit or .bin file.
+    """
+    words = bitstream_words(f.read())
+
+    return list(
+        gen_frames_from_packets(
+            gen_configuration_packets(words), frame_addresses, idcode=idcode))
+
+
+def load_frm_frames(f):
+    """ Return list of (frame address, words) from a .frm file.
+
+    .frm files are written by fasm2frames, one frame per line:
+    0x00020500 0x00000000,0x00000000,...
+    """
+    frames = []
+    for l in f:
+        l = l.strip()
+        if not l:
+            continue
+
+        addr, words = l.split(' ')
+        frames.append(
+            (int(addr, 0), tuple(int(word, 0) for word in words.split(','))))
+
+    return frames
+
+
+def parse_frame_range(frame_range):
+    """ Convert bitread style "first:last" frame range to (first, last + 1).
+    """
+    first, last = frame_range.split(':')
+    return int(first, 0), int(last, 0) + 1
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020  The Project X-Ray Authors.
+#
+# Use of this source code is governed by a ISC-style
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/ISC
+#
+# SPDX-License-Identifier: ISC
+''' Columnar segdata format.
+
+The text segdata format written by Segmaker (see segmaker.py) lists each
+segment followed by its bits and tags, one per line.  The columnar format
+stores the same data as arrays in a NumPy .npz file:
+
+- segs: Segment names.
+- bit_names, tag_names: Sorted names of the bits and tags, bits and tags are
+  referenced by their index in these arrays.
+- bit_ptr, bit_ids: The bits of segment i are
+  bit_ids[bit_ptr[i]:bit_ptr[i + 1]].
+- tag_ptr, tag_ids, tag_values: The tags of segment i and their values are
+  tag_ids[tag_ptr[i]:tag_ptr[i + 1]] and tag_values[...].
+
+Columnar files are named like text files, with an .npz extension.  Tools
+reading segdata text files (segmatch, maskmerge) do not read them.
+'''
+from collections import namedtuple
+
+import numpy as np
+
+from prjxray.util import OpenSafeFile
+
+# Arrays of a columnar segdata file, see module documentation.
+ColumnarSegdata = namedtuple(
+    'ColumnarSegdata',
+    'segs bit_names tag_names bit_ptr bit_ids tag_ptr tag_ids tag_values')
+
+
+def from_segments(segments):
+    ''' Returns ColumnarSegdata of an iterable of (segname, bits, tags).
+
+    bits is an iterable of bit names and tags a list of (tag name, value).
+    Segments, and the bits and tags of each segment, keep their order.  A bit
+    listed twice in a segment is stored once, and a tag listed twice keeps its
+    last value.
+    '''
+    segs = []
+    seg_bits = []
+    seg_tags = []
+    for segname, bits, tags in segments:
+        segs.append(segname)
+        seg_bits.append(list(dict.fromkeys(bits)))
+        seg_tags.append(list(dict(tags).items()))
+
+    bit_names = sorted(set(bit for bits in seg_bits for bit in bits))
+    tag_names = sorted(set(tag for tags in seg_tags for tag, _ in tags))
+    bit_index = dict((bit, i) for i, bit in enumerate(bit_names))
+    tag_index = dict((tag, i) for i, tag in enumerate(tag_names))
+
+    def make_ptr(lists):
+        ptr = np.zeros(len(lists) + 1, dtype=np.int64)
+        np.cumsum([len(l) for l in lists], out=ptr[1:])
+        return ptr
+
+    return ColumnarSegdata(
+        segs=np.array(segs, dtype=str),
+        bit_names=np.array(bit_names, dtype=str),
+        tag_names=np.array(tag_names, dtype=str),
+        bit_ptr=make_ptr(seg_bits),
+        bit_ids=np.array(
+            [bit_index[bit] for bits in seg_bits for bit in bits],
+            dtype=np.int32),
+        tag_ptr=make_ptr(seg_tags),
+        tag_ids=np.array(
+            [tag_index[tag] for tags in seg_tags for tag, _ in tags],
+            dtype=np.int32),
+        tag_values=np.array(
+            [value for tags in seg_tags for _, value in tags], dtype=np.int8),
+    )
+
+
+def iter_text_segments(fp):
+    ''' Yields (segname, bits, tags) of a segdata text file.
+
+    Lines before the first segment are ignored.
+    '''
+    segment = None
+    for line in fp:
+        fields = line.split()
+        if not fields:
+            continue
+
+        if fields[0] == "seg":
+            if segment is not None:
+                yield segment
+            segment = (fields[1], [], [])
+        elif segment is None:
+            continue
+        elif fields[0] == "bit":
+            segment[1].append(fields[1])
+        elif fields[0] == "tag":
+            segment[2].append((fields[1], int(fields[2])))
+
+    if segment is not None:
+        yield segment
+
+
+def read_text(file_name):
+    ''' Returns ColumnarSegdata of a segdata text file. '''
+    with OpenSafeFile(file_name, "r") as fp:
+        return from_segments(iter_text_segments(fp))
+
+
+def write_text(file_name, segdata):
+    ''' Writes ColumnarSegdata to a segdata text file. '''
+    with OpenSafeFile(file_name, "w") as fp:
+        for segname, bits, tags in iter_segments(segdata):
+            print("seg %s" % segname, file=fp)
+            for bit in bits:
+                print("bit %s" % bit, file=fp)
+            for tag, value in tags:
+                print("tag %s %d" % (tag, value), file=fp)
+
+
+def read(file_name):
+    ''' Returns ColumnarSegdata stored by write in file_name. '''
+    with np.load(file_name) as data:
+        return ColumnarSegdata(
+            *(data[name] for name in ColumnarSegdata._fields))
+
+
+def write(file_name, segdata):
+    ''' Stores ColumnarSegdata in file_name, a compressed .npz file. '''
+    with OpenSafeFile(file_name, "wb") as fp:
+        np.savez_compressed(fp, **segdata._asdict())
+
+
+def iter_segments(segdata):
+    ''' Yields (segname, bits, tags) of each segment of ColumnarSegdata. '''
+    bit_names = segdata.bit_names.tolist()
+    tag_names = segdata.tag_names.tolist()
+    bit_ptr = segdata.bit_ptr.tolist()
+    bit_ids = segdata.bit_ids.tolist()
+    tag_ptr = segdata.tag_ptr.tolist()
+    tag_ids = segdata.tag_ids.tolist()
+    tag_values = segdata.tag_values.tolist()
+
+    for i, segname in enumerate(segdata.segs.tolist()):
+        bits = [bit_names[b] for b in bit_ids[bit_ptr[i]:bit_ptr[i + 1]]]
+        tags = [
+            (tag_names[t], v) for t, v in zip(
+                tag_ids[tag_ptr[i]:tag_ptr[i + 1]],
+                tag_values[tag_ptr[i]:tag_ptr[i + 1]])
+        ]
+        yield segname, bits, tags
+
+
+def column_map(names, columns):
+    ''' Returns array mapping each of names to its index in columns, or -1.
+    '''
+    index = dict((name, i) for i, name in enumerate(columns))
+    return np.array(
+        [index.get(name, -1) for name in names.tolist()], dtype=np.int64)
+
+
+def index_arrays(segdata, all_tags, all_bits, tagfilter=lambda tag: True):
+    ''' Returns index arrays of ColumnarSegdata over all_tags and all_bits.
+
+    Returns (n_rows, bit_rows, bit_cols, tag_rows, tag_cols, tag_values), the
+    fields of lms_solver.SegdataMatrix.  Rows are the segments with at least
+    one tag accepted by tagfilter, in order, as returned by
+    lms_solver.load_data.  Columns are indices in all_tags and all_bits, bits
+    and tags which are not in them are skipped.
+    '''
+    bit_map = column_map(segdata.bit_names, all_bits)
+    tag_map = column_map(segdata.tag_names, all_tags)
+    tag_ok = np.array(
+        [tagfilter(tag) for tag in segdata.tag_names.tolist()], dtype=np.bool_)
+
+    n_segs = len(segdata.segs)
+    tag_segs = np.repeat(
+        np.arange(n_segs, dtype=np.int64), np.diff(segdata.tag_ptr))
+
+    # Row of each segment, -1 for segments without accepted tags.
+    has_tags = np.zeros(n_segs, dtype=np.bool_)
+    has_tags[tag_segs[tag_ok[segdata.tag_ids]]] = True
+    rows = np.where(has_tags, np.cumsum(has_tags) - 1, -1)
+
+    bit_rows = np.repeat(rows, np.diff(segdata.bit_ptr))
+    bit_cols = bit_map[segdata.bit_ids]
+    bit_keep = (bit_rows >= 0) & (bit_cols >= 0)
+
+    tag_rows = rows[tag_segs]
+    tag_cols = tag_map[segdata.tag_ids]
+    tag_keep = (tag_rows >= 0) & (tag_cols >= 0) & tag_ok[segdata.tag_ids]
+
+    return (
+        int(np.count_nonzero(has_tags)), bit_rows[bit_keep],
+        bit_cols[bit_keep], tag_rows[tag_keep], tag_cols[tag_keep],
+        segdata.tag_values[tag_keep].astype(np.int64))
@@ -10,9 +10,18 @@
 # SPDX-License-Identifier: ISC
 
 from collections import namedtuple
+
+import numpy as np
+
 WireInGrid = namedtuple('WireInGrid', 'tile grid_x grid_y wire')
 Connection = namedtuple('Connection', 'wire_a wire_b')
 
+# Arrays of connections from Connections.get_connection_arrays.  Tiles are
+# indices in Connections.tiles, wires indices in the
+# Connections.tile_type_wires of the tile type.
+ConnectionArrays = namedtuple(
+    'ConnectionArrays', 'tile_a wire_a tile_b wire_b')
+
 
 class Connections(object):
     def __init__(self, tilegrid, tileconn, tile_wires):
@@ -44,6 +53,81 @@ class Connections(object):
                 self.potential_connections[key].append(
                     (grid_deltas, tile_types[1], pairs[1]))
 
+        self._build_connection_rules(tileconn)
+
+    def _build_connection_rules(self, tileconn):
+        """ Number tiles and wires, and compile tileconn for
+        get_connection_arrays. """
+        self.tiles = list(self.grid.keys())
+
+        self.tile_type_wires = {}
+        tile_type_wire_index = {}
+        for tile_type, wires in self.tile_wires.items():
+            self.tile_type_wires[tile_type] = list(wires)
+            tile_type_wire_index[tile_type] = dict(
+                (wire, idx) for idx, wire in enumerate(wires))
+
+        # Wire pkeys of tiles[i] are [tile_wire_base[i], tile_wire_base[i + 1])
+        tile_types = [self.grid[tile]['type'] for tile in self.tiles]
+        self.tile_wire_base = np.zeros(len(self.tiles) + 1, dtype=np.int64)
+        np.cumsum(
+            [len(self.tile_type_wires[tile_type]) for tile_type in tile_types],
+            out=self.tile_wire_base[1:])
+
+        self.tile_type_index = dict(
+            (tile_type, idx)
+            for idx, tile_type in enumerate(sorted(self.tile_wires)))
+        self.tile_type_of_tile = np.array(
+            [self.tile_type_index[tile_type] for tile_type in tile_types],
+            dtype=np.int32)
+        self.tiles_of_type = {}
+        for tile_type, idx in self.tile_type_index.items():
+            self.tiles_of_type[tile_type] = np.flatnonzero(
+                self.tile_type_of_tile == idx)
+
+        # Dense map of grid coordinates (relative to the smallest
+        # coordinate) to tile index, -1 where there is no tile.
+        self.grid_x = np.array(
+            [self.grid[tile]['grid_x'] for tile in self.tiles], dtype=np.int64)
+        self.grid_y = np.array(
+            [self.grid[tile]['grid_y'] for tile in self.tiles], dtype=np.int64)
+        self.grid_origin = (0, 0)
+        if len(self.tiles) > 0:
+            self.grid_origin = (self.grid_x.min(), self.grid_y.min())
+
+        x = self.grid_x - self.grid_origin[0]
+        y = self.grid_y - self.grid_origin[1]
+        self.coord_to_tile_index = np.full(
+            (x.max(initial=-1) + 1, y.max(initial=-1) + 1), -1, dtype=np.int64)
+        self.coord_to_tile_index[x, y] = np.arange(len(self.tiles))
+
+        # List of (tile type a, tile type b, grid delta, wire a indices,
+        # wire b indices).  Wire pairs naming wires missing from the tile
+        # types cannot be connected and are dropped.
+        self.connection_rules = []
+        for conn in tileconn:
+            tile_type_a, tile_type_b = conn['tile_types']
+            if tile_type_a not in tile_type_wire_index or (
+                    tile_type_b not in tile_type_wire_index):
+                continue
+
+            wire_a_index = tile_type_wire_index[tile_type_a]
+            wire_b_index = tile_type_wire_index[tile_type_b]
+            wire_pairs = [
+                (wire_a_index[wire_a], wire_b_index[wire_b])
+                for wire_a, wire_b in conn['wire_pairs']
+                if wire_a in wire_a_index and wire_b in wire_b_index
+            ]
+            if len(wire_pairs) == 0:
+                continue
+
+            wires_a, wires_b = zip(*wire_pairs)
+            self.connection_rules.append(
+                (
+                    tile_type_a, tile_type_b, tuple(conn['grid_deltas']),
+                    np.array(wires_a, dtype=np.int64),
+                    np.array(wires_b, dtype=np.int64)))
+
     def all_possible_connections_from(self, wire_in_grid):
         tile_type = self.coord_to_tile_type[(
             wire_in_grid.grid_x, wire_in_grid.grid_y)]
@@ -82,3 +166,42 @@ class Connections(object):
                 for potential_connection in self.all_possible_connections_from(
                         wire_in_grid):
                     yield potential_connection
+
+    def get_connection_arrays(self):
+        """ Yields ConnectionArrays of all connections present in the grid.
+
+        Unlike get_connections, the tile pairs of each tileconn rule are
+        found at once, and connections are returned as integer arrays.
+        """
+        for tile_type_a, tile_type_b, grid_deltas, wires_a, wires_b in (
+                self.connection_rules):
+            tiles_a = self.tiles_of_type[tile_type_a]
+            x = self.grid_x[tiles_a] + grid_deltas[0] - self.grid_origin[0]
+            y = self.grid_y[tiles_a] + grid_deltas[1] - self.grid_origin[1]
+
+            in_grid = (x >= 0) & (x < self.coord_to_tile_index.shape[0]) & (
+                y >= 0) & (
+                    y < self.coord_to_tile_index.shape[1])
+            tiles_a = tiles_a[in_grid]
+            tiles_b = self.coord_to_tile_index[x[in_grid], y[in_grid]]
+
+            match = tiles_b >= 0
+            match[match] = self.tile_type_of_tile[tiles_b[match]] == (
+                self.tile_type_index[tile_type_b])
+            tiles_a = tiles_a[match]
+            tiles_b = tiles_b[match]
+            if len(tiles_a) == 0:
+                continue
+
+            yield ConnectionArrays(
+                tile_a=np.repeat(tiles_a, len(wires_a)),
+                wire_a=np.tile(wires_a, len(tiles_a)),
+                tile_b=np.repeat(tiles_b, len(wires_b)),
+                wire_b=np.tile(wires_b, len(tiles_b)))
+
+    def wire_pkeys(self, tiles, wires):
+        """ Returns wire pkeys of tile and wire indices arrays.
+
+        Wire pkeys number all wires in the grid, see tile_wire_base.
+        """
+        return self.tile_wire_base[tiles] + wires
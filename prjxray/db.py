@@ -16,8 +16,9 @@ from prjxray import tile
 from prjxray import tile_segbits
 from prjxray import site_type
 from prjxray import connections
-from prjxray.node_model import NodeModel
-from prjxray.util import get_fabric_for_part
+from prjxray import db_snapshot
+from prjxray.node_model import NodeModel, get_node_model
+from prjxray.util import OpenSafeFile, get_fabric_for_part
 
 
 def get_available_databases(prjxray_root):
@@ -38,11 +39,14 @@ def get_available_databases(prjxray_root):
 
 
 class Database(object):
-    def __init__(self, db_root, part):
+    def __init__(self, db_root, part, use_snapshot=False):
         """ Create project x-ray Database at given db_root.
 
     db_root: Path to directory containing settings.sh, *.db, tilegrid.json and
              tileconn.json
+    use_snapshot: If True, restore the grid, tile segbits and required
+                  features from a binary snapshot (see db_snapshot), creating
+                  or refreshing the snapshot if it is missing or stale.
 
     """
         self.db_root = db_root
@@ -57,10 +61,29 @@ class Database(object):
 
         self.tile_types = {}
         self.tile_segbits = {}
+        self.tile_ppips = {}
         self.site_types = {}
 
         self.required_features = {}
 
+        self.tile_types_obj = {}
+        self._grid = None
+
+        if use_snapshot:
+            snapshot = db_snapshot.load_snapshot(
+                self.db_root, self.part, self.fabric)
+            if snapshot is not None:
+                self._restore_snapshot(snapshot)
+                return
+
+        self._read_db_root()
+
+        if use_snapshot:
+            db_snapshot.save_snapshot(
+                self.db_root, self.part, self.fabric, self._make_snapshot())
+
+    def _read_db_root(self):
+        """ Index the files present in db_root. """
         for f in os.listdir(self.db_root):
             if f.endswith('.json') and f.startswith('tile_type_'):
                 tile_type = f[len('tile_type_'):-len('.json')].lower()
@@ -116,7 +139,31 @@ class Database(object):
 
                 self.required_features[self.part] = set(features)
 
-        self.tile_types_obj = {}
+    def _make_snapshot(self):
+        """ Fully construct the grid, its segment map and the tile segbits,
+        and return the state to be stored in a snapshot. """
+        grid = self.grid()
+        grid.get_segment_map()
+        for tile_type in self.tile_types:
+            self.get_tile_segbits(tile_type).compile()
+
+        return {
+            'tile_types': self.tile_types,
+            'site_types': self.site_types,
+            'required_features': self.required_features,
+            'tilegrid': self.tilegrid,
+            'grid': grid,
+            'tile_segbits': self.tile_segbits,
+        }
+
+    def _restore_snapshot(self, snapshot):
+        self.tile_types = snapshot['tile_types']
+        self.site_types = snapshot['site_types']
+        self.required_features = snapshot['required_features']
+        self.tilegrid = snapshot['tilegrid']
+        self.tile_segbits = snapshot['tile_segbits']
+        self._grid = snapshot['grid']
+        self._grid.db = self
 
     def get_tile_types(self):
         """ Return list of tile types """
@@ -151,10 +198,22 @@ class Database(object):
                                    'node_wires.json')) as f:
                 self.node_wires = json.load(f)
 
-    def grid(self):
-        """ Return Grid object for database. """
-        self._read_tilegrid()
-        return grid.Grid(self, self.tilegrid)
+    def grid(self, use_cache=False):
+        """ Return Grid object for database.
+
+        use_cache - If True, load the grid and its GridIndex from the cache
+                    directory (see grid.get_grid), building and storing them
+                    if they are missing or stale.
+
+        """
+        if self._grid is None:
+            if use_cache:
+                self._grid = grid.get_grid(self)
+            else:
+                self._read_tilegrid()
+                self._grid = grid.Grid(self, self.tilegrid)
+
+        return self._grid
 
     def _read_tile_types(self):
         if self.tile_types_json is None:
@@ -178,7 +237,7 @@ class Database(object):
         return connections.Connections(
             self.tilegrid, self.tileconn, self._get_tile_wires())
 
-    def node_model(self, progressbar=lambda x: x):
+    def node_model(self, progressbar=lambda x: x, use_cache=False):
         """ Get node module for specified part.
 
         progressbar - Should be a function that takes an iteraable, and
@@ -193,7 +252,14 @@ class Database(object):
                         db = Database(...)
                         node_model = db.node_model(progressbar.progressbar)
 
+        use_cache - If True, load the node model from the cache directory
+                    (see node_model.get_node_model), building and storing it
+                    if it is missing or stale.
+
         """
+        if use_cache:
+            return get_node_model(self, progressbar)
+
         self._read_node_wires()
 
         return NodeModel(
@@ -219,6 +285,21 @@ class Database(object):
 
         return self.tile_segbits[tile_type]
 
+    def get_tile_ppips(self, tile_type):
+        """ Return map of pseudo pip feature to PsuedoPipType of tile_type.
+        """
+        if tile_type not in self.tile_ppips:
+            tile_db = self.tile_types[tile_type.upper()]
+
+            ppips = {}
+            if tile_db.ppips is not None:
+                with OpenSafeFile(tile_db.ppips) as f:
+                    ppips = tile_segbits.read_ppips(f)
+
+            self.tile_ppips[tile_type] = ppips
+
+        return self.tile_ppips[tile_type]
+
     def get_required_fasm_features(self, part=None):
         """
         Assembles a set of required fasm features for given part. Returns a list
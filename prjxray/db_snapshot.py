@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020  The Project X-Ray Authors.
+#
+# Use of this source code is governed by a ISC-style
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/ISC
+#
+# SPDX-License-Identifier: ISC
+""" Binary snapshot of a fully constructed Database.
+
+Constructing a Database, its Grid and the TileSegbits of each tile type
+requires listing the database directory and parsing tilegrid.json and every
+segbits file.  A snapshot stores the result of that work in one pickle file in
+the cache directory (see util.get_cache_dir).
+
+Snapshots are keyed on the database root, the part and the size and
+modification time of every source file, so a snapshot is automatically
+rebuilt when the database changes.
+
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+
+import numpy as np
+
+from prjxray.util import get_cache_dir
+
+# Bump when the layout of the snapshot or of any pickled object changes.
+SNAPSHOT_VERSION = 6
+
+# Prefixes of files in the database root that are read by Database.
+DB_FILE_PREFIXES = ('tile_type_', 'site_type_', 'segbits_', 'ppips_', 'mask_')
+
+
+def iter_source_files(db_root, part, fabric):
+    """ Yields paths of files the snapshot for db_root and part depends on. """
+    for f in sorted(os.listdir(db_root)):
+        if f.startswith(DB_FILE_PREFIXES):
+            yield os.path.join(db_root, f)
+
+    yield os.path.join(db_root, 'mapping', 'parts.yaml')
+    yield os.path.join(db_root, 'mapping', 'devices.yaml')
+    yield os.path.join(db_root, fabric, 'tilegrid.json')
+    yield os.path.join(db_root, part, 'required_features.fasm')
+
+
+def compute_files_key(db_root, tag, files):
+    """ Returns key of the content of files, relative to db_root.
+
+    The key covers the name, size and modification time of each file, which
+    is much cheaper to compute than hashing the file contents.
+
+    tag - Identifies the data built from files, e.g. the part.
+
+    """
+    h = hashlib.sha256()
+    h.update(
+        repr((SNAPSHOT_VERSION, os.path.abspath(db_root),
+              tag)).encode('utf-8'))
+
+    for fname in files:
+        try:
+            st = os.stat(fname)
+            stamp = (st.st_size, st.st_mtime_ns)
+        except FileNotFoundError:
+            stamp = None
+
+        h.update(
+            repr((os.path.relpath(fname, db_root), stamp)).encode('utf-8'))
+
+    return h.hexdigest()
+
+
+def compute_key(db_root, part, fabric, extra_files=()):
+    """ Returns key of database content for db_root and part.
+
+    extra_files - Additional files the caller depends on.
+
+    """
+    files = list(iter_source_files(db_root, part, fabric))
+    return compute_files_key(
+        db_root, (part, fabric), files + list(extra_files))
+
+
+def cache_path(db_root, part, kind, ext='pickle'):
+    """ Returns path in the cache directory for kind of data about a part. """
+    root_hash = hashlib.sha1(
+        os.path.abspath(db_root).encode('utf-8')).hexdigest()[:12]
+
+    return os.path.join(
+        get_cache_dir(), '{}_{}_{}.{}'.format(kind, root_hash, part, ext))
+
+
+def snapshot_path(db_root, part):
+    return cache_path(db_root, part, 'db_snapshot')
+
+
+def load_cached(path, key):
+    """ Returns data stored by save_cached in path if key matches, else None.
+    """
+    try:
+        with open(path, 'rb') as f:
+            stored_key, data = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError,
+            ImportError, ValueError):
+        return None
+
+    if stored_key != key:
+        return None
+
+    return data
+
+
+def save_cached(path, key, data):
+    """ Atomically store data with key in path.
+
+    Failure to write the cache is not fatal, the data will simply be rebuilt
+    next time.  Returns True if the data was stored.
+
+    """
+    dirname = os.path.dirname(path)
+    try:
+        os.makedirs(dirname, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=dirname, suffix='.tmp')
+    except OSError:
+        return False
+
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump((key, data), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        return False
+
+    return True
+
+
+def load_cached_array(path, dtype, length):
+    """ Returns array stored by save_cached_array in path, memory-mapped.
+
+    Returns None if the array is missing or does not have the expected dtype
+    and length.
+
+    """
+    try:
+        array = np.load(path, mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+
+    if array.dtype != dtype or len(array) != length:
+        return None
+
+    return array
+
+
+def save_cached_array(path, array):
+    """ Atomically store array in path, as a .npy file.
+
+    Like save_cached, returns True if the array was stored.
+
+    """
+    dirname = os.path.dirname(path)
+    try:
+        os.makedirs(dirname, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=dirname, suffix='.tmp')
+    except OSError:
+        return False
+
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, array)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        return False
+
+    return True
+
+
+def load_snapshot(db_root, part, fabric):
+    """ Returns snapshot data for db_root and part, or None if stale. """
+    return load_cached(
+        snapshot_path(db_root, part), compute_key(db_root, part, fabric))
+
+
+def save_snapshot(db_root, part, fabric, data):
+    return save_cached(
+        snapshot_path(db_root, part), compute_key(db_root, part, fabric), data)
@@ -8,9 +8,12 @@
 # https://opensource.org/licenses/ISC
 #
 # SPDX-License-Identifier: ISC
+import array
 import fasm
 import sys
 
+import numpy as np
+
 from prjxray import bitstream
 
 
@@ -29,15 +32,34 @@ def init_frame_at_address(frames, addr):
 
 
 class FasmAssembler(object):
-    def __init__(self, db):
+    def __init__(self, db, feature_table=None):
+        """ Create assembler for db.
+
+        feature_table: Optional feature_table.FeatureTable of db, used to
+                       look up the bits of features.
+        """
         self.db = db
         self.grid = db.grid()
+        self.feature_table = feature_table
 
         self.seen_tile = set()
         self.frames_in_use = set()
 
-        self.frames = {}
-        self.frames_line = {}
+        # Bitmaps of the frames with bits set or cleared by FASM lines.
+        # Frame frame_addr uses words [offset, offset + FRAME_WORD_COUNT) of
+        # frame_values (bit values) and frame_defined (bits set or cleared),
+        # where offset = frame_offsets[frame_addr].
+        self.frame_offsets = {}
+        self.frame_values = array.array('I')
+        self.frame_defined = array.array('I')
+
+        # Side table of the FASM line that defined each bit, only consulted
+        # to report conflicting lines.  bit_journal holds the bit keys (see
+        # bit_key), line_journal the index of the line in lines.
+        self.bit_journal = array.array('Q')
+        self.line_journal = array.array('I')
+        self.lines = []
+        self.line_ids = {}
 
         self.feature_callback = lambda feature: None
 
@@ -55,15 +77,12 @@ class FasmAssembler(object):
             for frame in self.frames_in_use:
                 init_frame_at_address(frames, frame)
 
-        for (frame_addr, word_addr, bit_index), is_set in self.frames.items():
-            init_frame_at_address(frames, frame_addr)
-
-            if word_addr >= 101:
-                print(f"get_frames: invalid word address {word_addr} in line: {self.frames_line[(frame_addr, word_addr, bit_index)]}", file=sys.stderr)
-            if frame_addr not in frames:
-                print(f"get_frames: invalid frame address {frame_addr:x8}", file=sys.stderr)
-            if is_set:
-                frames[frame_addr][word_addr] |= 1 << bit_index
+        values = np.frombuffer(
+            self.frame_values, dtype=np.uint32).reshape(
+                -1, bitstream.FRAME_WORD_COUNT)
+        for frame_addr, offset in self.frame_offsets.items():
+            row = offset // bitstream.FRAME_WORD_COUNT
+            frames[frame_addr] = values[row].tolist()
 
         return frames
 
@@ -78,6 +97,45 @@ class FasmAssembler(object):
 
         return frames
 
+    def word_index(self, frame_addr, word_addr):
+        '''Return index of word in frame bitmaps, adding frame if needed'''
+        offset = self.frame_offsets.get(frame_addr)
+        if offset is None:
+            offset = len(self.frame_values)
+            self.frame_offsets[frame_addr] = offset
+
+            zeros = bytes(4 * bitstream.FRAME_WORD_COUNT)
+            self.frame_values.frombytes(zeros)
+            self.frame_defined.frombytes(zeros)
+
+        # Negative word addresses (from aliased tiles) index from the end of
+        # the frame, as they did when frames were plain lists.
+        if word_addr < 0:
+            word_addr += bitstream.FRAME_WORD_COUNT
+
+        return offset + word_addr
+
+    def bit_key(self, word_idx, bit_index):
+        return word_idx * bitstream.WORD_SIZE_BITS + bit_index
+
+    def record_line(self, word_idx, bit_index, line):
+        '''Record line as the FASM line that defined given bit'''
+        line_id = self.line_ids.get(line)
+        if line_id is None:
+            line_id = len(self.lines)
+            self.lines.append(line)
+            self.line_ids[line] = line_id
+
+        self.bit_journal.append(self.bit_key(word_idx, bit_index))
+        self.line_journal.append(line_id)
+
+    def line_for_bit(self, word_idx, bit_index):
+        '''Return the FASM line that defined given bit'''
+        journal = np.frombuffer(self.bit_journal, dtype=np.uint64)
+        entry = np.flatnonzero(journal == self.bit_key(word_idx, bit_index))
+        assert len(entry) == 1
+        return self.lines[self.line_journal[entry[0]]]
+
     def frame_set(self, frame_addr, word_addr, bit_index, line):
         '''Set given bit in given frame address and word'''
         assert bit_index is not None
@@ -86,19 +144,23 @@ class FasmAssembler(object):
         if word_addr >= 101:
             print(f"frame_set: invalid word address {word_addr} in line: {line}", file=sys.stderr)
             return
-        if key in self.frames:
-            if self.frames[key] != 1:
+
+        word_idx = self.word_index(frame_addr, word_addr)
+        mask = 1 << bit_index
+        if self.frame_defined[word_idx] & mask:
+            if not self.frame_values[word_idx] & mask:
                 raise FasmInconsistentBits(
                     'FASM line "{}" wanted to set bit {} but was cleared by FASM line "{}"'
                     .format(
                         line,
                         key,
-                        self.frames_line[key],
+                        self.line_for_bit(word_idx, bit_index),
                     ))
             return
 
-        self.frames[key] = 1
-        self.frames_line[key] = line
+        self.frame_defined[word_idx] |= mask
+        self.frame_values[word_idx] |= mask
+        self.record_line(word_idx, bit_index, line)
 
     def frame_clear(self, frame_addr, word_addr, bit_index, line):
         '''Set given bit in given frame address and word'''
@@ -108,21 +170,30 @@ class FasmAssembler(object):
         if word_addr >= 101:
             print(f"frame_clear: invalid word address {word_addr} in line: {line}", file=sys.stderr)
             return
-        if key in self.frames:
-            if self.frames[key] != 0:
+
+        word_idx = self.word_index(frame_addr, word_addr)
+        mask = 1 << bit_index
+        if self.frame_defined[word_idx] & mask:
+            if self.frame_values[word_idx] & mask:
                 raise FasmInconsistentBits(
                     'FASM line "{}" wanted to clear bit {} but was set by FASM line "{}"'
                     .format(
                         line,
                         key,
-                        self.frames_line[key],
+                        self.line_for_bit(word_idx, bit_index),
                     ))
             return
 
-        self.frames[key] = 0
-        self.frames_line[key] = line
+        self.frame_defined[word_idx] |= mask
+        self.record_line(word_idx, bit_index, line)
 
     def enable_feature(self, tile, feature, address, line):
+        if self.feature_table is not None:
+            bits = self.feature_table.feature_bits(tile, feature, address)
+            if bits is not None:
+                self.enable_feature_bits(tile, bits, line)
+                return
+
         gridinfo = self.grid.gridinfo_at_tilename(tile)
 
         def update_segbit(bit):
@@ -162,6 +233,29 @@ class FasmAssembler(object):
                                bits.base_address + bits.frames):
                 self.frames_in_use.add(frame)
 
+    def enable_feature_bits(self, tile, bits, line):
+        '''Set or clear bits from FeatureTable.feature_bits'''
+        self.seen_tile.add(tile)
+
+        any_bits = set()
+        for block_type, frame_addr, word_bit, isset in bits:
+            any_bits.add(block_type)
+
+            word_addr = word_bit // bitstream.WORD_SIZE_BITS
+            bit_index = word_bit % bitstream.WORD_SIZE_BITS
+            if isset:
+                self.frame_set(frame_addr, word_addr, bit_index, line)
+            else:
+                self.frame_clear(frame_addr, word_addr, bit_index, line)
+
+        gridinfo = self.grid.gridinfo_at_tilename(tile)
+        for block_type in any_bits:
+            # Mark all frames used by this tile as in use.
+            bits = gridinfo.bits[block_type]
+            for frame in range(bits.base_address,
+                               bits.base_address + bits.frames):
+                self.frames_in_use.add(frame)
+
     def add_fasm_line(self, line, missing_features):
         if not line.set_feature:
             return
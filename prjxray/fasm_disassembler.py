@@ -8,8 +8,10 @@
 # https://opensource.org/licenses/ISC
 #
 # SPDX-License-Identifier: ISC
+import multiprocessing
 import re
 import fasm
+import numpy as np
 from prjxray import bitstream
 
 
@@ -38,6 +40,27 @@ def mk_fasm(tile_name, feature):
         comment=None)
 
 
+# (FasmDisassembler, bitdata, verbose) inherited by forked shard workers.
+_SHARD_STATE = None
+
+
+def _find_features_in_shard(bits_infos):
+    """ Decode a shard of tiles in a worker process.
+
+    Returns the FasmLine's found and the solved bits, as frame rows of
+    bitdata and their words.
+    """
+    disassembler, bitdata, verbose = _SHARD_STATE
+
+    solved_bitdata = bitstream.Frames.empty_like(bitdata)
+    fasm_lines = list(
+        disassembler.find_features_in_tiles(
+            bits_infos, solved_bitdata, bitdata, verbose=verbose))
+
+    rows = np.flatnonzero(solved_bitdata.words.any(axis=1))
+    return fasm_lines, rows, solved_bitdata.words[rows]
+
+
 class FasmDisassembler(object):
     """ Given a Project X-ray data, outputs FasmLine tuples for bits set. """
 
@@ -88,91 +111,155 @@ class FasmDisassembler(object):
         for ones_matched, feature in tile_segbits.match_bitdata(block_type,
                                                                 bits, bitdata):
             for frame, bit in ones_matched:
-                if frame not in solved_bitdata:
-                    solved_bitdata[frame] = set()
-                solved_bitdata[frame].add(bit)
+                solved_bitdata.set_bit(frame, bit)
 
             yield mk_fasm(tile_name=tile_name, feature=feature)
 
-    def find_features_in_bitstream(self, bitdata, verbose=False):
-        solved_bitdata = {}
-        frames = set(bitdata.keys())
-        tiles_checked = set()
+    def find_bits_infos_with_data(self, bitdata):
+        """ Return list of BitsInfo of tiles with any bits set in bitdata.
 
-        emitted_features = set()
+        Tiles are ordered by the first frame address they have data in.
+        """
+        bits_infos = []
+        tiles_checked = set()
 
-        while len(frames) > 0:
-            frame = frames.pop()
+        for frame in sorted(bitdata):
+            # Find the tiles using this frame that have any data in it,
+            # using a prefix sum of the words with bits set.
+            indices = self.segment_map.segment_indices_for_frame(frame)
+            nonzero_words = np.zeros(bitstream.FRAME_WORD_COUNT + 1, dtype=int)
+            np.cumsum(bitdata.nonzero_words(frame), out=nonzero_words[1:])
+            word_start = np.minimum(
+                self.segment_map.word_start[indices],
+                bitstream.FRAME_WORD_COUNT)
+            word_end = np.minimum(
+                self.segment_map.word_end[indices], bitstream.FRAME_WORD_COUNT)
+            indices = indices[
+                nonzero_words[word_end] > nonzero_words[word_start]]
 
-            # Skip frames that were emptied in a previous iteration.
-            if not bitdata[frame]:
-                continue
+            for idx in indices:
+                bits_info = self.segment_map.bits_infos[idx]
 
-            # Iterate over all tiles that use this frame.
-            for bits_info in self.segment_map.segment_info_for_frame(frame):
                 # Don't examine a tile twice
                 if (bits_info.tile, bits_info.block_type) in tiles_checked:
                     continue
 
-                # Check if this frame has any data for the relevant tile.
-                any_column = False
-                for word_idx in range(bits_info.bits.words):
-                    if word_idx + bits_info.bits.offset in bitdata[frame][0]:
-                        any_column = True
-                        break
+                tiles_checked.add((bits_info.tile, bits_info.block_type))
+                bits_infos.append(bits_info)
 
-                if not any_column:
-                    continue
+        return bits_infos
 
-                tiles_checked.add((bits_info.tile, bits_info.block_type))
+    def find_features_in_tiles(
+            self, bits_infos, solved_bitdata, bitdata, verbose=False):
+        for bits_info in bits_infos:
+            yield from self.find_features_in_tile(
+                bits_info.tile,
+                bits_info.block_type,
+                bits_info.bits,
+                solved_bitdata,
+                bitdata,
+                verbose=verbose)
+
+    def find_features_in_bitstream(self, bitdata, verbose=False, jobs=1):
+        """ Yields FasmLine's for features set in bitdata.
 
-                for fasm_line in self.find_features_in_tile(
-                        bits_info.tile, bits_info.block_type, bits_info.bits,
-                        solved_bitdata, bitdata, verbose=verbose):
-                    if fasm_line not in emitted_features:
-                        emitted_features.add(fasm_line)
-                        yield fasm_line
-
-            remaining_bits = bitdata[frame][1]
-            if frame in solved_bitdata:
-                remaining_bits -= solved_bitdata[frame]
-
-            if len(remaining_bits) > 0 and verbose:
-                # Some bits were not decoded, add warning and annotations to
-                # FASM.
-                yield fasm.FasmLine(
-                    set_feature=None,
-                    annotations=None,
-                    comment=" In frame 0x{:08x} {} bits were not converted.".
-                    format(
-                        frame,
-                        len(remaining_bits),
-                    ))
-
-                for bit in sorted(remaining_bits):
-                    frame_offset = frame % bitstream.FRAME_ALIGNMENT
-                    aligned_frame = frame - frame_offset
-                    wordidx = bit // bitstream.WORD_SIZE_BITS
-                    bitidx = bit % bitstream.WORD_SIZE_BITS
-
-                    annotations = []
-                    annotations.append(
-                        fasm.Annotation(
-                            'unknown_bit', '{:08x}_{}_{}'.format(
-                                frame, wordidx, bitidx)))
-                    annotations.append(
-                        fasm.Annotation(
-                            'unknown_segment',
-                            '0x{:08x}'.format(aligned_frame)))
-                    annotations.append(
-                        fasm.Annotation(
-                            'unknown_segbit', '{:02d}_{:02d}'.format(
-                                frame_offset, bit)))
-                    yield fasm.FasmLine(
-                        set_feature=None,
-                        annotations=tuple(annotations),
-                        comment=None,
-                    )
+        bitdata is either a bitstream.Frames or a bitdata map, see
+        bitstream.load_bitdata for details on bitdata structure.
+
+        jobs: Number of processes used to decode tiles.  Tiles are split into
+              shards of consecutive tiles in decoding order, which are decoded
+              in a process pool forked from this process, so the database is
+              shared with the workers.  The output does not depend on jobs.
+        """
+        if not isinstance(bitdata, bitstream.Frames):
+            bitdata = bitstream.Frames.from_bitdata(bitdata)
+
+        solved_bitdata = bitstream.Frames.empty_like(bitdata)
+        bits_infos = self.find_bits_infos_with_data(bitdata)
+
+        emitted_features = set()
+
+        if jobs > 1 and len(bits_infos) > 1 and (
+                'fork' in multiprocessing.get_all_start_methods()):
+            fasm_lines = self.find_features_in_shards(
+                bits_infos, solved_bitdata, bitdata, verbose, jobs)
+        else:
+            fasm_lines = self.find_features_in_tiles(
+                bits_infos, solved_bitdata, bitdata, verbose=verbose)
+
+        for fasm_line in fasm_lines:
+            if fasm_line not in emitted_features:
+                emitted_features.add(fasm_line)
+                yield fasm_line
+
+        if not verbose:
+            return
+
+        for frame in sorted(bitdata):
+            remaining_bits = np.setdiff1d(
+                bitdata.frame_bits(frame),
+                solved_bitdata.frame_bits(frame)).tolist()
+
+            if len(remaining_bits) > 0:
+                yield from self.unknown_bits_fasm(frame, remaining_bits)
+
+    def find_features_in_shards(
+            self, bits_infos, solved_bitdata, bitdata, verbose, jobs):
+        """ Decode tiles in a pool of jobs processes, see
+        find_features_in_bitstream. """
+        global _SHARD_STATE
+
+        # Use a few shards per process to balance the load.
+        n_shards = min(len(bits_infos), jobs * 4)
+        shards = [
+            bits_infos[len(bits_infos) * idx // n_shards:len(bits_infos) *
+                       (idx + 1) // n_shards] for idx in range(n_shards)
+        ]
+
+        _SHARD_STATE = (self, bitdata, verbose)
+        try:
+            with multiprocessing.get_context('fork').Pool(jobs) as pool:
+                for fasm_lines, rows, words in pool.imap(
+                        _find_features_in_shard, shards):
+                    solved_bitdata.words[rows] |= words
+                    yield from fasm_lines
+        finally:
+            _SHARD_STATE = None
+
+    def unknown_bits_fasm(self, frame, remaining_bits):
+        """ Yields FasmLine's reporting bits in frame that were not decoded. """
+        # Some bits were not decoded, add warning and annotations to FASM.
+        yield fasm.FasmLine(
+            set_feature=None,
+            annotations=None,
+            comment=" In frame 0x{:08x} {} bits were not converted.".format(
+                frame,
+                len(remaining_bits),
+            ))
+
+        for bit in remaining_bits:
+            frame_offset = frame % bitstream.FRAME_ALIGNMENT
+            aligned_frame = frame - frame_offset
+            wordidx = bit // bitstream.WORD_SIZE_BITS
+            bitidx = bit % bitstream.WORD_SIZE_BITS
+
+            annotations = []
+            annotations.append(
+                fasm.Annotation(
+                    'unknown_bit', '{:08x}_{}_{}'.format(
+                        frame, wordidx, bitidx)))
+            annotations.append(
+                fasm.Annotation(
+                    'unknown_segment', '0x{:08x}'.format(aligned_frame)))
+            annotations.append(
+                fasm.Annotation(
+                    'unknown_segbit', '{:02d}_{:02d}'.format(
+                        frame_offset, bit)))
+            yield fasm.FasmLine(
+                set_feature=None,
+                annotations=tuple(annotations),
+                comment=None,
+            )
 
     def is_zero_feature(self, feature):
         parts = feature.split('.')
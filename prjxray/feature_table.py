@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020  The Project X-Ray Authors.
+#
+# Use of this source code is governed by a ISC-style
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/ISC
+#
+# SPDX-License-Identifier: ISC
+""" Compiled table of the bits of every feature, used for FASM assembly.
+
+Resolving the bits of a feature through the grid, the tile segbits (or a
+TileSegbitsAlias) and feature_to_bits is expensive to do for every FASM line.
+FeatureTable does that work once per part.
+
+Tiles with the same tile type, block types and aliases set the same bits
+relative to the base address and word offset of the tile, so bits are stored
+once per such tile template.  The absolute bits of a feature are computed
+from the Bits of the tile, a table of absolute bits for every tile of a
+device would be orders of magnitude larger.
+
+The table can be stored in the cache directory (see util.get_cache_dir), in
+which case the bits array is memory-mapped when loaded.
+
+"""
+import numpy as np
+
+from prjxray import bitstream
+from prjxray import db_snapshot
+from prjxray.grid_types import BlockType
+from prjxray.tile_segbits_alias import TileSegbitsAlias
+
+BLOCK_TYPES = list(BlockType)
+BLOCK_TYPE_INDEX = {
+    block_type: idx
+    for idx, block_type in enumerate(BLOCK_TYPES)
+}
+
+# Bits of a feature relative to the base address (word_column) and the first
+# bit of the word offset (word_bit) of the tile.
+BITS_DTYPE = np.dtype(
+    [
+        ('block_type', np.uint8),
+        ('word_column', np.int32),
+        ('word_bit', np.int32),
+        ('isset', np.uint8),
+    ])
+
+
+def template_key(gridinfo):
+    """ Returns key of tiles sharing the same relative feature bits. """
+    block_types = []
+    aliases = []
+    for block_type, bits in sorted(gridinfo.bits.items(),
+                                   key=lambda item: item[0].value):
+        block_types.append(block_type.value)
+        if bits.alias is not None:
+            aliases.append(
+                (
+                    block_type.value, bits.alias.tile_type,
+                    bits.alias.start_offset,
+                    tuple(sorted(bits.alias.sites.items()))))
+
+    return (gridinfo.tile_type, tuple(block_types), tuple(aliases))
+
+
+def iter_feature_keys(segbits):
+    """ Yields (feature, address) of every feature of tile segbits.
+
+    Features include the tile type, like the db_k of
+    FasmAssembler.enable_feature.
+    """
+    if isinstance(segbits, TileSegbitsAlias):
+        base_segbits = segbits.tile_segbits
+        rename = segbits.map_feature_from_segbits
+    else:
+        base_segbits = segbits
+
+        def rename(feature):
+            return feature
+
+    for block_type in base_segbits.segbits:
+        for feature in base_segbits.segbits[block_type]:
+            yield rename(feature), 0
+
+    for feature, addresses in base_segbits.feature_addresses.items():
+        for address in addresses:
+            yield rename(feature), address
+
+    for feature in segbits.ppips:
+        yield feature, 0
+
+
+def compile_template(db, gridinfo):
+    """ Returns map of (feature, address) to list of relative bits.
+
+    Features are relative to the tile, i.e. do not include the tile type.
+    """
+    tile_type = gridinfo.tile_type
+
+    relative_bits_map = {}
+    any_alias = False
+    for block_type, bits in gridinfo.bits.items():
+        relative_bits_map[block_type] = bits._replace(base_address=0, offset=0)
+        if bits.alias is not None:
+            any_alias = True
+
+    try:
+        if any_alias:
+            segbits = TileSegbitsAlias(db, tile_type, relative_bits_map)
+        else:
+            segbits = db.get_tile_segbits(tile_type)
+    except KeyError:
+        return {}
+
+    prefix = tile_type + '.'
+
+    features = {}
+    for db_k, address in iter_feature_keys(segbits):
+        if not db_k.startswith(prefix):
+            continue
+
+        try:
+            bits = [
+                (
+                    BLOCK_TYPE_INDEX[block_type], bit.word_column,
+                    bit.word_bit, bit.isset)
+                for block_type, bit in segbits.feature_to_bits(
+                    relative_bits_map, db_k, address)
+            ]
+        except KeyError:
+            continue
+
+        features[(db_k[len(prefix):], address)] = bits
+
+    return features
+
+
+class FeatureTable(object):
+    """ Map of tile feature to bits, see module documentation.
+
+    templates: Map of template_key to map of (feature, address) to
+               (start, end) range of rows in bits.
+    bits: Array of BITS_DTYPE.
+    """
+
+    def __init__(self, grid, templates, bits):
+        self.grid = grid
+        self.templates = templates
+        self.bits = bits
+
+        # tile -> (features, frame base, bit base) cache
+        self.tile_info = {}
+
+    @classmethod
+    def build(cls, db):
+        grid = db.grid()
+
+        templates = {}
+        rows = []
+        for tile in grid.tiles():
+            gridinfo = grid.gridinfo_at_tilename(tile)
+            key = template_key(gridinfo)
+            if key in templates:
+                continue
+
+            features = {}
+            for feature_key, bits in compile_template(db, gridinfo).items():
+                features[feature_key] = (len(rows), len(rows) + len(bits))
+                rows.extend(bits)
+
+            templates[key] = features
+
+        return cls(grid, templates, np.array(rows, dtype=BITS_DTYPE))
+
+    def get_tile_info(self, tile):
+        if tile not in self.tile_info:
+            gridinfo = self.grid.gridinfo_at_tilename(tile)
+
+            frame_base = [None for _ in BLOCK_TYPES]
+            bit_base = [None for _ in BLOCK_TYPES]
+            for block_type, bits in gridinfo.bits.items():
+                idx = BLOCK_TYPE_INDEX[block_type]
+                frame_base[idx] = bits.base_address
+                bit_base[idx] = bits.offset * bitstream.WORD_SIZE_BITS
+
+            self.tile_info[tile] = (
+                self.templates.get(template_key(gridinfo), {}), frame_base,
+                bit_base)
+
+        return self.tile_info[tile]
+
+    def feature_bits(self, tile, feature, address=0):
+        """ Returns bits of feature in tile, or None if feature is unknown.
+
+        Bits are a list of (block_type, frame, word_bit, isset) where
+        word_bit is the bit index within the frame.
+        """
+        features, frame_base, bit_base = self.get_tile_info(tile)
+
+        rows = features.get((feature, address))
+        if rows is None:
+            return None
+
+        bits = []
+        start, end = rows
+        for block_type, word_column, word_bit, isset in self.bits[
+                start:end].tolist():
+            bits.append(
+                (
+                    BLOCK_TYPES[block_type],
+                    frame_base[block_type] + word_column,
+                    bit_base[block_type] + word_bit, isset))
+
+        return bits
+
+
+def feature_table_paths(db):
+    return (
+        db_snapshot.cache_path(db.db_root, db.part, 'feature_table'),
+        db_snapshot.cache_path(db.db_root, db.part, 'feature_table', 'npy'))
+
+
+def get_feature_table(db):
+    """ Returns FeatureTable of db, loaded from or stored in the cache. """
+    table_path, bits_path = feature_table_paths(db)
+    key = db_snapshot.compute_key(db.db_root, db.part, db.fabric)
+
+    data = db_snapshot.load_cached(table_path, key)
+    if data is not None:
+        bits = db_snapshot.load_cached_array(
+            bits_path, BITS_DTYPE, data['n_bits'])
+        if bits is not None:
+            return FeatureTable(db.grid(), data['templates'], bits)
+
+    table = FeatureTable.build(db)
+
+    if db_snapshot.save_cached_array(bits_path, table.bits):
+        db_snapshot.save_cached(
+            table_path, key, {
+                'templates': table.templates,
+                'n_bits': len(table.bits),
+            })
+
+    return table
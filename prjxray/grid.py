@@ -8,7 +8,9 @@
 # https://opensource.org/licenses/ISC
 #
 # SPDX-License-Identifier: ISC
+from prjxray import db_snapshot
 from prjxray import segment_map
+from prjxray.grid_index import GridIndex
 from prjxray.grid_types import BlockType, GridLoc, GridInfo, BitAlias, Bits, BitsInfo, ClockRegion
 from prjxray.tile_segbits_alias import TileSegbitsAlias
 import re
@@ -87,6 +89,20 @@ class Grid(object):
         x, y = zip(*self.loc.keys())
         self._dims = (min(x), max(x), min(y), max(y))
 
+        # Cache of TileSegbitsAlias, see get_tile_segbits_at_tilename.
+        self.tile_segbits_alias = {}
+
+        self._segment_map = None
+        self._grid_index = None
+
+    def __getstate__(self):
+        # The Database is not part of the grid state, it is reattached by
+        # Database when restoring a snapshot.
+        state = self.__dict__.copy()
+        state['db'] = None
+        state['tile_segbits_alias'] = {}
+        return state
+
     def tiles(self):
         """ Return list of tiles. """
         return self.tileinfo.keys()
@@ -125,7 +141,93 @@ class Grid(object):
                 )
 
     def get_segment_map(self):
-        return segment_map.SegmentMap(self)
+        if self._segment_map is None:
+            self._segment_map = segment_map.SegmentMap(self)
+
+        return self._segment_map
+
+    def get_grid_index(self):
+        if self._grid_index is None:
+            self._grid_index = GridIndex(self)
+
+        return self._grid_index
+
+    def tiles_in_rect(self, x1, x2, y1, y2, tile_types=None):
+        """ Return list of tiles within the inclusive rectangle.
+
+        tile_types: list of tile types to keep, or None for all
+
+        Tiles are in the order of tiles().
+        """
+        index = self.get_grid_index()
+        return [
+            index.tiles[idx] for idx in index.tile_indices_in_rect(
+                x1, x2, y1, y2, tile_types).tolist()
+        ]
+
+    def tiles_outside_rects(self, rects, tile_types=None):
+        """ Return list of tiles not within any of the inclusive rectangles.
+
+        rects: iterable of (x1, x2, y1, y2)
+        tile_types: list of tile types to keep, or None for all
+        """
+        index = self.get_grid_index()
+        return [
+            index.tiles[idx] for idx in index.tile_indices_outside_rects(
+                rects, tile_types).tolist()
+        ]
+
+    def sites_in_rect(self, x1, x2, y1, y2, site_types=None):
+        """ Return list of (tile_name, site_name, site_type) of the sites of
+        tiles within the inclusive rectangle.
+
+        site_types: list of site types to keep, or None for all
+        """
+        index = self.get_grid_index()
+        return list(
+            index.iter_sites(
+                index.site_indices_in_rect(x1, x2, y1, y2, site_types)))
+
+    def sites_outside_rects(self, rects, site_types=None):
+        """ Return list of (tile_name, site_name, site_type) of the sites of
+        tiles not within any of the inclusive rectangles.
+
+        site_types: list of site types to keep, or None for all
+        """
+        index = self.get_grid_index()
+        return list(
+            index.iter_sites(
+                index.site_indices_outside_rects(rects, site_types)))
+
+    def tiles_of_type(self, tile_type):
+        """ Return list of tiles of tile_type. """
+        index = self.get_grid_index()
+        if tile_type not in index.tiles_of_type:
+            return []
+
+        return [
+            index.tiles[idx]
+            for idx in index.tiles_of_type[tile_type].tolist()
+        ]
+
+    def sites_of_type(self, site_type):
+        """ Return list of (tile_name, site_name, site_type) of site_type. """
+        index = self.get_grid_index()
+        if site_type not in index.sites_of_type:
+            return []
+
+        return list(index.iter_sites(index.sites_of_type[site_type]))
+
+    def tiles_in_clock_region(self, clock_region):
+        """ Return list of tiles in the clock region named clock_region. """
+        index = self.get_grid_index()
+        if clock_region not in index.tiles_of_clock_region:
+            return []
+
+        return [
+            index.tiles[idx]
+            for idx in index.tiles_of_clock_region[clock_region].tolist()
+        ]
 
     def tile_key(self, tilename):
         gridinfo = self.gridinfo_at_tilename(tilename)
@@ -143,7 +245,46 @@ class Grid(object):
             if bits.alias is not None:
                 any_alias = True
 
-        if any_alias:
-            return TileSegbitsAlias(self.db, gridinfo.tile_type, gridinfo.bits)
-        else:
+        if not any_alias:
             return self.db.get_tile_segbits(gridinfo.tile_type)
+
+        # TileSegbitsAlias only depends on the aliases and word counts of the
+        # tile, so tiles with the same layout share one instance.
+        key = [gridinfo.tile_type]
+        for block_type, bits in sorted(gridinfo.bits.items(),
+                                       key=lambda item: item[0].value):
+            alias = bits.alias
+            if alias is not None:
+                alias = (
+                    alias.tile_type, alias.start_offset,
+                    tuple(sorted(alias.sites.items())))
+            key.append((block_type.value, bits.words, alias))
+        key = tuple(key)
+
+        if key not in self.tile_segbits_alias:
+            self.tile_segbits_alias[key] = TileSegbitsAlias(
+                self.db, gridinfo.tile_type, gridinfo.bits)
+
+        return self.tile_segbits_alias[key]
+
+
+def get_grid(db):
+    """ Returns Grid of db, loaded from or stored in the cache.
+
+    The cached grid includes its GridIndex, so ROI and region queries on it
+    do not need to parse tilegrid.json or rebuild the index.
+    """
+    path = db_snapshot.cache_path(db.db_root, db.part, 'grid')
+    key = db_snapshot.compute_key(db.db_root, db.part, db.fabric)
+
+    grid = db_snapshot.load_cached(path, key)
+    if grid is not None:
+        grid.db = db
+        return grid
+
+    db._read_tilegrid()
+    grid = Grid(db, db.tilegrid)
+    grid.get_grid_index()
+    db_snapshot.save_cached(path, key, grid)
+
+    return grid
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020  The Project X-Ray Authors.
+#
+# Use of this source code is governed by a ISC-style
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/ISC
+#
+# SPDX-License-Identifier: ISC
+import numpy as np
+
+
+class GridIndex(object):
+    """ Spatial and type indexes of the tiles and sites of a Grid.
+
+    Tiles are numbered in the order of Grid.tiles(), tile i is tiles[i] and is
+    at (tile_x[i], tile_y[i]).  loc_tile[x - x_min, y - y_min] is the index of
+    the tile at (x, y), or -1 if there is no tile there.
+
+    Sites are numbered in the order of the tiles and then of GridInfo.sites,
+    the sites of tile i are [site_ptr[i], site_ptr[i + 1]).
+
+    tiles_of_type, sites_of_type and tiles_of_clock_region map a tile type,
+    site type or clock region name to the sorted array of its tile or site
+    indices.
+
+    Query methods return indices in increasing order, so results are in the
+    same order as a scan of Grid.tiles().
+    """
+
+    def __init__(self, grid):
+        self.tiles = list(grid.tiles())
+        self.x_min, x_max, self.y_min, y_max = grid.dims()
+
+        n_tiles = len(self.tiles)
+        self.tile_x = np.zeros(n_tiles, dtype=np.int64)
+        self.tile_y = np.zeros(n_tiles, dtype=np.int64)
+        self.loc_tile = np.full(
+            (x_max - self.x_min + 1, y_max - self.y_min + 1),
+            -1,
+            dtype=np.int64)
+
+        self.site_ptr = np.zeros(n_tiles + 1, dtype=np.int64)
+        self.site_names = []
+        self.site_types = []
+
+        tiles_of_type = {}
+        sites_of_type = {}
+        tiles_of_clock_region = {}
+        for idx, tile in enumerate(self.tiles):
+            loc = grid.loc_of_tilename(tile)
+            gridinfo = grid.gridinfo_at_tilename(tile)
+
+            self.tile_x[idx] = loc.grid_x
+            self.tile_y[idx] = loc.grid_y
+            self.loc_tile[loc.grid_x - self.x_min, loc.grid_y -
+                          self.y_min] = idx
+
+            tiles_of_type.setdefault(gridinfo.tile_type, []).append(idx)
+            if gridinfo.clock_region is not None:
+                tiles_of_clock_region.setdefault(
+                    gridinfo.clock_region.name, []).append(idx)
+
+            for site_name, site_type in gridinfo.sites.items():
+                sites_of_type.setdefault(site_type, []).append(
+                    len(self.site_names))
+                self.site_names.append(site_name)
+                self.site_types.append(site_type)
+
+            self.site_ptr[idx + 1] = len(self.site_names)
+
+        self.site_tile = np.repeat(
+            np.arange(n_tiles, dtype=np.int64), np.diff(self.site_ptr))
+
+        def to_arrays(d):
+            return dict(
+                (key, np.array(value, dtype=np.int64))
+                for key, value in d.items())
+
+        self.tiles_of_type = to_arrays(tiles_of_type)
+        self.sites_of_type = to_arrays(sites_of_type)
+        self.tiles_of_clock_region = to_arrays(tiles_of_clock_region)
+
+    def _clip_rect(self, x1, x2, y1, y2):
+        """ Return slices of loc_tile covering the inclusive rectangle. """
+        x_size, y_size = self.loc_tile.shape
+        x_start = min(max(x1 - self.x_min, 0), x_size)
+        x_end = min(max(x2 - self.x_min + 1, x_start), x_size)
+        y_start = min(max(y1 - self.y_min, 0), y_size)
+        y_end = min(max(y2 - self.y_min + 1, y_start), y_size)
+
+        return slice(x_start, x_end), slice(y_start, y_end)
+
+    def _union(self, index, keys):
+        """ Return sorted array of the indices of keys in index. """
+        return np.sort(
+            np.concatenate(
+                [index[key] for key in set(keys) if key in index] +
+                [np.zeros(0, dtype=np.int64)]))
+
+    def _in_rects(self, x, y, rects):
+        """ Return mask of the (x, y) locations within any of rects. """
+        mask = np.zeros(len(x), dtype=np.bool_)
+        for x1, x2, y1, y2 in rects:
+            mask |= (x1 <= x) & (x <= x2) & (y1 <= y) & (y <= y2)
+
+        return mask
+
+    def tile_indices_in_rect(self, x1, x2, y1, y2, tile_types=None):
+        """ Return indices of the tiles in the inclusive rectangle.
+
+        tile_types: Iterable of tile types to keep, or None for all.
+        """
+        if tile_types is not None:
+            tiles = self._union(self.tiles_of_type, tile_types)
+            return tiles[self._in_rects(
+                self.tile_x[tiles], self.tile_y[tiles], [(x1, x2, y1, y2)])]
+
+        tiles = self.loc_tile[self._clip_rect(x1, x2, y1, y2)].ravel()
+        return np.sort(tiles[tiles >= 0])
+
+    def tile_indices_outside_rects(self, rects, tile_types=None):
+        """ Return indices of the tiles not within any of rects.
+
+        rects: Iterable of inclusive (x1, x2, y1, y2) rectangles.
+        tile_types: Iterable of tile types to keep, or None for all.
+        """
+        if tile_types is not None:
+            tiles = self._union(self.tiles_of_type, tile_types)
+        else:
+            tiles = np.arange(len(self.tiles), dtype=np.int64)
+
+        return tiles[~self._in_rects(
+            self.tile_x[tiles], self.tile_y[tiles], list(rects))]
+
+    def _sites_of_tiles(self, tiles):
+        """ Return indices of the sites of the sorted array of tiles. """
+        starts = self.site_ptr[tiles]
+        counts = self.site_ptr[tiles + 1] - starts
+        first = np.repeat(np.cumsum(counts) - counts, counts)
+        return np.repeat(starts, counts) + (
+            np.arange(first.size, dtype=np.int64) - first)
+
+    def _sites_of_types_in_rects(self, site_types, rects, inside):
+        """ Return indices of the sites of site_types, of tiles inside (or
+        outside) any of rects. """
+        sites = self._union(self.sites_of_type, site_types)
+        tiles = self.site_tile[sites]
+        mask = self._in_rects(self.tile_x[tiles], self.tile_y[tiles], rects)
+        return sites[mask if inside else ~mask]
+
+    def site_indices_in_rect(self, x1, x2, y1, y2, site_types=None):
+        """ Return indices of the sites of tiles in the inclusive rectangle.
+
+        site_types: Iterable of site types to keep, or None for all.
+        """
+        if site_types is not None:
+            return self._sites_of_types_in_rects(
+                site_types, [(x1, x2, y1, y2)], inside=True)
+
+        return self._sites_of_tiles(self.tile_indices_in_rect(x1, x2, y1, y2))
+
+    def site_indices_outside_rects(self, rects, site_types=None):
+        """ Return indices of the sites of tiles not within any of rects.
+
+        site_types: Iterable of site types to keep, or None for all.
+        """
+        if site_types is not None:
+            return self._sites_of_types_in_rects(
+                site_types, list(rects), inside=False)
+
+        return self._sites_of_tiles(self.tile_indices_outside_rects(rects))
+
+    def iter_sites(self, sites):
+        """ Yields (tile_name, site_name, site_type) of site indices. """
+        for site, tile in zip(sites.tolist(), self.site_tile[sites].tolist()):
+            yield (
+                self.tiles[tile], self.site_names[site], self.site_types[site])
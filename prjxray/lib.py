@@ -14,6 +14,8 @@ import pickle
 import re
 from collections import namedtuple
 
+import numpy as np
+
 from prjxray.util import OpenSafeFile
 
 
@@ -115,44 +117,172 @@ def check_errors(flat_error_nodes, ignored_wires):
 
 
 class NodeLookup(object):
+    """ Lookup of the wires of each node of the raw database dump.
+
+    Tiles, nodes and tile wire names are interned as integer ids, which are
+    indices in the sorted tile_names, node_names and wire_names arrays.
+
+    Wires are stored ordered by node:
+     node_ptr - Wires of node i are [node_ptr[i], node_ptr[i + 1]).
+     wire_tile, wire_name - Tile id and wire name id of each wire.
+     tile_ptr, tile_wires - Wires of tile i are
+                            tile_wires[tile_ptr[i]:tile_ptr[i + 1]].
+
+    The arrays can be saved to a directory with save_to_file, and are
+    memory-mapped by load_from_file.
+
+    """
+
+    ARRAYS = (
+        'tile_names', 'node_names', 'wire_names', 'node_ptr', 'wire_tile',
+        'wire_name', 'tile_ptr', 'tile_wires')
+
     def __init__(self):
-        self.nodes = {}
+        self.load_from_node_wires([])
 
     def load_from_nodes(self, nodes):
-        self.nodes = nodes
+        """ Load from map of node to list of wires, in the format of the node
+        JSON5 files. """
+
+        def node_wires():
+            for node, wires in nodes.items():
+                yield node, [wire['wire'] for wire in wires]
+
+        self.load_from_node_wires(node_wires())
 
     def load_from_root_csv(self, nodes):
         import pyjson5 as json5
         import progressbar
-        for node in progressbar.progressbar(nodes):
-            with OpenSafeFile(node) as f:
-                node_wires = json5.load(f)
-                assert node_wires['node'] not in self.nodes
-                self.nodes[node_wires['node']] = node_wires['wires']
+
+        def read_nodes():
+            for node in progressbar.progressbar(nodes):
+                with OpenSafeFile(node) as f:
+                    node_wires = json5.load(f)
+                    yield node_wires['node'], [
+                        wire['wire'] for wire in node_wires['wires']
+                    ]
+
+        self.load_from_node_wires(read_nodes())
+
+    def load_from_node_wires(self, node_wires):
+        """ Load from iterable of (node, list of wire names). """
+        node_names = []
+        wire_counts = []
+        wire_tiles = []
+        wire_names = []
+        for node, wires in node_wires:
+            node_names.append(node)
+            wire_counts.append(len(wires))
+            for wire in wires:
+                tile, _, wire_name = wire.partition('/')
+                wire_tiles.append(tile)
+                wire_names.append(wire_name)
+
+        node_names = np.array(node_names, dtype=np.bytes_)
+        self.node_names, node_index, node_counts = np.unique(
+            node_names, return_index=True, return_counts=True)
+        assert np.all(node_counts == 1), 'Nodes are not unique'
+
+        # Wire rows of each node, in node_names order.
+        wire_counts = np.array(wire_counts, dtype=np.int64)
+        first_wire = np.zeros(len(wire_counts), dtype=np.int64)
+        np.cumsum(wire_counts[:-1], out=first_wire[1:])
+
+        wire_counts = wire_counts[node_index]
+        self.node_ptr = np.zeros(len(node_index) + 1, dtype=np.int64)
+        np.cumsum(wire_counts, out=self.node_ptr[1:])
+        wire_rows = np.arange(self.node_ptr[-1], dtype=np.int64)
+        wire_rows += np.repeat(
+            first_wire[node_index] - self.node_ptr[:-1], wire_counts)
+
+        self.tile_names, wire_tile = np.unique(
+            np.array(wire_tiles, dtype=np.bytes_), return_inverse=True)
+        self.wire_names, wire_name = np.unique(
+            np.array(wire_names, dtype=np.bytes_), return_inverse=True)
+        self.wire_tile = wire_tile.astype(np.int32)[wire_rows]
+        self.wire_name = wire_name.astype(np.int32)[wire_rows]
+
+        self.tile_wires = np.argsort(self.wire_tile, kind='stable')
+        self.tile_ptr = np.zeros(len(self.tile_names) + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(self.wire_tile, minlength=len(self.tile_names)),
+            out=self.tile_ptr[1:])
 
     def load_from_file(self, fname):
-        with OpenSafeFile(fname, 'rb') as f:
-            self.nodes = pickle.load(f)
+        """ Load from directory written by save_to_file.
+
+        Also accepts the pickle of map of node to wires of older versions.
+        """
+        if not os.path.isdir(fname):
+            with OpenSafeFile(fname, 'rb') as f:
+                self.load_from_nodes(pickle.load(f))
+            return
+
+        for name in self.ARRAYS:
+            path = os.path.join(fname, '{}.npy'.format(name))
+            setattr(self, name, np.load(path, mmap_mode='r'))
 
     def save_to_file(self, fname):
-        with OpenSafeFile(fname, 'wb') as f:
-            pickle.dump(self.nodes, f)
+        os.makedirs(fname, exist_ok=True)
+        for name in self.ARRAYS:
+            path = os.path.join(fname, '{}.npy'.format(name))
+            np.save(path, getattr(self, name))
+
+    def _find(self, names, name):
+        """ Return id of name in sorted names array, or None. """
+        name = name.encode()
+        idx = np.searchsorted(names, name)
+        if idx < len(names) and names[idx] == name:
+            return int(idx)
+
+        return None
+
+    def get_nodes(self):
+        """ Yields names of all nodes, in sorted order. """
+        for node in self.node_names:
+            yield node.decode()
+
+    def wires_for_node(self, node):
+        """ Returns tuple of wire names (including the tile) of node. """
+        node_id = self._find(self.node_names, node)
+        if node_id is None:
+            raise KeyError(node)
+
+        wires = []
+        start, end = self.node_ptr[node_id:node_id + 2]
+        for tile_id, wire_id in zip(self.wire_tile[start:end].tolist(),
+                                    self.wire_name[start:end].tolist()):
+            tile = self.tile_names[tile_id].decode()
+            wire = self.wire_names[wire_id].decode()
+            wires.append('{}/{}'.format(tile, wire))
+
+        return tuple(wires)
 
     def site_pin_node_to_wires(self, tile, node):
         if node is None:
             return
 
-        node_wires = self.nodes[node]
+        node_id = self._find(self.node_names, node)
+        if node_id is None:
+            raise KeyError(node)
 
-        for wire in node_wires:
-            if wire['wire'].startswith(tile + '/'):
-                yield wire['wire'][len(tile) + 1:]
+        tile_id = self._find(self.tile_names, tile)
+        if tile_id is None:
+            return
+
+        start, end = self.node_ptr[node_id:node_id + 2]
+        in_tile = self.wire_tile[start:end] == tile_id
+        for wire_id in self.wire_name[start:end][in_tile].tolist():
+            yield self.wire_names[wire_id].decode()
 
     def wires_for_tile(self, tile):
-        for node in self.nodes.values():
-            for wire in node:
-                if wire['wire'].startswith(tile + '/'):
-                    yield wire['wire'][len(tile) + 1:]
+        tile_id = self._find(self.tile_names, tile)
+        if tile_id is None:
+            return
+
+        start, end = self.tile_ptr[tile_id:tile_id + 2]
+        for wire_id in self.wire_name[self.tile_wires[start:end]].tolist():
+            yield self.wire_names[wire_id].decode()
 
 
 def compare_prototype_site(proto_a, proto_b):
@@ -48,17 +48,47 @@ other tags responsible for enabling other features of that block.
 import sys
 import os
 import argparse
-import itertools
 import json
+import multiprocessing
+from collections import namedtuple
+from multiprocessing import shared_memory
 
 import numpy as np
 import numpy.linalg as linalg
 
+from prjxray import columnar_segdata
 from prjxray.util import OpenSafeFile
 
 # =============================================================================
 
 
+def iter_segdata(file_name, segments, tagfilter, address_map):
+    """
+    Yields the segdata of (segname, bits, tags) segments read from file_name,
+    as returned by load_data.
+    """
+
+    for segname, bits, tags in segments:
+        tags = [(tag, value) for tag, value in tags if tagfilter(tag)]
+        if not len(tags):
+            continue
+
+        # Map segment address to tile name
+        if address_map is not None:
+            address = segname.split("_")
+            address = (
+                int(address[0], base=16),
+                int(address[1]),
+            )
+            if address in address_map:
+                segname = "_or_".join(address_map[address])
+
+        # Append file name
+        segname = file_name + ":" + segname
+
+        yield {"seg": segname, "bit": list(bits), "tag": tags}
+
+
 def load_data(file_name, tagfilter=lambda tag: True, address_map=None):
     """
     Loads data generated by the segmaker.
@@ -67,7 +97,8 @@ def load_data(file_name, tagfilter=lambda tag: True, address_map=None):
     ----------
 
     file_name:
-        Name of the text file with data.
+        Name of the text file with data, or of a columnar segdata file
+        (see columnar_segdata.py) if it ends with ".npz".
     tagfilter:
         A function for filtering tags. Should reqturn True or False.
     address_map:
@@ -82,66 +113,14 @@ def load_data(file_name, tagfilter=lambda tag: True, address_map=None):
         - "tag": A list of tuples (tag name, tag value)
     """
 
-    segdata = None
-    all_segdata = []
+    if file_name.endswith(".npz"):
+        segments = columnar_segdata.iter_segments(
+            columnar_segdata.read(file_name))
+        return list(iter_segdata(file_name, segments, tagfilter, address_map))
 
     with OpenSafeFile(file_name, "r") as fp:
-        for line in fp.readlines():
-            line = line.strip()
-
-            # Segment tag
-            if line.startswith("seg"):
-                fields = line.split()
-
-                if segdata is not None:
-                    if len(segdata["tag"]):
-                        all_segdata.append(segdata)
-                    segdata = None
-
-                segname = fields[1]
-
-                # Map segment address to tile name
-                if address_map is not None:
-                    address = segname.split("_")
-                    address = (
-                        int(address[0], base=16),
-                        int(address[1]),
-                    )
-                    if address in address_map:
-                        segname = "_or_".join(address_map[address])
-
-                # Append file name
-                segname = file_name + ":" + segname
-
-                # Append segdata
-                segdata = {"seg": segname, "bit": [], "tag": []}
-
-            if segdata is None:
-                continue
-
-            # Bit tag
-            if line.startswith("bit"):
-                fields = line.split()
-                segdata["bit"].append(fields[1])
-
-            # Tag tag
-            if line.startswith("tag"):
-                fields = line.split()
-
-                if not tagfilter(fields[1]):
-                    continue
-
-                segdata["tag"].append((
-                    fields[1],
-                    int(fields[2]),
-                ))
-
-    # Store the last segment if any
-    if segdata is not None:
-        if len(segdata["tag"]):
-            all_segdata.append(segdata)
-
-    return all_segdata
+        segments = columnar_segdata.iter_text_segments(fp)
+        return list(iter_segdata(file_name, segments, tagfilter, address_map))
 
 
 def write_segbits(file_name, all_tags, all_bits, W):
@@ -331,6 +310,126 @@ def dump_correlation_report(
 
 # =============================================================================
 
+# Segdata encoded as index arrays, see encode_segdata.
+SegdataMatrix = namedtuple(
+    "SegdataMatrix", "n_rows bit_rows bit_cols tag_rows tag_cols tag_values")
+
+
+def encode_segdata(all_tags, all_bits, segdata):
+    """
+    Encodes segdata as index arrays, the sparse input of build_matrices.
+
+    Parameters
+    ----------
+
+    all_tags:
+        List of considered tags.
+    all_bits:
+        List of considered bits.
+    segdata:
+        List of segdata used.
+
+    Returns
+    -------
+
+    A SegdataMatrix with:
+    - n_rows: Number of segdata.
+    - bit_rows, bit_cols: Segdata index and index in all_bits of each bit
+      set in a segdata.
+    - tag_rows, tag_cols, tag_values: Segdata index, index in all_tags and
+      value of each tag of a segdata. If a segdata lists a tag more than once
+      its last value is used.
+
+    Bits and tags which are not considered are skipped.
+    """
+
+    bit_index = dict((bit, i) for i, bit in enumerate(all_bits))
+    tag_index = dict((tag, i) for i, tag in enumerate(all_tags))
+
+    bit_rows = []
+    bit_cols = []
+    tag_rows = []
+    tag_cols = []
+    tag_values = []
+
+    for r, data in enumerate(segdata):
+        cols = set(bit_index[b] for b in data["bit"] if b in bit_index)
+        bit_rows.extend([r] * len(cols))
+        bit_cols.extend(cols)
+
+        tags = {}
+        for t, x in data["tag"]:
+            if t in tag_index:
+                tags[tag_index[t]] = x
+
+        tag_rows.extend([r] * len(tags))
+        tag_cols.extend(tags.keys())
+        tag_values.extend(tags.values())
+
+    return SegdataMatrix(
+        n_rows=len(segdata),
+        bit_rows=np.array(bit_rows, dtype=np.int64),
+        bit_cols=np.array(bit_cols, dtype=np.int64),
+        tag_rows=np.array(tag_rows, dtype=np.int64),
+        tag_cols=np.array(tag_cols, dtype=np.int64),
+        tag_values=np.array(tag_values, dtype=np.int64),
+    )
+
+
+def encode_columnar_segdata(
+        all_tags, all_bits, columns, tagfilter=lambda tag: True):
+    """
+    Encodes ColumnarSegdata (see columnar_segdata.py) as index arrays, without
+    building the segdata list.
+
+    Rows are the segments of columns with at least one tag passing tagfilter,
+    the result is the same as encode_segdata of the segdata loaded with
+    load_data.
+    """
+
+    return SegdataMatrix(
+        *columnar_segdata.index_arrays(columns, all_tags, all_bits, tagfilter))
+
+
+def concatenate_segdata_matrices(encoded_list):
+    """
+    Concatenates the rows of SegdataMatrix encoded with the same tags and bits.
+    """
+
+    offsets = np.cumsum([0] + [encoded.n_rows for encoded in encoded_list])
+
+    def concatenate(field, offset=False):
+        arrays = [
+            getattr(encoded, field) + (offsets[i] if offset else 0)
+            for i, encoded in enumerate(encoded_list)
+        ]
+        return np.concatenate(arrays + [np.zeros(0, dtype=np.int64)])
+
+    return SegdataMatrix(
+        n_rows=int(offsets[-1]),
+        bit_rows=concatenate("bit_rows", offset=True),
+        bit_cols=concatenate("bit_cols"),
+        tag_rows=concatenate("tag_rows", offset=True),
+        tag_cols=concatenate("tag_cols"),
+        tag_values=concatenate("tag_values"),
+    )
+
+
+def columnar_bits_and_tags(columns, tagfilter=lambda tag: True):
+    """
+    Returns the sets of bits and tags of the segments of ColumnarSegdata
+    loaded by load_data, i.e. bits of segments with a tag passing tagfilter
+    and tags passing tagfilter.
+    """
+
+    tags = [tag for tag in columns.tag_names.tolist() if tagfilter(tag)]
+    bits = columns.bit_names.tolist()
+    encoded = encode_columnar_segdata(tags, bits, columns, tagfilter)
+
+    return (
+        set(bits[i] for i in np.unique(encoded.bit_cols).tolist()),
+        set(tags[i] for i in np.unique(encoded.tag_cols).tolist()))
+
 
 def build_matrices(all_tags, all_bits, segdata, bias=0.0):
     """
@@ -344,31 +443,27 @@ def build_matrices(all_tags, all_bits, segdata, bias=0.0):
     all_bits:
         List of considered bits.
     segdata:
-        List of segdata used.
+        List of segdata used, or a SegdataMatrix encoded with the same
+        all_tags and all_bits.
     bias:
         T.B.D.
     """
 
-    M = len(segdata)
+    if not isinstance(segdata, SegdataMatrix):
+        segdata = encode_segdata(all_tags, all_bits, segdata)
+
+    M = segdata.n_rows
     N = len(all_bits)
     K = len(all_tags)
 
-    A = np.zeros((M, N), dtype=np.float64)
-    B = np.zeros((M, K), dtype=np.float64)
-
-    # A matrix
-    for r, c in itertools.product(range(M), range(N)):
-        if all_bits[c] in segdata[r]["bit"]:
-            A[r, c] = +1.0
-        else:
-            A[r, c] = -1.0
+    # A matrix, +1 for set bits and -1 for others
+    A = np.full((M, N), -1.0, dtype=np.float64)
+    A[segdata.bit_rows, segdata.bit_cols] = +1.0
 
-    # B matrix
-    for r, c in itertools.product(range(M), range(K)):
-        for t, x in segdata[r]["tag"]:
-            if t == all_tags[c]:
-                v = +1.0 if x > 0 else -1.0
-                B[r, c] = v + bias
+    # B matrix, +1 or -1 plus bias for tags and 0 for absent tags
+    B = np.zeros((M, K), dtype=np.float64)
+    B[segdata.tag_rows, segdata.tag_cols] = np.where(
+        segdata.tag_values > 0, +1.0, -1.0) + bias
 
     return A, B
 
@@ -407,6 +502,24 @@ def compute_error(A, B, X):
 # =============================================================================
 
 
+def solve_lms_matrices(A, B):
+    """
+    Solves the system A X = B using direct least square solution (NumPy)
+
+    Returns
+    -------
+
+    Tuple with:
+    - Solution matrix X
+    - Error vector.
+
+    """
+
+    X, res, r, s = linalg.lstsq(A, B, rcond=None)
+
+    return X, compute_error(A, B, X)
+
+
 def solve_lms(all_tags, all_bits, segdata, bias=0.0):
     """
     Solves using direct least square solution (NumPy)
@@ -427,8 +540,35 @@ def solve_lms(all_tags, all_bits, segdata, bias=0.0):
     # Build matrices
     A, B = build_matrices(all_tags, all_bits, segdata, bias)
 
-    # Solve
-    X, res, r, s = linalg.lstsq(A, B, rcond=None)
+    return solve_lms_matrices(A, B)
+
+
+def solve_tichonov_matrices(A, B, a=0.0):
+    """
+    Solves the system A X = B using Tichonov regularization method.
+
+    Parameters
+    ----------
+
+    a:
+        Regularization coefficient.
+
+    Returns
+    -------
+
+    Tuple with:
+    - Solution matrix X
+    - Error vector.
+
+    """
+
+    N = A.shape[1]
+
+    # Tikhonov regularization
+    # https://en.wikipedia.org/wiki/Tikhonov_regularization
+    AtA = np.matmul(A.T, A)
+    AtB = np.matmul(A.T, B)
+    X = np.matmul(np.linalg.inv(AtA + a * np.eye(N)), AtB)
 
     return X, compute_error(A, B, X)
 
@@ -460,26 +600,94 @@ def solve_tichonov(all_tags, all_bits, segdata, bias=0.0, a=0.0):
 
     """
 
-    M = len(segdata)
-    N = len(all_bits)
-    K = len(all_tags)
-
     # Build matrices
     A, B = build_matrices(all_tags, all_bits, segdata, bias)
 
-    # Tikhonov regularization
-    # https://en.wikipedia.org/wiki/Tikhonov_regularization
-    AtA = np.matmul(A.T, A)
-    AtB = np.matmul(A.T, B)
-    X = np.matmul(np.linalg.inv(AtA + a * np.eye(N)), AtB)
+    return solve_tichonov_matrices(A, B, a=a)
 
-    return X, compute_error(A, B, X)
 
+# Solvers of solve_onebyone which can be applied to rows of prebuilt matrices.
+MATRIX_SOLVERS = {
+    solve_lms: solve_lms_matrices,
+    solve_tichonov: solve_tichonov_matrices,
+}
 
 # =============================================================================
 
+# Matrices A and B of solve_onebyone attached by its worker processes, along
+# with their SharedMemory blocks.
+_SHARED_MATRICES = {}
+
+
+def _attach_shared_matrices(specs):
+    """ Pool initializer attaching the shared matrices described by specs. """
+    for name, (shm_name, shape) in specs.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _SHARED_MATRICES[name] = (
+            shm, np.ndarray(shape, dtype=np.float64, buffer=shm.buf))
+
+
+def _solve_group(A, B, group, matrix_solver, kw):
+    """ Solves the tag columns of group on their rows of A and B. """
+    cols, rows = group
+    return matrix_solver(A[rows], B[np.ix_(rows, cols)], **kw)
+
 
-def solve_onebyone(all_tags, all_bits, segdata, solver=solve_lms, **kw):
+def _solve_group_shared(args):
+    """ Worker of solve_onebyone, see _solve_group. """
+    group, matrix_solver, kw = args
+    return _solve_group(
+        _SHARED_MATRICES["A"][1], _SHARED_MATRICES["B"][1], group,
+        matrix_solver, kw)
+
+
+def group_tag_rows(encoded, n_tags, batch=False):
+    """
+    Groups tags by the segdata rows they are present in.
+
+    Parameters
+    ----------
+
+    encoded:
+        SegdataMatrix of the segdata.
+    n_tags:
+        Number of considered tags.
+    batch:
+        If True, tags present in the same set of rows are grouped together,
+        otherwise each tag is a group of its own.
+
+    Returns
+    -------
+
+    A list of tuples (tag indices, row indices), in order of the first tag
+    of each group.
+    """
+
+    order = np.lexsort((encoded.tag_rows, encoded.tag_cols))
+    tag_ptr = np.zeros(n_tags + 1, dtype=np.int64)
+    np.cumsum(np.bincount(encoded.tag_cols, minlength=n_tags), out=tag_ptr[1:])
+    rows = encoded.tag_rows[order]
+
+    groups = []
+    group_of_rows = {}
+    for k in range(n_tags):
+        tag_rows = rows[tag_ptr[k]:tag_ptr[k + 1]]
+
+        if batch:
+            key = tag_rows.tobytes()
+            if key in group_of_rows:
+                groups[group_of_rows[key]][0].append(k)
+                continue
+            group_of_rows[key] = len(groups)
+
+        groups.append(([k], tag_rows))
+
+    return groups
+
+
+def solve_onebyone(
+        all_tags, all_bits, segdata, solver=solve_lms, jobs=1, batch=False,
+        **kw):
     """
     Solves each tag separately in one-by-one fashion.
 
@@ -491,9 +699,17 @@ def solve_onebyone(all_tags, all_bits, segdata, solver=solve_lms, **kw):
     all_bits:
         List of considered bits.
     segdata:
-        List of segdata used.
+        List of segdata used, or a SegdataMatrix encoded with the same
+        all_tags and all_bits for solvers in MATRIX_SOLVERS.
     solver:
         Solver function.
+    jobs:
+        Number of processes solving tags.  The matrices are built once and
+        placed in shared memory, and each process solves a tag on its rows.
+        Only used for solvers in MATRIX_SOLVERS.
+    batch:
+        If True, tags present in the same segdata are solved at once, as one
+        system with multiple right-hand sides.
     **kw:
         Parameters to solver function.
 
@@ -509,19 +725,298 @@ def solve_onebyone(all_tags, all_bits, segdata, solver=solve_lms, **kw):
     X = np.empty((len(all_bits), len(all_tags)))
     E = np.empty((len(all_tags)))
 
-    for i, tag in enumerate(all_tags):
+    if isinstance(segdata, SegdataMatrix):
+        assert solver in MATRIX_SOLVERS, solver
+        encoded = segdata
+    else:
+        encoded = encode_segdata(all_tags, all_bits, segdata)
+    groups = group_tag_rows(encoded, len(all_tags), batch)
+
+    def store(group, X1, E1):
+        cols, rows = group
+        for i in cols:
+            print("%s #%d" % (all_tags[i], len(rows)))
+
+        X[:, cols] = X1
+        E[cols] = E1
+
+    if solver not in MATRIX_SOLVERS:
+        for cols, rows in groups:
+            tags = [all_tags[i] for i in cols]
+            tag_segdata = [segdata[r] for r in rows]
+            store((cols, rows), *solver(tags, all_bits, tag_segdata, **kw))
+
+        return X, E
+
+    matrix_solver = MATRIX_SOLVERS[solver]
+    bias = kw.pop("bias", 0.0)
+    A, B = build_matrices(all_tags, all_bits, encoded, bias)
+
+    if jobs <= 1 or len(groups) <= 1:
+        for group in groups:
+            store(group, *_solve_group(A, B, group, matrix_solver, kw))
+
+        return X, E
+
+    shms = []
+    try:
+        specs = {}
+        for name, matrix in (("A", A), ("B", B)):
+            shm = shared_memory.SharedMemory(
+                create=True, size=max(matrix.nbytes, 1))
+            shms.append(shm)
+            np.ndarray(
+                matrix.shape, dtype=np.float64, buffer=shm.buf)[...] = matrix
+            specs[name] = (shm.name, matrix.shape)
+
+        tasks = [(group, matrix_solver, kw) for group in groups]
+        with multiprocessing.Pool(jobs, _attach_shared_matrices,
+                                  (specs, )) as pool:
+            results = pool.imap(_solve_group_shared, tasks)
+            for group, (X1, E1) in zip(groups, results):
+                store(group, X1, E1)
+    finally:
+        for shm in shms:
+            shm.close()
+            shm.unlink()
 
-        tag_segdata = [
-            data for data in segdata if tag in [t[0] for t in data["tag"]]
-        ]
-        print("%s #%d" % (tag, len(tag_segdata)))
+    return X, E
 
-        X1, E1 = solver([tag], all_bits, tag_segdata, **kw)
 
-        X[:, i] = X1[:, 0]
-        E[i] = E1[0]
+# =============================================================================
 
-    return X, E
+
+class NormalEquations(object):
+    """
+    Accumulates the normal equations A^T A X = A^T B of segdata.
+
+    Segdata can be added in batches, e.g. one file at a time, and the
+    accumulator can be saved to and loaded from a file, so memory use does
+    not depend on the number of specimens and a solution can be recomputed
+    after each batch of specimens.
+
+    Bits and tags are indexed in order of first appearance.  As A holds -1
+    for bits which are not set, a new bit is accounted for in the rows added
+    before it was seen using the column sums of A and B.
+
+    Attributes
+    ----------
+
+    bias:
+        Bias used when building B, see build_matrices.
+    tag_filter:
+        Text of the tag filter (-f) the segdata was loaded with, "" for all
+        tags.
+    files:
+        Names of the files added, see add_segdata.
+    all_bits, all_tags:
+        Lists of bits and tags seen.
+    n_rows:
+        Number of segdata added.
+    AtA, AtB:
+        A^T A (N x N) and A^T B (N x K).
+    A_sum, B_sum, B_sq:
+        Column sums of A and B and of the squares of B.
+    bit_count:
+        Number of segdata each bit is set in.
+    tag_count:
+        Number of segdata each tag is 0 (column 0) and 1 (column 1) in.
+    """
+
+    ARRAYS = ("AtA", "AtB", "A_sum", "B_sum", "B_sq", "bit_count", "tag_count")
+
+    def __init__(self, bias=0.0, tag_filter=""):
+        self.bias = bias
+        self.tag_filter = tag_filter
+        self.files = []
+        self.all_bits = []
+        self.all_tags = []
+        self.n_rows = 0
+
+        self.AtA = np.zeros((0, 0), dtype=np.float64)
+        self.AtB = np.zeros((0, 0), dtype=np.float64)
+        self.A_sum = np.zeros(0, dtype=np.float64)
+        self.B_sum = np.zeros(0, dtype=np.float64)
+        self.B_sq = np.zeros(0, dtype=np.float64)
+        self.bit_count = np.zeros(0, dtype=np.int64)
+        self.tag_count = np.zeros((0, 2), dtype=np.int64)
+
+    def _add_bits(self, bits):
+        """ Adds columns of A for new bits, -1 in all rows added so far. """
+        N = len(self.all_bits)
+        N1 = N + len(bits)
+        self.all_bits.extend(bits)
+
+        AtA = np.full((N1, N1), float(self.n_rows))
+        AtA[:N, :N] = self.AtA
+        AtA[:N, N:] = -self.A_sum[:, None]
+        AtA[N:, :N] = -self.A_sum[None, :]
+        self.AtA = AtA
+
+        AtB = np.empty((N1, len(self.all_tags)))
+        AtB[:N] = self.AtB
+        AtB[N:] = -self.B_sum[None, :]
+        self.AtB = AtB
+
+        self.A_sum = np.concatenate(
+            (self.A_sum, np.full(len(bits), -float(self.n_rows))))
+        self.bit_count = np.concatenate(
+            (self.bit_count, np.zeros(len(bits), dtype=np.int64)))
+
+    def _add_tags(self, tags):
+        """ Adds columns of B for new tags, 0 in all rows added so far. """
+        self.all_tags.extend(tags)
+
+        self.AtB = np.hstack(
+            (self.AtB, np.zeros((len(self.all_bits), len(tags)))))
+        self.B_sum = np.concatenate((self.B_sum, np.zeros(len(tags))))
+        self.B_sq = np.concatenate((self.B_sq, np.zeros(len(tags))))
+        self.tag_count = np.vstack(
+            (self.tag_count, np.zeros((len(tags), 2), dtype=np.int64)))
+
+    def add_segdata(self, segdata, file_name=None):
+        """
+        Adds rows of segdata to the normal equations.
+
+        If file_name is given it is recorded in files, a file can only be
+        added once.
+        """
+
+        if file_name is not None:
+            assert file_name not in self.files, file_name
+            self.files.append(file_name)
+
+        known_bits = set(self.all_bits)
+        new_bits = []
+        known_tags = set(self.all_tags)
+        new_tags = []
+        for data in segdata:
+            for bit in data["bit"]:
+                if bit not in known_bits:
+                    known_bits.add(bit)
+                    new_bits.append(bit)
+
+            for tag, _ in data["tag"]:
+                if tag not in known_tags:
+                    known_tags.add(tag)
+                    new_tags.append(tag)
+
+        self._add_bits(new_bits)
+        self._add_tags(new_tags)
+
+        encoded = encode_segdata(self.all_tags, self.all_bits, segdata)
+        A, B = build_matrices(self.all_tags, self.all_bits, encoded, self.bias)
+
+        self.n_rows += encoded.n_rows
+        self.AtA += np.matmul(A.T, A)
+        self.AtB += np.matmul(A.T, B)
+        self.A_sum += np.sum(A, axis=0)
+        self.B_sum += np.sum(B, axis=0)
+        self.B_sq += np.sum(np.square(B), axis=0)
+        self.bit_count += np.bincount(
+            encoded.bit_cols, minlength=len(self.all_bits))
+        np.add.at(
+            self.tag_count,
+            (encoded.tag_cols, (encoded.tag_values > 0).astype(np.int64)), 1)
+
+    def const1_bits(self):
+        """
+        Returns a list of bits set in all segdata.
+        """
+        return [
+            bit for bit, count in zip(self.all_bits, self.bit_count.tolist())
+            if count == self.n_rows
+        ]
+
+    def tag_stats(self):
+        """
+        Returns a dict indexed by tag name with tuples containing 0 and 1
+        occurrence count, like compute_tag_stats.
+        """
+        return dict(
+            (tag, tuple(count))
+            for tag, count in zip(self.all_tags, self.tag_count.tolist()))
+
+    def solve(self, all_tags, all_bits, a=None):
+        """
+        Solves the normal equations for a subset of the bits and tags.
+
+        Parameters
+        ----------
+
+        all_tags:
+            List of considered tags.
+        all_bits:
+            List of considered bits.
+        a:
+            Tichonov regularization coefficient, or None for a plain least
+            square solution.
+
+        Returns
+        -------
+
+        Tuple with:
+        - Solution matrix X
+        - Error vector, as computed by compute_error on the full matrices.
+
+        """
+
+        bit_index = dict((bit, i) for i, bit in enumerate(self.all_bits))
+        tag_index = dict((tag, i) for i, tag in enumerate(self.all_tags))
+        bits = np.array([bit_index[bit] for bit in all_bits], dtype=np.int64)
+        tags = np.array([tag_index[tag] for tag in all_tags], dtype=np.int64)
+
+        AtA = self.AtA[np.ix_(bits, bits)]
+        AtB = self.AtB[np.ix_(bits, tags)]
+
+        if a is None:
+            X, res, r, s = linalg.lstsq(AtA, AtB, rcond=None)
+        else:
+            X = np.matmul(np.linalg.inv(AtA + a * np.eye(len(bits))), AtB)
+
+        # |A x - b|^2 = x^T A^T A x - 2 x^T A^T b + b^T b
+        E2 = np.sum(
+            X * np.matmul(AtA, X), axis=0) - 2 * np.sum(
+                X * AtB, axis=0) + self.B_sq[tags]
+
+        return X, np.sqrt(np.maximum(E2, 0.0))
+
+    def save(self, file_name):
+        """
+        Saves the accumulator to file_name, as a NumPy .npz file.
+        """
+
+        arrays = dict((name, getattr(self, name)) for name in self.ARRAYS)
+        tmp_name = file_name + ".tmp"
+        with open(tmp_name, "wb") as fp:
+            np.savez(
+                fp,
+                all_bits=np.array(self.all_bits, dtype=str),
+                all_tags=np.array(self.all_tags, dtype=str),
+                files=np.array(self.files, dtype=str),
+                tag_filter=self.tag_filter,
+                bias=self.bias,
+                n_rows=self.n_rows,
+                **arrays)
+        os.replace(tmp_name, file_name)
+
+    @classmethod
+    def load(cls, file_name):
+        """
+        Loads an accumulator saved by save.
+        """
+
+        with np.load(file_name) as data:
+            self = cls(
+                bias=float(data["bias"]), tag_filter=str(data["tag_filter"]))
+            self.files = data["files"].tolist()
+            self.all_bits = data["all_bits"].tolist()
+            self.all_tags = data["all_tags"].tolist()
+            self.n_rows = int(data["n_rows"])
+            for name in cls.ARRAYS:
+                setattr(self, name, data[name])
+
+        return self
 
 
 # =============================================================================
@@ -576,58 +1071,51 @@ def compute_bit_correlations(tags_to_solve, bits_to_solve, segdata, W):
     does not occur.
     """
 
-    C = np.zeros_like(W, dtype=float)
-    exceptions = {}
-
-    for i, tag in enumerate(tags_to_solve):
+    encoded = encode_segdata(tags_to_solve, bits_to_solve, segdata)
+    M = encoded.n_rows
+    N = len(bits_to_solve)
+    K = len(tags_to_solve)
+
+    # Specimen x bit matrix of set bits, and specimen x tag matrices of tags
+    # being 1 and 0.
+    bits = np.zeros((M, N), dtype=np.float64)
+    bits[encoded.bit_rows, encoded.bit_cols] = 1.0
+    ones = np.zeros((M, K), dtype=np.float64)
+    ones[encoded.tag_rows, encoded.tag_cols] = encoded.tag_values == 1
+    zeros = np.zeros((M, K), dtype=np.float64)
+    zeros[encoded.tag_rows, encoded.tag_cols] = encoded.tag_values == 0
+
+    # Number of specimens with each tag, and of those where the bit follows
+    # the tag value (positive correlation) or its complement (negative
+    # correlation).
+    counts = np.bincount(encoded.tag_cols, minlength=K)[:, None]
+    positive = np.matmul(ones.T, bits) + np.matmul(zeros.T, 1.0 - bits)
+    negative = np.matmul(zeros.T, bits) + np.matmul(ones.T, 1.0 - bits)
+    matches = np.where(W < 0, negative, positive)
 
-        # Filter data for this tag
-        tag_segdata = [
-            data for data in segdata if tag in [t[0] for t in data["tag"]]
-        ]
-        exceptions[tag] = {}
-
-        # Compute bit correlation
-        for j, bit in enumerate(bits_to_solve):
-            w = W[i, j]
-
-            # No correlation with that bit
-            if w == 0:
-                continue
-
-            corr_sum = 0
-            corr_count = 0
+    C = np.zeros_like(W, dtype=float)
+    correlated = (W != 0) & (counts > 0)
+    C[correlated] = (matches / np.maximum(counts, 1))[correlated]
 
-            # Compute for one bit
-            for k, data in enumerate(tag_segdata):
-                bits = data["bit"]
+    # Extract exceptions of the bits which do not always correlate
+    exceptions = dict((tag, {}) for tag in tags_to_solve)
 
-                vt = [v for t, v in data["tag"] if t == tag][0]
-                vb = 1 if bit in bits else 0
+    values = np.zeros((M, K), dtype=np.int64)
+    values[encoded.tag_rows, encoded.tag_cols] = encoded.tag_values
+    tag_rows = group_tag_rows(encoded, K)
 
-                # Negative correlation
-                if w < 0:
-                    vt = int(1 - vt)
-                else:
-                    vt = int(vt)
+    for i, j in np.argwhere(correlated & (matches < counts)).tolist():
+        rows = tag_rows[i][1]
 
-                # Correlates
-                if vt == vb:
-                    corr_sum += 1
-                # Does not correlate
-                else:
-                    if bit not in exceptions[tag]:
-                        exceptions[tag][bit] = []
-                    exceptions[tag][bit].append((
-                        vb,
-                        vt,
-                        data["seg"],
-                    ))
+        vt = values[rows, i]
+        if W[i, j] < 0:
+            vt = 1 - vt
+        vb = bits[rows, j].astype(np.int64)
 
-                corr_count += 1
-
-            # Store correlation
-            C[i, j] = corr_sum / corr_count
+        mismatch = vt != vb
+        segs = [segdata[r]["seg"] for r in rows[mismatch].tolist()]
+        exceptions[tags_to_solve[i]][bits_to_solve[j]] = list(
+            zip(vb[mismatch].tolist(), vt[mismatch].tolist(), segs))
 
     return C, exceptions
 
@@ -642,7 +1130,8 @@ def compute_tag_stats(all_tags, segdata):
     all_tags:
         Considered tags
     segdata:
-        List of segdata used
+        List of segdata used, or a SegdataMatrix encoded with the same
+        all_tags.
 
     Returns
     -------
@@ -651,6 +1140,17 @@ def compute_tag_stats(all_tags, segdata):
 
     """
 
+    if isinstance(segdata, SegdataMatrix):
+        count1 = np.bincount(
+            segdata.tag_cols[segdata.tag_values > 0],
+            minlength=len(all_tags)).tolist()
+        count0 = np.bincount(
+            segdata.tag_cols[segdata.tag_values <= 0],
+            minlength=len(all_tags)).tolist()
+
+        return dict(
+            (tag, (count0[i], count1[i])) for i, tag in enumerate(all_tags))
+
     stats = {}
 
     for i, tag in enumerate(all_tags):
@@ -780,7 +1280,7 @@ def main():
         "files",
         nargs="*",
         type=str,
-        help="Input file(s) generated by segmaker")
+        help="Input file(s) generated by segmaker, text or columnar (.npz)")
     parser.add_argument(
         "-o",
         type=str,
@@ -828,11 +1328,37 @@ def main():
 
     parser.add_argument("-b", type=float, default=0.0, help="Bias")
 
+    parser.add_argument(
+        "-j",
+        type=int,
+        default=1,
+        help="Number of processes solving tags one-by-one (def. 1)")
+    parser.add_argument(
+        "--accumulator",
+        type=str,
+        default=None,
+        help=
+        "A file accumulating the normal equations of all input files. Input "
+        "files not added yet are added to it and all tags are solved at once "
+        "from it, without keeping segdata in memory. Requires --all")
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Solve tags present in the same specimens at once")
+
     parser.add_argument("-no_0", action="store_true", help="Do not output 0s")
     parser.add_argument("-no_1", action="store_true", help="Do not output 1s")
 
     args = parser.parse_args()
 
+    if args.accumulator is not None and args.r is not None:
+        print("Bit correlation report is not available with --accumulator")
+        exit(-1)
+
+    if args.accumulator is not None and not args.all:
+        print("--accumulator solves all tags at once, it requires --all")
+        exit(-1)
+
     # Build (baseaddr, offset) -> tile name map
     database_dir = os.path.join(
         os.getenv("XRAY_DATABASE_DIR"), os.getenv("XRAY_DATABASE"),
@@ -851,39 +1377,116 @@ def main():
             return True
         return args.f in tag
 
-    for name in args.files:
-        print(name)
-        segdata.extend(load_data(name, tagfilter, address_map))
-
-    # Make list of all bits
-    all_bits = set()
-    for seg in segdata:
-        all_bits |= set(seg["bit"])
-    all_bits = sorted(list(all_bits), key=sort_bits)
-
-    # Detect bits that are always set
-    const1_bits = set(all_bits)
-    for seg in segdata:
-        const1_bits &= set(seg["bit"])
-
-    # Make list of all tags
-    all_tags = set()
-    for seg in segdata:
-        all_tags |= set([tag[0] for tag in seg["tag"]])
-    all_tags = sorted(list(all_tags))
-
-    # Count 0s and 1s for each tag
-    tag_count = {}
-    for seg in segdata:
-        for tag, val in seg["tag"]:
-
-            if tag not in tag_count:
-                tag_count[tag] = [0, 0]
-
-            if val > 0:
-                tag_count[tag][1] += 1
-            else:
-                tag_count[tag][0] += 1
+    # Columnar segdata files are encoded as index arrays without building the
+    # segdata list, unless the correlation report needs it.
+    columns = None
+    if args.accumulator is None and args.r is None and len(args.files) and all(
+            name.endswith(".npz") for name in args.files):
+        columns = []
+
+    accumulator = None
+    if args.accumulator is not None:
+        tag_filter = args.f if args.f is not None else ""
+        if os.path.exists(args.accumulator):
+            accumulator = NormalEquations.load(args.accumulator)
+            if accumulator.bias != args.b:
+                print(
+                    "Accumulator bias %f does not match -b" % accumulator.bias)
+                exit(-1)
+            if accumulator.tag_filter != tag_filter:
+                print(
+                    "Accumulator tag filter '%s' does not match -f" %
+                    accumulator.tag_filter)
+                exit(-1)
+        else:
+            accumulator = NormalEquations(bias=args.b, tag_filter=tag_filter)
+
+        for name in args.files:
+            # Segdata files are identified by their absolute path, so
+            # rerunning over the files of a campaign only adds new ones.
+            file_name = os.path.abspath(name)
+            if file_name in accumulator.files:
+                print("%s (already added)" % name)
+                continue
+
+            print(name)
+            accumulator.add_segdata(
+                load_data(name, tagfilter, address_map), file_name)
+
+        accumulator.save(args.accumulator)
+
+        all_bits = sorted(accumulator.all_bits, key=sort_bits)
+        const1_bits = set(accumulator.const1_bits())
+        all_tags = sorted(accumulator.all_tags)
+        tag_count = accumulator.tag_stats()
+        n_segs = accumulator.n_rows
+    elif columns is not None:
+        for name in args.files:
+            print(name)
+            columns.append(columnar_segdata.read(name))
+
+        # Make lists of all bits and tags
+        all_bits = set()
+        all_tags = set()
+        for file_columns in columns:
+            bits, tags = columnar_bits_and_tags(file_columns, tagfilter)
+            all_bits |= bits
+            all_tags |= tags
+        all_bits = sorted(list(all_bits), key=sort_bits)
+        all_tags = sorted(list(all_tags))
+
+        encoded = concatenate_segdata_matrices(
+            [
+                encode_columnar_segdata(
+                    all_tags, all_bits, file_columns, tagfilter)
+                for file_columns in columns
+            ])
+        n_segs = encoded.n_rows
+
+        # Detect bits that are always set
+        bit_count = np.bincount(encoded.bit_cols, minlength=len(all_bits))
+        const1_bits = set(
+            bit for bit, count in zip(all_bits, bit_count.tolist())
+            if count == n_segs)
+
+        # Count 0s and 1s for each tag
+        tag_count = compute_tag_stats(all_tags, encoded)
+    else:
+        for name in args.files:
+            print(name)
+            segdata.extend(load_data(name, tagfilter, address_map))
+
+        # Make list of all bits
+        all_bits = set()
+        for seg in segdata:
+            all_bits |= set(seg["bit"])
+        all_bits = sorted(list(all_bits), key=sort_bits)
+
+        # Detect bits that are always set
+        const1_bits = set(all_bits)
+        for seg in segdata:
+            const1_bits &= set(seg["bit"])
+
+        # Make list of all tags
+        all_tags = set()
+        for seg in segdata:
+            all_tags |= set([tag[0] for tag in seg["tag"]])
+        all_tags = sorted(list(all_tags))
+
+        # Count 0s and 1s for each tag
+        tag_count = {}
+        for seg in segdata:
+            for tag, val in seg["tag"]:
+
+                if tag not in tag_count:
+                    tag_count[tag] = [0, 0]
+
+                if val > 0:
+                    tag_count[tag][1] += 1
+                else:
+                    tag_count[tag][0] += 1
+
+        n_segs = len(segdata)
 
     # Identify const0 and const1 tags
     const_tags = {}
@@ -897,12 +1500,12 @@ def main():
     const1_tags = [t for t, v in const_tags.items() if v == 1]
 
     # Print config
-    print("# segs:", len(segdata))
+    print("# segs:", n_segs)
     print("# tags:", len(all_tags))
     print("# bits:", len(all_bits))
     print("threshold: %.2f" % th)
 
-    if len(segdata) == 0:
+    if n_segs == 0:
         print("No data!")
         exit(-1)
 
@@ -931,12 +1534,25 @@ def main():
     for bit in const1_bits:
         bits_to_solve.remove(bit)
 
+    if columns is not None:
+        segdata = concatenate_segdata_matrices(
+            [
+                encode_columnar_segdata(
+                    tags_to_solve, bits_to_solve, file_columns, tagfilter)
+                for file_columns in columns
+            ])
+
     # Statistics
-    tag_stats = compute_tag_stats(tags_to_solve, segdata)
+    if accumulator is not None:
+        tag_stats = accumulator.tag_stats()
+    else:
+        tag_stats = compute_tag_stats(tags_to_solve, segdata)
 
     # Solve
     print("Solving...")
-    if args.all:
+    if accumulator is not None:
+        X, E = accumulator.solve(tags_to_solve, bits_to_solve, a=args.a)
+    elif args.all:
         X, E = solve_tichonov(
             tags_to_solve, bits_to_solve, segdata, bias=args.b, a=args.a)
     else:
@@ -945,6 +1561,8 @@ def main():
             bits_to_solve,
             segdata,
             solver=solve_tichonov,
+            jobs=args.j,
+            batch=args.batch,
             bias=args.b,
             a=args.a)
 
@@ -976,8 +1594,9 @@ def main():
             W[r, :] = 0
 
     # Compute correlation
-    C, correlation_exceptions = compute_bit_correlations(
-        tags_to_solve, bits_to_solve, segdata, W)
+    if args.r is not None:
+        C, correlation_exceptions = compute_bit_correlations(
+            tags_to_solve, bits_to_solve, segdata, W)
 
     # Write segbits
     write_segbits(args.o, tags_to_solve, bits_to_solve, W)
@@ -8,6 +8,7 @@
 # https://opensource.org/licenses/ISC
 #
 # SPDX-License-Identifier: ISC
+import multiprocessing
 import sqlite3
 import progressbar
 import pyjson5 as json5
@@ -15,6 +16,7 @@ import os.path
 
 from prjxray.util import OpenSafeFile
 
+
 def create_tables(conn):
     c = conn.cursor()
 
@@ -41,48 +43,109 @@ def create_tables(conn):
     conn.commit()
 
 
+# Rows per executemany batch when building the database.
+INSERT_BATCH_SIZE = 100000
+
+# Names per query of the batched query methods, below the SQLite limit on the
+# number of host parameters.
+QUERY_BATCH_SIZE = 500
+
+
+def read_node(fname):
+    """ Returns (node name, wire names) of node JSON5 file. """
+    with OpenSafeFile(fname) as f:
+        node_wires = json5.load(f)
+
+    return node_wires['node'], [wire['wire'] for wire in node_wires['wires']]
+
+
+def iter_batches(items, batch_size):
+    items = list(items)
+    for start in range(0, len(items), batch_size):
+        yield items[start:start + batch_size]
+
+
 class NodeLookup(object):
     def __init__(self, database):
         self.conn = sqlite3.connect(database)
 
-    def build_database(self, nodes, tiles):
-        create_tables(self.conn)
+    def build_database(self, nodes, tiles, processes=1):
+        """ Build database from tile and node JSON5 files.
+
+        nodes: List of node JSON5 files.
+        tiles: Map of tile type to list of tile JSON5 files.
+        processes: Number of processes used to parse the node files.
 
+        """
+        # The database is rebuilt from scratch if the build fails, so
+        # durability is not needed while loading.
         c = self.conn.cursor()
+        c.execute("PRAGMA journal_mode = OFF;")
+        c.execute("PRAGMA synchronous = OFF;")
+        c.execute("PRAGMA temp_store = MEMORY;")
+        c.execute("PRAGMA cache_size = -1000000;")
+
+        create_tables(self.conn)
+
         tile_names = []
         for tile_type in tiles:
             for tile in tiles[tile_type]:
                 tile_names.append(tile)
 
         tile_pkeys = {}
-        for tile_file in progressbar.progressbar(tile_names):
+        for tile_file in tile_names:
             # build/specimen_001/tile_DSP_L_X34Y145.json5
             root, _ = os.path.splitext(os.path.basename(tile_file))
             tile = root[5:]
-            c.execute("INSERT INTO tile(name) VALUES (?);", (tile, ))
-            tile_pkeys[tile] = c.lastrowid
+            tile_pkeys[tile] = len(tile_pkeys) + 1
 
-        nodes_processed = set()
-        for node in progressbar.progressbar(nodes):
-            with OpenSafeFile(node) as f:
-                node_wires = json5.load(f)
-                assert node_wires['node'] not in nodes_processed
-                nodes_processed.add(node_wires['node'])
-
-                c.execute(
-                    "INSERT INTO node(name) VALUES (?);",
-                    (node_wires['node'], ))
-                node_pkey = c.lastrowid
-
-                for wire in node_wires['wires']:
-                    tile = wire['wire'].split('/')[0]
-
-                    tile_pkey = tile_pkeys[tile]
-                    c.execute(
-                        """
-INSERT INTO wire(name, tile_pkey, node_pkey) VALUES (?, ?, ?);""",
-                        (wire['wire'], tile_pkey, node_pkey))
+        c.executemany(
+            "INSERT INTO tile(pkey, name) VALUES (?, ?);",
+            ((pkey, tile) for tile, pkey in tile_pkeys.items()))
+
+        if processes > 1:
+            pool = multiprocessing.Pool(processes=processes)
+            node_iter = pool.imap(read_node, nodes, chunksize=64)
+        else:
+            pool = None
+            node_iter = map(read_node, nodes)
 
+        nodes_processed = set()
+        node_rows = []
+        wire_rows = []
+
+        def flush():
+            c.executemany(
+                "INSERT INTO node(pkey, name) VALUES (?, ?);", node_rows)
+            c.executemany(
+                """
+INSERT INTO wire(name, tile_pkey, node_pkey) VALUES (?, ?, ?);""", wire_rows)
+            node_rows.clear()
+            wire_rows.clear()
+
+        try:
+            with progressbar.ProgressBar(max_value=len(nodes)) as bar:
+                for idx, (node, wires) in enumerate(node_iter):
+                    assert node not in nodes_processed
+                    nodes_processed.add(node)
+
+                    node_pkey = idx + 1
+                    node_rows.append((node_pkey, node))
+
+                    for wire in wires:
+                        tile = wire.split('/')[0]
+                        wire_rows.append((wire, tile_pkeys[tile], node_pkey))
+
+                    if len(wire_rows) >= INSERT_BATCH_SIZE:
+                        flush()
+
+                    bar.update(idx + 1)
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+
+        flush()
         self.conn.commit()
 
         c = self.conn.cursor()
@@ -90,6 +153,7 @@ INSERT INTO wire(name, tile_pkey, node_pkey) VALUES (?, ?, ?);""",
         c.execute("CREATE INDEX node_names ON node(name);")
         c.execute("CREATE INDEX wire_node_tile ON wire(node_pkey, tile_pkey);")
         c.execute("CREATE INDEX wire_tile ON wire(tile_pkey);")
+        c.execute("ANALYZE;")
         self.conn.commit()
 
     def site_pin_node_to_wires(self, tile, node):
@@ -99,25 +163,77 @@ INSERT INTO wire(name, tile_pkey, node_pkey) VALUES (?, ?, ?);""",
         c = self.conn.cursor()
         c.execute(
             """
-WITH
-    the_tile(tile_pkey) AS (SELECT pkey AS tile_pkey FROM tile WHERE name = ?),
-    the_node(node_pkey) AS (SELECT pkey AS node_pkey FROM node WHERE name = ?)
 SELECT wire.name FROM wire
-    INNER JOIN the_tile ON the_tile.tile_pkey = wire.tile_pkey
-    INNER JOIN the_node ON the_node.node_pkey = wire.node_pkey;
+    WHERE wire.tile_pkey = (SELECT pkey FROM tile WHERE name = ?)
+    AND wire.node_pkey = (SELECT pkey FROM node WHERE name = ?)
+    ORDER BY wire.pkey;
 """, (tile, node))
 
         for row in c:
             yield row[0][len(tile) + 1:]
 
+    def site_pin_nodes_to_wires(self, tile, nodes):
+        """ Batched site_pin_node_to_wires for many nodes of tile.
+
+        Returns map of node to tuple of wires of node in tile.  Nodes without
+        wires in tile (and None) are not in the map.
+
+        """
+        node_wires = {}
+
+        c = self.conn.cursor()
+        c.execute("SELECT pkey FROM tile WHERE name = ?;", (tile, ))
+        row = c.fetchone()
+        if row is None:
+            return node_wires
+        tile_pkey = row[0]
+
+        nodes = set(node for node in nodes if node is not None)
+        for batch in iter_batches(sorted(nodes), QUERY_BATCH_SIZE):
+            c.execute(
+                """
+SELECT node.name, wire.name FROM node
+    INNER JOIN wire ON wire.node_pkey = node.pkey
+    WHERE wire.tile_pkey = ? AND node.name IN ({})
+    ORDER BY wire.pkey;
+""".format(','.join('?' for _ in batch)), [tile_pkey] + batch)
+
+            for node, wire in c:
+                node_wires.setdefault(node, []).append(wire[len(tile) + 1:])
+
+        return dict((node, tuple(wires)) for node, wires in node_wires.items())
+
     def wires_for_tile(self, tile):
         c = self.conn.cursor()
         c.execute(
             """
-WITH
-    the_tile(tile_pkey) AS (SELECT pkey AS tile_pkey FROM tile WHERE name = ?)
 SELECT wire.name FROM wire
-    INNER JOIN the_tile ON the_tile.tile_pkey = wire.tile_pkey;
+    WHERE wire.tile_pkey = (SELECT pkey FROM tile WHERE name = ?)
+    ORDER BY wire.pkey;
 """, (tile, ))
         for row in c:
             yield row[0][len(tile) + 1:]
+
+    def wires_for_tiles(self, tiles):
+        """ Batched wires_for_tile for many tiles.
+
+        Returns map of tile to tuple of wires of tile, for each tile in tiles.
+
+        """
+        tiles = set(tiles)
+        tile_wires = dict((tile, []) for tile in tiles)
+
+        c = self.conn.cursor()
+        for batch in iter_batches(sorted(tiles), QUERY_BATCH_SIZE):
+            c.execute(
+                """
+SELECT tile.name, wire.name FROM tile
+    INNER JOIN wire ON wire.tile_pkey = tile.pkey
+    WHERE tile.name IN ({})
+    ORDER BY wire.pkey;
+""".format(','.join('?' for _ in batch)), batch)
+
+            for tile, wire in c:
+                tile_wires[tile].append(wire[len(tile) + 1:])
+
+        return dict((tile, tuple(wires)) for tile, wires in tile_wires.items())
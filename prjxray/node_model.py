@@ -8,6 +8,86 @@
 # https://opensource.org/licenses/ISC
 #
 # SPDX-License-Identifier: ISC
+import array
+import bisect
+import os
+
+import numpy as np
+
+from prjxray import db_snapshot
+
+# Arrays of the tables of a NodeModel, see NodeModel.
+TABLE_ARRAYS = (
+    'tile_wire_base', 'wire_node', 'node_wire', 'node_ptr', 'node_wires')
+
+
+def group_wires(n_wires, connected_pkeys):
+    """ Group wires into nodes of connected wires.
+
+    n_wires: Number of wires, wires are numbered [0, n_wires) by wire pkey.
+    connected_pkeys: Iterable of (a_pkeys, b_pkeys) arrays, wire a_pkeys[i]
+                     is connected to wire b_pkeys[i].
+
+    Returns (wire_pkeys, node_starts, node_ends) arrays.  The wires of node i
+    are wire_pkeys[node_starts[i]:node_ends[i]], in pkey order.  Nodes are
+    ordered by their first wire pkey, and include nodes of a single wire.
+
+    """
+    # Union-find of wire pkeys, with path compression and union by rank.
+    parent = array.array('q', range(n_wires))
+    rank = array.array('B', bytes(n_wires))
+
+    def find(wire_pkey):
+        root = wire_pkey
+        while parent[root] != root:
+            root = parent[root]
+
+        while parent[wire_pkey] != root:
+            next_pkey = parent[wire_pkey]
+            parent[wire_pkey] = root
+            wire_pkey = next_pkey
+
+        return root
+
+    for a_pkeys, b_pkeys in connected_pkeys:
+        for a_pkey, b_pkey in zip(a_pkeys.tolist(), b_pkeys.tolist()):
+            a_root = find(a_pkey)
+            b_root = find(b_pkey)
+
+            if a_root == b_root:
+                continue
+
+            if rank[a_root] < rank[b_root]:
+                a_root, b_root = b_root, a_root
+
+            parent[b_root] = a_root
+            if rank[a_root] == rank[b_root]:
+                rank[a_root] += 1
+
+    del rank
+
+    if n_wires == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+
+    # Point every wire at its root, then group wires by root.
+    roots = np.frombuffer(parent, dtype=np.int64)
+    while True:
+        next_roots = roots[roots]
+        if np.array_equal(next_roots, roots):
+            break
+        roots = next_roots
+
+    wire_pkeys = np.argsort(roots, kind='stable')
+    node_bounds = np.concatenate(
+        ([0], np.flatnonzero(np.diff(roots[wire_pkeys])) + 1,
+         [n_wires])).astype(np.int64)
+    node_order = np.argsort(wire_pkeys[node_bounds[:-1]])
+
+    return (
+        wire_pkeys, node_bounds[:-1][node_order], node_bounds[1:][node_order])
+
+
 class NodeModel():
     """ Node lookup model
 
@@ -23,139 +103,322 @@ class NodeModel():
     It is recommended that this class be constructed by calling
     Database.node_model rather than constructing this class directly.
 
+    The model is stored in flat tables (see get_tables), which can be cached
+    with get_node_model:
+     tiles, tile_types - Name and tile type of each tile.
+     tile_type_wires - Map of tile type to list of wires of the tile type.
+     tile_wire_base - Wire pkeys of tiles[i] are
+                      [tile_wire_base[i], tile_wire_base[i + 1]), in
+                      tile_type_wires order.
+     wire_node - Node of each wire pkey, -1 for wires of unnamed nodes.
+     node_wire - Pkey of the wire naming each node.
+     node_ptr, node_wires - Wire pkeys of node i are
+                            node_wires[node_ptr[i]:node_ptr[i + 1]].
+
     """
 
     def __init__(
-            self, grid, connections, tile_wires, node_wires, progressbar=None):
+            self,
+            grid,
+            connections,
+            tile_wires,
+            node_wires,
+            progressbar=None,
+            tables=None):
+        """ Create node model.
+
+        tables: Tables from get_tables of a previously built model.  When
+                given, connections, tile_wires and node_wires are not used and
+                may be None.
+        """
         self.grid = grid
         self.connections = connections
         self.tile_wires = tile_wires
-        self.specific_node_wires = set(node_wires['specific_node_wires'])
 
-        node_pattern_wires = node_wires['node_pattern_wires']
-        self.node_pattern_wires = {}
-        for tile_type in node_pattern_wires:
-            assert tile_type not in self.node_pattern_wires
-            self.node_pattern_wires[tile_type] = set(
-                node_pattern_wires[tile_type])
+        if node_wires is not None:
+            self.specific_node_wires = set(node_wires['specific_node_wires'])
 
-        for tile_type in self.tile_wires:
-            if tile_type not in self.node_pattern_wires:
-                self.node_pattern_wires[tile_type] = set()
+            node_pattern_wires = node_wires['node_pattern_wires']
+            self.node_pattern_wires = {}
+            for tile_type in node_pattern_wires:
+                assert tile_type not in self.node_pattern_wires
+                self.node_pattern_wires[tile_type] = set(
+                    node_pattern_wires[tile_type])
 
-        self.nodes = None
+            for tile_type in self.tile_wires:
+                if tile_type not in self.node_pattern_wires:
+                    self.node_pattern_wires[tile_type] = set()
 
-        self.wire_to_node_map = None
+        self.wire_node = None
+        self.node_names = None
 
         if progressbar is None:
             self.progressbar = lambda x: x
         else:
             self.progressbar = progressbar
 
-    def _build_nodes(self):
-        tile_wire_map = {}
-        wires = {}
-        flat_wires = []
-
-        for tile in self.progressbar(self.grid.tiles()):
-            gridinfo = self.grid.gridinfo_at_tilename(tile)
-            tile_type = gridinfo.tile_type
-
-            for wire in self.tile_wires[tile_type]:
-                wire_pkey = len(flat_wires)
-                tile_wire_map[(tile, wire)] = wire_pkey
-                flat_wires.append((tile, wire))
-                wires[wire_pkey] = None
-
-        for connection in self.progressbar(self.connections.get_connections()):
-            a_pkey = tile_wire_map[(
-                connection.wire_a.tile, connection.wire_a.wire)]
-            b_pkey = tile_wire_map[(
-                connection.wire_b.tile, connection.wire_b.wire)]
-
-            a_node = wires[a_pkey]
-            b_node = wires[b_pkey]
-
-            if a_node is None:
-                a_node = set((a_pkey, ))
-
-            if b_node is None:
-                b_node = set((b_pkey, ))
+        if tables is not None:
+            self._set_tables(tables)
 
-            if a_node is not b_node:
-                a_node |= b_node
+    def _set_tables(self, tables):
+        self.tiles = tables['tiles']
+        self.tile_types = tables['tile_types']
+        self.tile_type_wires = tables['tile_type_wires']
+        for name in TABLE_ARRAYS:
+            setattr(self, name, tables[name])
 
-                for wire in a_node:
-                    wires[wire] = a_node
+        self.tile_index = dict(
+            (tile, idx) for idx, tile in enumerate(self.tiles))
+        self.tile_type_wire_index = {}
 
-        nodes = {}
-        for wire_pkey, node in self.progressbar(wires.items()):
-            if node is None:
-                node = set((wire_pkey, ))
+    def get_tables(self):
+        """ Return map of table name to table, see class documentation. """
+        self._build_nodes()
 
-            assert wire_pkey in node
+        tables = {
+            'tiles': self.tiles,
+            'tile_types': self.tile_types,
+            'tile_type_wires': self.tile_type_wires,
+        }
+        for name in TABLE_ARRAYS:
+            tables[name] = getattr(self, name)
 
-            nodes[id(node)] = node
-
-        def get_node_wire_for_wires(wire_pkeys):
-            if len(wire_pkeys) == 1:
-                for wire_pkey in wire_pkeys:
-                    return flat_wires[wire_pkey]
-
-            for wire_pkey in wire_pkeys:
-                tile, wire = flat_wires[wire_pkey]
+        return tables
 
+    def _build_nodes(self):
+        if self.wire_node is not None:
+            return
+
+        # Wire pkeys are numbered by Connections, see
+        # Connections.wire_pkeys.
+        tiles = self.connections.tiles
+        tile_wire_base = self.connections.tile_wire_base
+        tile_types = [self.connections.grid[tile]['type'] for tile in tiles]
+        tile_wire_names = [
+            self.connections.tile_type_wires[tile_type]
+            for tile_type in tile_types
+        ]
+
+        def iter_connected_pkeys():
+            for connection in self.progressbar(
+                    self.connections.get_connection_arrays()):
+                yield (
+                    self.connections.wire_pkeys(
+                        connection.tile_a, connection.wire_a),
+                    self.connections.wire_pkeys(
+                        connection.tile_b, connection.wire_b))
+
+        n_wires = int(tile_wire_base[-1])
+        tile_wire_base_list = tile_wire_base.tolist()
+        wire_pkeys, node_starts, node_ends = group_wires(
+            n_wires, iter_connected_pkeys())
+
+        # Nodes of a single wire are named by that wire, other nodes by a
+        # wire from specific_node_wires or node_pattern_wires, if any.
+        node_wire = wire_pkeys[node_starts]
+        named = node_ends - node_starts == 1
+
+        def get_node_wire_for_wires(start, end):
+            node_wires = []
+            for wire_pkey in wire_pkeys[start:end].tolist():
+                tile_idx = bisect.bisect_right(
+                    tile_wire_base_list, wire_pkey) - 1
+                wire_idx = wire_pkey - tile_wire_base_list[tile_idx]
+                node_wires.append(
+                    (
+                        wire_pkey, tiles[tile_idx], tile_types[tile_idx],
+                        tile_wire_names[tile_idx][wire_idx]))
+
+            for wire_pkey, tile, _, wire in node_wires:
                 if '{}/{}'.format(tile, wire) in self.specific_node_wires:
-                    return tile, wire
+                    return wire_pkey
 
-            for wire_pkey in wire_pkeys:
-                tile, wire = flat_wires[wire_pkey]
-
-                gridinfo = self.grid.gridinfo_at_tilename(tile)
-
-                if wire in self.node_pattern_wires[gridinfo.tile_type]:
-                    return tile, wire
+            for wire_pkey, _, tile_type, wire in node_wires:
+                if wire in self.node_pattern_wires[tile_type]:
+                    return wire_pkey
 
             return None
 
-        self.nodes = {}
-        for node_wire_pkeys in self.progressbar(nodes.values()):
-            node_wire = get_node_wire_for_wires(node_wire_pkeys)
-            if node_wire is None:
-                continue
-
-            self.nodes[node_wire] = [
-                flat_wires[wire_pkey] for wire_pkey in node_wire_pkeys
-            ]
+        for node_idx in self.progressbar(np.flatnonzero(~named).tolist()):
+            wire_pkey = get_node_wire_for_wires(
+                node_starts[node_idx], node_ends[node_idx])
+            if wire_pkey is not None:
+                node_wire[node_idx] = wire_pkey
+                named[node_idx] = True
+
+        # Store the wires of named nodes in CSR form.
+        node_starts = node_starts[named]
+        node_lengths = node_ends[named] - node_starts
+        node_ptr = np.zeros(len(node_starts) + 1, dtype=np.int64)
+        np.cumsum(node_lengths, out=node_ptr[1:])
+
+        node_wires = wire_pkeys[
+            np.repeat(node_starts - node_ptr[:-1], node_lengths) +
+            np.arange(node_ptr[-1], dtype=np.int64)]
+
+        wire_node = np.full(n_wires, -1, dtype=np.int64)
+        wire_node[node_wires] = np.repeat(
+            np.arange(len(node_starts), dtype=np.int64), node_lengths)
+
+        self._set_tables(
+            {
+                'tiles': list(tiles),
+                'tile_types': tile_types,
+                'tile_type_wires': self.connections.tile_type_wires,
+                'tile_wire_base': tile_wire_base,
+                'wire_node': wire_node,
+                'node_wire': node_wire[named],
+                'node_ptr': node_ptr,
+                'node_wires': node_wires,
+            })
+
+    def _get_wire_pkey(self, tile, wire):
+        """ Return wire pkey of wire in tile, raises KeyError if missing. """
+        tile_idx = self.tile_index[tile]
+        tile_type = self.tile_types[tile_idx]
+        if tile_type not in self.tile_type_wire_index:
+            self.tile_type_wire_index[tile_type] = dict(
+                (wire, idx)
+                for idx, wire in enumerate(self.tile_type_wires[tile_type]))
+
+        return int(self.tile_wire_base[tile_idx]
+                   ) + self.tile_type_wire_index[tile_type][wire]
+
+    def _get_tile_wires(self, wire_pkeys):
+        """ Return list of (tile, wire) of array of wire pkeys. """
+        tile_indices = np.searchsorted(
+            self.tile_wire_base, wire_pkeys, side='right') - 1
+        wire_indices = wire_pkeys - self.tile_wire_base[tile_indices]
+
+        tile_wires = []
+        for tile_idx, wire_idx in zip(tile_indices.tolist(),
+                                      wire_indices.tolist()):
+            tile_wires.append(
+                (
+                    self.tiles[tile_idx],
+                    self.tile_type_wires[self.tile_types[tile_idx]][wire_idx]))
+
+        return tile_wires
+
+    def _get_named_node(self, tile, wire):
+        """ Return node named by tile and wire, raises KeyError if missing. """
+        self._build_nodes()
+
+        wire_pkey = self._get_wire_pkey(tile, wire)
+        node = int(self.wire_node[wire_pkey])
+        if node < 0 or self.node_wire[node] != wire_pkey:
+            raise KeyError((tile, wire))
+
+        return node
+
+    def get_node_id(self, tile, wire):
+        """ Get index of node of specified tile and wire.
+
+        Node indices are [0, number of nodes), in the order of the node
+        tables.
+        """
+        self._build_nodes()
+
+        node = int(self.wire_node[self._get_wire_pkey(tile, wire)])
+        if node < 0:
+            raise KeyError((tile, wire))
+
+        return node
+
+    def get_node_name(self, node):
+        """ Get name of node index, as (tile, wire). """
+        self._build_nodes()
+
+        return self._get_tile_wires(self.node_wire[node:node + 1])[0]
 
     def get_nodes(self):
         """ Return a set of node names. """
-        if self.nodes is None:
+        if self.node_names is None:
             self._build_nodes()
+            self.node_names = dict.fromkeys(
+                self._get_tile_wires(self.node_wire))
 
-        return self.nodes.keys()
+        return self.node_names.keys()
 
     def get_wires_for_node(self, tile, wire):
         """ Get wires in node named for specified tile and wire. """
-        if self.nodes is None:
-            self._build_nodes()
+        node = self._get_named_node(tile, wire)
+
+        return self._get_tile_wires(
+            self.node_wires[self.node_ptr[node]:self.node_ptr[node + 1]])
 
-        return self.nodes[tile, wire]
+    def get_node_for_wire(self, tile, wire):
+        """ Get node for specified tile and wire. """
+        return self.get_node_name(self.get_node_id(tile, wire))
 
-    def _build_wire_to_node_map(self):
-        self.wire_to_node_map = {}
 
-        if self.nodes is None:
-            self._build_nodes()
+def node_model_paths(db):
+    """ Return paths of the tables and of each array of the cached node model.
+    """
+    return (
+        db_snapshot.cache_path(db.db_root, db.part, 'node_model'),
+        dict(
+            (
+                name,
+                db_snapshot.cache_path(
+                    db.db_root, db.part, 'node_model_' + name, 'npy'))
+            for name in TABLE_ARRAYS))
+
+
+def node_model_key(db):
+    """ Return cache key of data derived from the node model of db.
+
+    The node model is built from the tile_type_*.json wire lists, the grid,
+    tileconn.json and node_wires.json, so changes to other database files
+    (segbits, masks, site types) do not make it stale.
+    """
+    files = [
+        os.path.join(db.db_root, f)
+        for f in sorted(os.listdir(db.db_root))
+        if f.startswith('tile_type_') and f.endswith('.json')
+    ]
+    for fname in ('tilegrid.json', 'tileconn.json', 'node_wires.json'):
+        files.append(os.path.join(db.db_root, db.fabric, fname))
 
-        for node, wires in self.nodes.items():
-            for tile_wire in wires:
-                assert tile_wire not in self.wire_to_node_map
-                self.wire_to_node_map[tile_wire] = node
+    return db_snapshot.compute_files_key(
+        db.db_root, (db.part, db.fabric), files)
 
-    def get_node_for_wire(self, tile, wire):
-        """ Get node for specified tile and wire. """
-        if self.wire_to_node_map is None:
-            self._build_wire_to_node_map()
 
-        return self.wire_to_node_map[tile, wire]
+def get_node_model(db, progressbar=lambda x: x):
+    """ Returns NodeModel of db, loaded from or stored in the cache.
+
+    Arrays of a cached model are memory-mapped.
+    """
+    tables_path, array_paths = node_model_paths(db)
+    key = node_model_key(db)
+
+    tables = db_snapshot.load_cached(tables_path, key)
+    if tables is not None:
+        for name, path in array_paths.items():
+            tables[name] = db_snapshot.load_cached_array(
+                path, np.int64, tables[name])
+            if tables[name] is None:
+                tables = None
+                break
+
+    if tables is not None:
+        return NodeModel(
+            grid=db.grid(),
+            connections=None,
+            tile_wires=None,
+            node_wires=None,
+            progressbar=progressbar,
+            tables=tables)
+
+    node_model = db.node_model(progressbar)
+    tables = dict(node_model.get_tables())
+
+    for name, path in array_paths.items():
+        if not db_snapshot.save_cached_array(path, tables[name]):
+            return node_model
+
+        tables[name] = len(tables[name])
+
+    db_snapshot.save_cached(tables_path, key, tables)
+
+    return node_model
@@ -15,8 +15,9 @@ class Overlay(object):
 
     """
 
-    def __init__(self, region_dict):
+    def __init__(self, region_dict, db=None):
         self.region_dict = region_dict
+        self.grid = db.grid() if db is not None else None
 
     def tile_in_roi(self, grid_loc):
         """ Returns true if grid_loc (GridLoc tuple) is within the overlay. """
@@ -27,3 +28,26 @@ class Overlay(object):
             if x1 <= x and x <= x2 and y1 <= y and y <= y2:
                 return False
         return True
+
+    def gen_tiles(self, tile_types=None):
+        ''' Yield tile names within the overlay.
+
+        Requires the overlay to be constructed with a db.
+
+        tile_types: list of tile types to keep, or None for all
+        '''
+
+        yield from self.grid.tiles_outside_rects(
+            self.region_dict.values(), tile_types)
+
+    def gen_sites(self, site_types=None):
+        ''' Yield (tile_name, site_name, site_type) within the overlay.
+
+        Requires the overlay to be constructed with a db.
+
+        site_types: list of site types to keep, or None for all
+
+        '''
+
+        yield from self.grid.sites_outside_rects(
+            self.region_dict.values(), site_types)
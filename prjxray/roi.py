@@ -34,18 +34,8 @@ class Roi(object):
         tile_types: list of tile types to keep, or None for all
         '''
 
-        for tile_name in self.grid.tiles():
-            loc = self.grid.loc_of_tilename(tile_name)
-
-            if not self.tile_in_roi(loc):
-                continue
-
-            gridinfo = self.grid.gridinfo_at_loc(loc)
-
-            if tile_types is not None and gridinfo.tile_type not in tile_types:
-                continue
-
-            yield tile_name
+        yield from self.grid.tiles_in_rect(
+            self.x1, self.x2, self.y1, self.y2, tile_types)
 
     def gen_sites(self, site_types=None):
         ''' Yield (tile_name, site_name, site_type) within ROI.
@@ -54,16 +44,5 @@ class Roi(object):
 
         '''
 
-        for tile_name in self.grid.tiles():
-            loc = self.grid.loc_of_tilename(tile_name)
-
-            if not self.tile_in_roi(loc):
-                continue
-
-            gridinfo = self.grid.gridinfo_at_loc(loc)
-
-            for site_name, site_type in gridinfo.sites.items():
-                if site_types is not None and site_type not in site_types:
-                    continue
-
-                yield (tile_name, site_name, site_type)
+        yield from self.grid.sites_in_rect(
+            self.x1, self.x2, self.y1, self.y2, site_types)
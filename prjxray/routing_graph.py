@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020  The Project X-Ray Authors.
+#
+# Use of this source code is governed by a ISC-style
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/ISC
+#
+# SPDX-License-Identifier: ISC
+""" Directed routing graph of nodes and pips.
+
+Nodes of the graph are the nodes of a NodeModel, identified by their node
+index (see NodeModel.get_node_id).  Edges are pips: a directional pip is an
+edge from the node of net_from to the node of net_to, a bidirectional pip is
+also an edge in the backward direction.
+
+Edges are stored in compressed sparse row (CSR) form, sorted by source node,
+so the edges leaving node i are [edge_ptr[i], edge_ptr[i + 1]).
+
+The pips of a tile type are compiled once into a template of wire indices,
+and the edges of all tiles of that type are generated at once from the
+template.  The graph can be stored in the cache directory (see
+util.get_cache_dir), in which case its arrays are memory-mapped when loaded.
+
+"""
+import numpy as np
+
+from prjxray import db_snapshot
+from prjxray.node_model import node_model_key
+
+# Arrays of a RoutingGraph and their dtype, see RoutingGraph.
+GRAPH_ARRAYS = {
+    'edge_ptr': np.int64,
+    'edge_dst': np.int64,
+    'edge_tile': np.int32,
+    'edge_pip': np.int32,
+    'edge_timing': np.int32,
+    'edge_is_pseudo': np.bool_,
+    'edge_can_invert': np.bool_,
+    'edge_is_backward': np.bool_,
+}
+
+
+def compile_pip_template(tile, wire_index, timing_index):
+    """ Returns arrays of the pips of tile type tile, as used by the edges.
+
+    wire_index: Map of wire name to wire index in the tile type.
+    timing_index: Map of PipTiming to timing index, updated with new timings.
+
+    Returns map of array name to array, with one entry per edge of a tile,
+    pips referencing unknown wires are skipped.
+    """
+
+    def get_timing(timing):
+        if timing is None:
+            return -1
+
+        if timing not in timing_index:
+            timing_index[timing] = len(timing_index)
+
+        return timing_index[timing]
+
+    rows = []
+    for pip_idx, pip in enumerate(tile.get_pips()):
+        if pip.net_from not in wire_index or pip.net_to not in wire_index:
+            continue
+
+        src = wire_index[pip.net_from]
+        dst = wire_index[pip.net_to]
+        rows.append(
+            (
+                src, dst, pip_idx, get_timing(pip.timing), pip.is_pseudo,
+                pip.can_invert, False))
+
+        if not pip.is_directional:
+            rows.append(
+                (
+                    dst, src, pip_idx, get_timing(pip.backward_timing),
+                    pip.is_pseudo, pip.can_invert, True))
+
+    names = (
+        'src_wire', 'dst_wire', 'edge_pip', 'edge_timing', 'edge_is_pseudo',
+        'edge_can_invert', 'edge_is_backward')
+    dtypes = (
+        np.int64, np.int64, np.int32, np.int32, np.bool_, np.bool_, np.bool_)
+
+    columns = list(zip(*rows)) if rows else [() for _ in names]
+    return dict(
+        (name, np.array(column, dtype=dtype))
+        for name, column, dtype in zip(names, columns, dtypes))
+
+
+class RoutingGraph(object):
+    """ CSR routing graph, see module documentation.
+
+    node_model: NodeModel of the graph nodes.
+    tile_type_pips: Map of tile type to list of pip names, edge_pip is an
+                    index in the list of the tile type of edge_tile.
+    pip_timings: List of PipTiming, edge_timing is an index in the list, or
+                 -1 if the pip has no timing.
+    arrays: Map of the GRAPH_ARRAYS names to arrays:
+     edge_ptr - Edges leaving node i are [edge_ptr[i], edge_ptr[i + 1]).
+     edge_dst - Destination node of each edge.
+     edge_tile - Index in node_model.tiles of the tile of each pip.
+     edge_pip - Index of the pip in tile_type_pips.
+     edge_timing - Index of the pip timing in pip_timings.
+     edge_is_pseudo, edge_can_invert - Pip attributes.
+     edge_is_backward - True for the net_to to net_from edge of a
+                        bidirectional pip.
+
+    """
+
+    def __init__(self, node_model, tile_type_pips, pip_timings, arrays):
+        self.node_model = node_model
+        self.tile_type_pips = tile_type_pips
+        self.pip_timings = pip_timings
+        for name in GRAPH_ARRAYS:
+            setattr(self, name, arrays[name])
+
+    @classmethod
+    def build(cls, db, node_model, progressbar=lambda x: x):
+        tables = node_model.get_tables()
+        tile_wire_base = tables['tile_wire_base']
+        wire_node = tables['wire_node']
+
+        tiles_of_type = {}
+        for tile_idx, tile_type in enumerate(tables['tile_types']):
+            tiles_of_type.setdefault(tile_type, []).append(tile_idx)
+
+        tile_type_pips = {}
+        timing_index = {}
+        parts = []
+        for tile_type in progressbar(sorted(tiles_of_type)):
+            tile = db.get_tile_type(tile_type)
+            tile_type_pips[tile_type] = [pip.name for pip in tile.get_pips()]
+
+            wire_index = dict(
+                (wire, idx) for idx, wire in enumerate(
+                    tables['tile_type_wires'][tile_type]))
+            template = compile_pip_template(tile, wire_index, timing_index)
+            n_edges = len(template['src_wire'])
+            if n_edges == 0:
+                continue
+
+            # Wire pkeys of every (tile, template edge) pair.
+            tiles = np.array(tiles_of_type[tile_type], dtype=np.int64)
+            base = np.repeat(tile_wire_base[tiles], n_edges)
+            src = wire_node[base + np.tile(template['src_wire'], len(tiles))]
+            dst = wire_node[base + np.tile(template['dst_wire'], len(tiles))]
+
+            # Wires of unnamed nodes are not part of the graph.
+            keep = (src >= 0) & (dst >= 0)
+
+            part = {
+                'edge_src': src[keep],
+                'edge_dst': dst[keep],
+                'edge_tile': np.repeat(tiles, n_edges)[keep],
+            }
+            for name in ('edge_pip', 'edge_timing', 'edge_is_pseudo',
+                         'edge_can_invert', 'edge_is_backward'):
+                part[name] = np.tile(template[name], len(tiles))[keep]
+
+            parts.append(part)
+
+        arrays = {}
+        for name, dtype in GRAPH_ARRAYS.items():
+            if name != 'edge_ptr':
+                arrays[name] = np.concatenate(
+                    [part[name] for part in parts] +
+                    [np.zeros(0, dtype=dtype)]).astype(dtype)
+
+        edge_src = np.concatenate(
+            [part['edge_src'] for part in parts] +
+            [np.zeros(0, dtype=np.int64)])
+        order = np.argsort(edge_src, kind='stable')
+        for name in arrays:
+            arrays[name] = arrays[name][order]
+
+        n_nodes = len(tables['node_wire'])
+        arrays['edge_ptr'] = np.zeros(n_nodes + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(edge_src, minlength=n_nodes),
+            out=arrays['edge_ptr'][1:])
+
+        pip_timings = [None] * len(timing_index)
+        for timing, idx in timing_index.items():
+            pip_timings[idx] = timing
+
+        return cls(node_model, tile_type_pips, pip_timings, arrays)
+
+    def get_arrays(self):
+        """ Return map of the GRAPH_ARRAYS names to arrays. """
+        return dict((name, getattr(self, name)) for name in GRAPH_ARRAYS)
+
+    def get_edges(self, node):
+        """ Return range of the edges leaving node. """
+        return range(int(self.edge_ptr[node]), int(self.edge_ptr[node + 1]))
+
+    def get_successors(self, node):
+        """ Return array of the destination nodes of edges leaving node. """
+        return self.edge_dst[self.edge_ptr[node]:self.edge_ptr[node + 1]]
+
+    def get_pip(self, edge):
+        """ Return (tile, pip name) of edge. """
+        tile_idx = int(self.edge_tile[edge])
+        tile_type = self.node_model.tile_types[tile_idx]
+
+        return (
+            self.node_model.tiles[tile_idx],
+            self.tile_type_pips[tile_type][self.edge_pip[edge]])
+
+    def get_pip_timing(self, edge):
+        """ Return PipTiming of edge, or None if the pip has no timing. """
+        timing = self.edge_timing[edge]
+        if timing < 0:
+            return None
+
+        return self.pip_timings[timing]
+
+
+def routing_graph_paths(db):
+    """ Return paths of the data and of each array of the cached graph. """
+    return (
+        db_snapshot.cache_path(db.db_root, db.part, 'routing_graph'),
+        dict(
+            (
+                name,
+                db_snapshot.cache_path(
+                    db.db_root, db.part, 'routing_graph_' + name, 'npy'))
+            for name in GRAPH_ARRAYS))
+
+
+def get_routing_graph(db, progressbar=lambda x: x):
+    """ Returns RoutingGraph of db, loaded from or stored in the cache.
+
+    The node model is loaded with Database.node_model(use_cache=True).
+    """
+    data_path, array_paths = routing_graph_paths(db)
+    key = node_model_key(db)
+
+    node_model = db.node_model(progressbar, use_cache=True)
+
+    data = db_snapshot.load_cached(data_path, key)
+    if data is not None:
+        arrays = {}
+        for name, path in array_paths.items():
+            arrays[name] = db_snapshot.load_cached_array(
+                path, GRAPH_ARRAYS[name], data['lengths'][name])
+            if arrays[name] is None:
+                break
+        else:
+            return RoutingGraph(
+                node_model, data['tile_type_pips'], data['pip_timings'],
+                arrays)
+
+    graph = RoutingGraph.build(db, node_model, progressbar)
+
+    lengths = {}
+    for name, array in graph.get_arrays().items():
+        if not db_snapshot.save_cached_array(array_paths[name], array):
+            return graph
+
+        lengths[name] = len(array)
+
+    db_snapshot.save_cached(
+        data_path, key, {
+            'tile_type_pips': graph.tile_type_pips,
+            'pip_timings': graph.pip_timings,
+            'lengths': lengths,
+        })
+
+    return graph
@@ -24,7 +24,11 @@ tilegrid.json provides tile addresses
 '''
 
 import os, json, re
-from prjxray.util import OpenSafeFile, get_db_root, get_fabric
+from collections import namedtuple
+from prjxray import bitstream
+from prjxray import columnar_segdata
+from prjxray import db_snapshot
+from prjxray.util import OpenSafeFile, get_db_root, get_env_flag, get_fabric
 
 BLOCK_TYPES = set(('CLB_IO_CLK', 'BLOCK_RAM', 'CFG_CLB'))
 
@@ -81,8 +85,192 @@ def add_site_group_zero(segmk, site, prefix, vals, zero_val, val):
             segmk.add_site_tag(site, tag, False)
 
 
+def normalize_tile_type(tile_type):
+    '''
+    Simplify names by simplifying like:
+    -CLBLM_L => CLB
+    -CENTER_INTER_R => CENTER_INTER
+    -CLK_HROW_TOP_R => CLK_HROW
+    -LIOB33 => IOB33
+    -LIOI3 => IOI3
+    -RIOB18 => IOB18
+    -RIOI => IOI
+    '''
+    tile_type_norm = re.sub("(_TOP|_BOT|LL|LM)?_[LR]$", "", tile_type)
+    tile_type_norm = re.sub("_TOP_[LR]_UPPER", "_UPPER", tile_type_norm)
+
+    if tile_type_norm in ['LIOB33', 'RIOB33']:
+        tile_type_norm = 'IOB33'
+    if tile_type_norm in ['LIOB18', 'RIOB18']:
+        tile_type_norm = 'IOB18'
+    if tile_type_norm in ['LIOI3', 'RIOI3']:
+        tile_type_norm = 'IOI3'
+    if tile_type_norm in ['LIOI', 'RIOI']:
+        tile_type_norm = 'IOI'
+    if tile_type_norm in ['LIOI3_TBYTESRC', 'RIOI3_TBYTESRC']:
+        tile_type_norm = 'IOI3'
+    if tile_type_norm in ['LIOI3_TBYTETERM', 'RIOI3_TBYTETERM']:
+        tile_type_norm = 'IOI3'
+    if tile_type_norm in ['LIOI_TBYTESRC', 'RIOI_TBYTESRC']:
+        tile_type_norm = 'IOI'
+    if tile_type_norm in ['LIOI_TBYTETERM', 'RIOI_TBYTETERM']:
+        tile_type_norm = 'IOI'
+    if tile_type_norm in ['CMT_TOP_L_LOWER_B', 'CMT_TOP_R_LOWER_B']:
+        tile_type_norm = 'CMT_LOWER_B'
+    if 'GTP_CHANNEL' in tile_type_norm:
+        tile_type_norm = 'GTP_CHANNEL'
+    if 'GTP_COMMON' in tile_type_norm:
+        tile_type_norm = 'GTP_COMMON'
+    if 'GTP_INT_INTERFACE' in tile_type_norm:
+        tile_type_norm = 'GTP_INT_INTERFACE'
+    if 'GTX_CHANNEL' in tile_type_norm:
+        tile_type_norm = 'GTX_CHANNEL'
+    if 'GTX_COMMON' in tile_type_norm:
+        tile_type_norm = 'GTX_COMMON'
+    if 'GTX_INT_INTERFACE' in tile_type_norm:
+        tile_type_norm = 'GTX_INT_INTERFACE'
+
+    return tile_type_norm
+
+
+def site_key(site):
+    '''
+    Return the name of site within its tile, used in tags, or None if the site
+    name is invalid for its kind of site.
+    -SLICE_X12Y102 => SLICE_X0
+    -SLICE_X13Y102 => SLICE_X1
+    -RAMB18_X0Y41 => RAMB18_Y1
+    -IOB_X0Y41 => IOB_Y1
+    '''
+    site_prefix = "_".join(site.split('_')[0:-1])
+
+    if site_prefix == 'SLICE':
+        if re.match(r"SLICE_X[0-9]*[02468]Y", site):
+            return "SLICE_X0"
+        elif re.match(r"SLICE_X[0-9]*[13579]Y", site):
+            return "SLICE_X1"
+        else:
+            return None
+
+    if site_prefix == 'RAMB18':
+        if re.match(r"^RAMB18_X.*Y[0-9]*[02468]$", site):
+            return "RAMB18_Y0"
+        elif re.match(r"^RAMB18_X.*Y[0-9]*[13579]$", site):
+            return "RAMB18_Y1"
+        else:
+            return None
+
+    if site_prefix in ('IOB', 'IDELAY', 'ODELAY', 'ILOGIC', 'OLOGIC',
+                       'IBUFDS_GTE2'):
+        m = re.match(r"^(.*)_X.*Y[0-9]*[02468]$", site)
+        if m:
+            return "%s_Y0" % m.group(1)
+
+        m = re.match(r"^(.*)_X.*Y[0-9]*[13579]$", site)
+        if m:
+            return "%s_Y1" % m.group(1)
+
+        return None
+
+    # most sites are unique within their tile
+    # TODO: maybe verify against DB?
+    return site_prefix
+
+
+# Tile of a TileTable.
+# index: Position of the tile in tilegrid.json.
+# segnames: Map of block type to segment name of the tile in that block.
+SegmakerTile = namedtuple(
+    'SegmakerTile', 'index tile_type tile_type_norm segnames')
+
+# Per fabric table of the tilegrid, see build_tile_table.
+# tilegrid: Content of tilegrid.json.
+# tile_types: Tile types, in order of first occurence in tilegrid.json.
+# tiles: Map of tile name to SegmakerTile.
+# sites: Map of site name to tile name.
+# site_keys: Map of site name to (position of the site in its tile, site_key).
+TileTable = namedtuple(
+    'TileTable', 'tilegrid tile_types tiles sites site_keys')
+
+
+def build_tile_table(tilegrid):
+    '''Precompute the tile and site names used by Segmaker.compile'''
+    tile_type_norms = {}
+    tiles = {}
+    sites = {}
+    site_keys = {}
+    for index, (tilename, tiledata) in enumerate(tilegrid.items()):
+        tile_type = tiledata["type"]
+        if tile_type not in tile_type_norms:
+            tile_type_norms[tile_type] = normalize_tile_type(tile_type)
+
+        # NOTE: multiple tiles may have the same base addr + offset
+        segnames = dict(
+            (
+                block_type,
+                "%s_%03d" % (
+                    # truncate 0x to leave hex string
+                    bitj["baseaddr"][2:],
+                    bitj["offset"]))
+            for block_type, bitj in tiledata["bits"].items())
+
+        tiles[tilename] = SegmakerTile(
+            index=index,
+            tile_type=tile_type,
+            tile_type_norm=tile_type_norms[tile_type],
+            segnames=segnames)
+
+        for position, site in enumerate(tiledata["sites"]):
+            sites[site] = tilename
+            site_keys[site] = (position, site_key(site))
+
+    return TileTable(
+        tilegrid=tilegrid,
+        tile_types=list(tile_type_norms.keys()),
+        tiles=tiles,
+        sites=sites,
+        site_keys=site_keys)
+
+
+def get_tile_table(db_root, fabric, use_cache=False):
+    '''
+    Return TileTable of the tilegrid.json of fabric.
+
+    use_cache: Load the table from the cache directory (see
+               util.get_cache_dir), storing it there if missing or stale.
+    '''
+    tilegrid_file = os.path.join(db_root, fabric, "tilegrid.json")
+    if use_cache:
+        path = db_snapshot.cache_path(db_root, fabric, 'segmaker_tiles')
+        key = db_snapshot.compute_files_key(db_root, fabric, [tilegrid_file])
+        table = db_snapshot.load_cached(path, key)
+        if table is not None:
+            return table
+
+    with OpenSafeFile(tilegrid_file, "r") as f:
+        tilegrid = json.load(f)
+    assert "segments" not in tilegrid, "Old format tilegrid.json"
+
+    table = build_tile_table(tilegrid)
+    if use_cache:
+        db_snapshot.save_cached(path, key, table)
+
+    return table
+
+
 class Segmaker:
-    def __init__(self, bitsfile, verbose=None, db_root=None, fabric=None):
+    def __init__(
+            self,
+            bitsfile,
+            verbose=None,
+            db_root=None,
+            fabric=None,
+            use_cache=None):
+        '''
+        use_cache: Load the tile table from the cache directory, see
+                   get_tile_table. Defaults to the XRAY_SEGMAKER_CACHE
+                   environment variable.
+        '''
         self.db_root = db_root
         if self.db_root is None:
             self.db_root = get_db_root()
@@ -95,6 +283,8 @@ class Segmaker:
 
         self.verbose = verbose if verbose is not None else os.getenv(
             'VERBOSE', 'N') == 'Y'
+        self.use_cache = use_cache if use_cache is not None else get_env_flag(
+            'XRAY_SEGMAKER_CACHE')
         self.load_grid()
         self.load_bits(bitsfile)
         '''
@@ -115,10 +305,7 @@ class Segmaker:
 
     def index_sites(self):
         self.verbose and print("Indexing sites")
-        self.sites = {}
-        for tilename, tiledata in self.grid.items():
-            for site in tiledata["sites"]:
-                self.sites[site] = tilename
+        self.sites = self.tile_table.sites
         self.verbose and print("Sites indexed")
 
     def set_def_bt(self, block_type):
@@ -129,45 +316,31 @@ class Segmaker:
 
     def load_grid(self):
         '''Load self.grid holding tile addresses'''
-        with OpenSafeFile(os.path.join(self.db_root, self.fabric, "tilegrid.json"),
-                  "r") as f:
-            self.grid = json.load(f)
-        assert "segments" not in self.grid, "Old format tilegrid.json"
+        self.tile_table = get_tile_table(
+            self.db_root, self.fabric, use_cache=self.use_cache)
+        self.grid = self.tile_table.tilegrid
 
     def load_bits(self, bitsfile):
-        '''Load self.bits holding the bits that occured in the bitstream'''
+        '''Load self.frames holding the bits that occured in the bitstream'''
         '''
-        Format:
-        self.bits[base_frame][bit_wordidx] = set()
-        Where elements are (bit_frame, bit_wordidx, bit_bitidx))
-        bit_frame is a relatively large number forming the FDRI address
-        base_frame is a truncated bit_frame address of related FDRI addresses
-        0 <= bit_wordidx <= 100
-        0 <= bit_bitidx < 31
+        bitsfile is either a .bits file name or a bitstream.Frames object.
 
         Sample bits input
         bit_00020500_000_08
         bit_00020500_000_14
         bit_00020500_000_17
         '''
-        self.bits = dict()
-        print("Loading bits from %s." % bitsfile)
-        with OpenSafeFile(bitsfile, "r") as f:
-            for line in f:
-                # ex: bit_00020500_000_17
-                line = line.split("_")
-                bit_frame = int(line[1], 16)
-                bit_wordidx = int(line[2], 10)
-                bit_bitidx = int(line[3], 10)
-                base_frame = bit_frame & ~0x7f
-
-                self.bits.setdefault(base_frame, dict()).setdefault(
-                    bit_wordidx, set()).add(
-                        (bit_frame, bit_wordidx, bit_bitidx))
+        if isinstance(bitsfile, bitstream.Frames):
+            self.frames = bitsfile
+        else:
+            print("Loading bits from %s." % bitsfile)
+            with OpenSafeFile(bitsfile, "r") as f:
+                self.frames = bitstream.Frames.load_bits(f)
         if self.verbose:
             print(
-                'Loaded bits: %u bits in %u base frames' %
-                (recurse_sum(self.bits), len(self.bits)))
+                'Loaded bits: %u bits in %u frames' % (
+                    bitstream.unpack_words(self.frames.words).sum(),
+                    len(self.frames)))
 
     def add_site_tag(self, site, name, value):
         '''
@@ -200,11 +373,13 @@ class Segmaker:
         print("Compiling segment data.")
         tags_used = set()
         sites_used = set()
-        tile_types_found = set()
+        tile_types_found = self.tile_table.tile_types
+        tiles = self.tile_table.tiles
 
-        self.segments_by_type = dict()
+        self.segments_by_type = dict(
+            (tile_type, dict()) for tile_type in tile_types_found)
 
-        def add_segbits(segments, segname, tiledata, bitfilter=None):
+        def add_segbits(segments, segname, bitj, bitfilter=None):
             '''
             Add and populate segments[segname]["bits"]
             Gives all of the bits that could exist for the space we are exploring
@@ -216,7 +391,7 @@ class Segmaker:
             segments[segname]["tags"][tag] = value
 
             segname: FDRI address + word offset string
-            tiledata: tilegrid info for this tile
+            bitj: tilegrid bits info of the block of this tile
             '''
             assert segname not in segments
             segment = segments.setdefault(
@@ -231,211 +406,101 @@ class Segmaker:
                 })
 
             base_frame = json_hex2i(bitj["baseaddr"])
-            for wordidx in range(bitj["offset"],
-                                 bitj["offset"] + bitj["words"]):
-                if base_frame not in self.bits:
-                    continue
-                if wordidx not in self.bits[base_frame]:
-                    continue
-                for bit_frame, bit_wordidx, bit_bitidx in self.bits[
-                        base_frame][wordidx]:
-                    bitname_frame = bit_frame - base_frame
-                    bitname_bit = 32 * (
-                        bit_wordidx - bitj["offset"]) + bit_bitidx
-
-                    # Skip bits above the frame limit.
-                    if bitname_frame >= bitj["frames"]:
-                        continue
-
-                    # some bits are hard to de-correlate
-                    # allow force dropping some bits from search space for practicality
-                    if bitfilter is None or bitfilter(bitname_frame,
-                                                      bitname_bit):
-                        bitname = "%02d_%02d" % (bitname_frame, bitname_bit)
-                        segment["bits"].add(bitname)
+            for bitname_frame, bitname_bit in self.frames.iter_window_bits(
+                    base_frame, bitj["frames"], bitj["offset"], bitj["words"]):
+                # some bits are hard to de-correlate
+                # allow force dropping some bits from search space for practicality
+                if bitfilter is None or bitfilter(bitname_frame, bitname_bit):
+                    bitname = "%02d_%02d" % (bitname_frame, bitname_bit)
+                    segment["bits"].add(bitname)
 
             return segment
 
-        '''
-        XXX: wouldn't it be better to iterate over tags? Easy to drop tags
-        For now, add a check that all tags are used
-        '''
-        for tilename, tiledata in self.grid.items():
-
-            def getseg(segname):
-                if not segname in segments:
-                    return add_segbits(
-                        segments, segname, tiledata, bitfilter=bitfilter)
-                else:
-                    segment = segments[segname]
-                    assert segment["offset"] == bitj["offset"]
-                    assert segment["words"] == bitj["words"]
-                    assert segment["frames"] == bitj["frames"]
-                    return segment
-
-            def add_tilename_tags():
-                self.verbose and print("Tile %s: check tags" % tilename)
-                segment = getseg(segname)
-
-                for name, value in self.tile_tags[tilename].items():
-                    tags_used.add((tilename, name))
-                    tag = "%s.%s" % (tile_type_norm, name)
-                    segment["tags"][tag] = value
-
-            def add_site_tags():
-                site_prefix = "_".join(site.split('_')[0:-1])
-
-                def name_slice():
-                    '''
-                    Simplify SLICE names like:
-                    -SLICE_X12Y102 => SLICE_X0
-                    -SLICE_X13Y102 => SLICE_X1
-                    '''
-                    if re.match(r"SLICE_X[0-9]*[02468]Y", site):
-                        return "SLICE_X0"
-                    elif re.match(r"SLICE_X[0-9]*[13579]Y", site):
-                        return "SLICE_X1"
-                    else:
-                        assert False, "Invalid name in %s" % site
-
-                def name_bram18():
-                    # RAMB18_X0Y41
-                    if re.match(r"^RAMB18_X.*Y[0-9]*[02468]$", site):
-                        return "RAMB18_Y0"
-                    elif re.match(r"^RAMB18_X.*Y[0-9]*[13579]$", site):
-                        return "RAMB18_Y1"
-                    else:
-                        assert False, "Invalid name in %s" % site
-
-                def name_y0y1():
-                    # RAMB18_X0Y41
-                    m = re.match(r"^(.*)_X.*Y[0-9]*[02468]$", site)
-                    if m:
-                        return "%s_Y0" % m.group(1)
-
-                    m = re.match(r"^(.*)_X.*Y[0-9]*[13579]$", site)
-                    if m:
-                        return "%s_Y1" % m.group(1)
-
-                    assert 0, site
-
-                def name_default():
-                    # most sites are unique within their tile
-                    # TODO: maybe verify against DB?
-                    return site_prefix
-
-                sitekey = {
-                    'SLICE': name_slice,
-                    'RAMB18': name_bram18,
-                    'IOB': name_y0y1,
-                    'IDELAY': name_y0y1,
-                    'ODELAY': name_y0y1,
-                    'ILOGIC': name_y0y1,
-                    'OLOGIC': name_y0y1,
-                    'IBUFDS_GTE2': name_y0y1,
-                }.get(site_prefix, name_default)()
-                self.verbose and print(
-                    'site %s w/ %s prefix => tag %s' %
-                    (site, site_prefix, sitekey))
-
-                for name, value in self.site_tags[site].items():
-                    self.verbose and print("Site %s: check tags" % site)
-
-                    tags_used.add((site, name))
-                    tag = "%s.%s.%s" % (tile_type_norm, sitekey, name)
-                    # XXX: does this come from name?
-                    tag = tag.replace(".SLICEM.", ".")
-                    tag = tag.replace(".SLICEL.", ".")
-                    segment = getseg(segname)
-                    segment["tags"][tag] = value
-                sites_used.add(site)
-
-            tile_type = tiledata["type"]
-            tile_types_found.add(tile_type)
-            segments = self.segments_by_type.setdefault(tile_type, dict())
+        def getseg(tilename):
             '''
-            Simplify names by simplifying like:
-            -CLBLM_L => CLB
-            -CENTER_INTER_R => CENTER_INTER
-            -CLK_HROW_TOP_R => CLK_HROW
-            -LIOB33 => IOB33
-            -LIOI3 => IOI3
-            -RIOB18 => IOB18
-            -RIOI => IOI
+            Return segment of tilename, or None for dummy tiles (ex: VBRK)
+            without bitstream info
             '''
-            tile_type_norm = re.sub("(_TOP|_BOT|LL|LM)?_[LR]$", "", tile_type)
-            tile_type_norm = re.sub(
-                "_TOP_[LR]_UPPER", "_UPPER", tile_type_norm)
-
-            if tile_type_norm in ['LIOB33', 'RIOB33']:
-                tile_type_norm = 'IOB33'
-            if tile_type_norm in ['LIOB18', 'RIOB18']:
-                tile_type_norm = 'IOB18'
-            if tile_type_norm in ['LIOI3', 'RIOI3']:
-                tile_type_norm = 'IOI3'
-            if tile_type_norm in ['LIOI', 'RIOI']:
-                tile_type_norm = 'IOI'
-            if tile_type_norm in ['LIOI3_TBYTESRC', 'RIOI3_TBYTESRC']:
-                tile_type_norm = 'IOI3'
-            if tile_type_norm in ['LIOI3_TBYTETERM', 'RIOI3_TBYTETERM']:
-                tile_type_norm = 'IOI3'
-            if tile_type_norm in ['LIOI_TBYTESRC', 'RIOI_TBYTESRC']:
-                tile_type_norm = 'IOI'
-            if tile_type_norm in ['LIOI_TBYTETERM', 'RIOI_TBYTETERM']:
-                tile_type_norm = 'IOI'
-            if tile_type_norm in ['CMT_TOP_L_LOWER_B', 'CMT_TOP_R_LOWER_B']:
-                tile_type_norm = 'CMT_LOWER_B'
-            if 'GTP_CHANNEL' in tile_type_norm:
-                tile_type_norm = 'GTP_CHANNEL'
-            if 'GTP_COMMON' in tile_type_norm:
-                tile_type_norm = 'GTP_COMMON'
-            if 'GTP_INT_INTERFACE' in tile_type_norm:
-                tile_type_norm = 'GTP_INT_INTERFACE'
-            if 'GTX_CHANNEL' in tile_type_norm:
-                tile_type_norm = 'GTX_CHANNEL'
-            if 'GTX_COMMON' in tile_type_norm:
-                tile_type_norm = 'GTX_COMMON'
-            if 'GTX_INT_INTERFACE' in tile_type_norm:
-                tile_type_norm = 'GTX_INT_INTERFACE'
-
-            if tile_type_norm in ['LIOI', 'RIOI']:
-                tile_type_norm = 'IOI'
-            if tile_type_norm in ['LIOI_TBYTESRC', 'RIOI_TBYTESRC']:
-                tile_type_norm = 'IOI'
-            if tile_type_norm in ['LIOI_TBYTETERM', 'RIOI_TBYTETERM']:
-                tile_type_norm = 'IOI'
-
-            # ignore dummy tiles (ex: VBRK)
+            tile = tiles[tilename]
+            tiledata = self.grid[tilename]
             if len(tiledata['bits']) == 0:
-                if self.verbose:
-                    for site in tiledata["sites"]:
-                        assert site not in self.site_tags, "Site %s does not have bitstream info" % site
-                this_tile_tags = len(self.tile_tags.get(tilename, {}))
-                assert this_tile_tags == 0, "Tile %s does not have bitstream info but %s tags" % (
-                    tilename, this_tile_tags)
-                continue
+                return None
             elif len(tiledata['bits']) == 1:
-                bitj = list(tiledata['bits'].values())[0]
+                block_type = list(tiledata['bits'].keys())[0]
             else:
                 assert self.def_bt in tiledata[
                     'bits'], 'Default block not present: %s' % self.def_bt
-                bitj = tiledata['bits'][self.def_bt]
-
-            # NOTE: multiple tiles may have the same base addr + offset
-            segname = "%s_%03d" % (
-                # truncate 0x to leave hex string
-                bitj["baseaddr"][2:],
-                bitj["offset"])
-
-            # process tile name tags
-            if tilename in self.tile_tags:
-                add_tilename_tags()
+                block_type = self.def_bt
+
+            bitj = tiledata['bits'][block_type]
+            segname = tile.segnames[block_type]
+            segments = self.segments_by_type[tile.tile_type]
+            if not segname in segments:
+                return add_segbits(
+                    segments, segname, bitj, bitfilter=bitfilter)
+            else:
+                segment = segments[segname]
+                assert segment["offset"] == bitj["offset"]
+                assert segment["words"] == bitj["words"]
+                assert segment["frames"] == bitj["frames"]
+                return segment
+
+        def add_tilename_tags(tilename):
+            self.verbose and print("Tile %s: check tags" % tilename)
+            segment = getseg(tilename)
+            this_tile_tags = len(self.tile_tags[tilename])
+            assert segment is not None, "Tile %s does not have bitstream info but %s tags" % (
+                tilename, this_tile_tags)
+
+            for name, value in self.tile_tags[tilename].items():
+                tags_used.add((tilename, name))
+                tag = "%s.%s" % (tiles[tilename].tile_type_norm, name)
+                segment["tags"][tag] = value
+
+        def add_site_tags(tilename, site, sitekey):
+            segment = getseg(tilename)
+            if segment is None:
+                assert not self.verbose, "Site %s does not have bitstream info" % site
+                return
+
+            assert sitekey is not None, "Invalid name in %s" % site
+            self.verbose and print('site %s => tag %s' % (site, sitekey))
+
+            for name, value in self.site_tags[site].items():
+                self.verbose and print("Site %s: check tags" % site)
+
+                tags_used.add((site, name))
+                tag = "%s.%s.%s" % (
+                    tiles[tilename].tile_type_norm, sitekey, name)
+                # XXX: does this come from name?
+                tag = tag.replace(".SLICEM.", ".")
+                tag = tag.replace(".SLICEL.", ".")
+                segment["tags"][tag] = value
+            sites_used.add(site)
 
-            # process site name tags
-            for site in tiledata["sites"]:
-                if site not in self.site_tags:
-                    continue
-                add_site_tags()
+        '''
+        Only visit the tiles and sites with tags, in tilegrid.json order with
+        tile tags first.  The tile and site names are precomputed in
+        self.tile_table.
+        '''
+        tagged = []
+        for tilename in self.tile_tags:
+            # Tags of unknown tiles are reported as unused below
+            if tilename in tiles:
+                tagged.append(((tiles[tilename].index, -1), tilename, None))
+
+        for site in self.site_tags:
+            tilename = self.sites[site]
+            position, _ = self.tile_table.site_keys[site]
+            tagged.append(((tiles[tilename].index, position), tilename, site))
+
+        tagged.sort(key=lambda t: t[0])
+        for _, tilename, site in tagged:
+            if site is None:
+                add_tilename_tags(tilename)
+            else:
+                add_site_tags(
+                    tilename, site, self.tile_table.site_keys[site][1])
 
         n_site_tags = recurse_sum(self.site_tags)
         n_tile_tags = recurse_sum(self.tile_tags)
@@ -452,7 +517,12 @@ class Segmaker:
         assert ntags == len(tags_used), "Unused tags, %s used out of %s" % (
             len(tags_used), ntags)
 
-    def write(self, suffix=None, roi=False, allow_empty=False):
+    def write(self, suffix=None, roi=False, allow_empty=False, columnar=False):
+        """ Writes segdata_<segtype>[_<suffix>].txt files.
+
+        columnar: Write .npz columnar segdata files instead, see
+                  columnar_segdata.py.
+        """
         assert self.segments_by_type, 'No data to write'
 
         if not allow_empty:
@@ -461,13 +531,23 @@ class Segmaker:
                  ]) != 0, "Didn't  generate any segments"
 
         for segtype in self.segments_by_type.keys():
+            ext = "npz" if columnar else "txt"
             if suffix is not None:
-                filename = "segdata_%s_%s.txt" % (segtype.lower(), suffix)
+                filename = "segdata_%s_%s.%s" % (segtype.lower(), suffix, ext)
             else:
-                filename = "segdata_%s.txt" % (segtype.lower())
+                filename = "segdata_%s.%s" % (segtype.lower(), ext)
 
             segments = self.segments_by_type[segtype]
-            if segments:
+            if segments and columnar:
+                print("Writing %s." % filename)
+                columnar_segdata.write(
+                    filename,
+                    columnar_segdata.from_segments(
+                        (
+                            segname, sorted(segdata["bits"]),
+                            sorted(segdata["tags"].items()))
+                        for segname, segdata in sorted(segments.items())))
+            elif segments:
                 print("Writing %s." % filename)
                 with OpenSafeFile(filename, "w") as f:
                     for segname, segdata in sorted(segments.items()):
@@ -8,23 +8,66 @@
 # https://opensource.org/licenses/ISC
 #
 # SPDX-License-Identifier: ISC
-from intervaltree import IntervalTree, Interval
-from prjxray import bitstream
+import numpy as np
 
 
 class SegmentMap(object):
+    """ Map of frame address to the tiles (grid_types.BitsInfo) using it.
+
+    bits_infos is the list of BitsInfo from Grid.iter_all_frames.  frames is
+    the sorted array of frame addresses used by any tile, and the BitsInfo
+    indices of the tiles using frames[i] are
+    frame_entries[frame_ptr[i]:frame_ptr[i + 1]].
+
+    word_start and word_end hold the [offset, offset + words) word range of
+    each BitsInfo.
+    """
+
     def __init__(self, grid):
-        self.segment_tree = IntervalTree()
+        self.bits_infos = list(grid.iter_all_frames())
+
+        n_infos = len(self.bits_infos)
+        base_address = np.zeros(n_infos, dtype=np.int64)
+        n_frames = np.zeros(n_infos, dtype=np.int64)
+        self.word_start = np.zeros(n_infos, dtype=np.int32)
+        self.word_end = np.zeros(n_infos, dtype=np.int32)
+        for idx, bits_info in enumerate(self.bits_infos):
+            bits = bits_info.bits
+            base_address[idx] = bits.base_address
+            n_frames[idx] = bits.frames
+            self.word_start[idx] = bits.offset
+            self.word_end[idx] = bits.offset + bits.words
 
-        for bits_info in grid.iter_all_frames():
-            self.segment_tree.add(
-                Interval(
-                    begin=bits_info.bits.base_address,
-                    end=bits_info.bits.base_address + bits_info.bits.frames,
-                    data=bits_info,
-                ))
+        # Expand every BitsInfo to one entry per frame.
+        entries = np.repeat(np.arange(n_infos, dtype=np.int32), n_frames)
+        first_entry = np.repeat(np.cumsum(n_frames) - n_frames, n_frames)
+        entry_frames = np.repeat(base_address, n_frames) + (
+            np.arange(len(entries), dtype=np.int64) - first_entry)
+
+        order = np.argsort(entry_frames, kind='stable')
+        self.frames, counts = np.unique(
+            entry_frames[order], return_counts=True)
+        self.frame_entries = entries[order]
+        self.frame_ptr = np.zeros(len(self.frames) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.frame_ptr[1:])
+
+    def segment_indices_for_frame(self, frame):
+        """ Return array of indices in bits_infos that use frame address. """
+        idx = np.searchsorted(self.frames, frame)
+        if idx == len(self.frames) or self.frames[idx] != frame:
+            return self.frame_entries[:0]
+
+        return self.frame_entries[self.frame_ptr[idx]:self.frame_ptr[idx + 1]]
 
     def segment_info_for_frame(self, frame):
         """ Return all bits info that match frame address. """
-        for frame in self.segment_tree[frame]:
-            yield frame.data
+        for idx in self.segment_indices_for_frame(frame):
+            yield self.bits_infos[idx]
+
+    def segment_info_for_word(self, frame, word):
+        """ Return all bits info that match frame address and word. """
+        indices = self.segment_indices_for_frame(frame)
+        indices = indices[(self.word_start[indices] <= word)
+                          & (word < self.word_end[indices])]
+        for idx in indices:
+            yield self.bits_infos[idx]
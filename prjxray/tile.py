@@ -144,6 +144,9 @@ class SitePin(namedtuple('SitePin', 'name wire timing')):
 
 WireInfo = namedtuple('WireInfo', 'pips sites')
 
+# Pips connected to a wire, see Tile.get_wire_adjacency.
+WireAdjacency = namedtuple('WireAdjacency', 'uphill_pips downhill_pips sites')
+
 # Conversion factor from database to internal units.
 RESISTANCE_FACTOR = 1e3
 CAPACITANCE_FACTOR = 1e3
@@ -321,7 +324,10 @@ class Tile(object):
             self.sites = tuple(yield_sites(tile_type['sites']))
             self.pips = tuple(yield_pips(tile_type['pips']))
 
+        # Map of allow_pseudo to map of wire to WireInfo or WireAdjacency, see
+        # _build_wire_index.
         self.wire_info = {}
+        self.wire_adjacency = {}
 
     def get_wires(self):
         """Returns a set of wire names present in this tile."""
@@ -343,27 +349,72 @@ class Tile(object):
 
         return self.pips_by_name[name]
 
+    def _build_wire_index(self, allow_pseudo):
+        """ Build wire info and adjacency of every wire, in one pass over the
+        site pins and pips. """
+        pips = dict((wire, []) for wire in self.wires)
+        uphill_pips = dict((wire, []) for wire in self.wires)
+        downhill_pips = dict((wire, []) for wire in self.wires)
+        sites = dict((wire, []) for wire in self.wires)
+
+        for site in self.sites:
+            for site_pin in site.site_pins:
+                if site_pin.wire in sites:
+                    sites[site_pin.wire].append((site.name, site_pin.name))
+
+        for pip in self.pips:
+            if pip.is_pseudo and not allow_pseudo:
+                continue
+
+            for wire in set((pip.net_from, pip.net_to)):
+                if wire in pips:
+                    pips[wire].append(pip.name)
+
+            # Bidirectional pips can drive both of their wires.
+            if pip.net_to in uphill_pips:
+                uphill_pips[pip.net_to].append(pip.name)
+                if not pip.is_directional:
+                    downhill_pips[pip.net_to].append(pip.name)
+
+            if pip.net_from in downhill_pips:
+                downhill_pips[pip.net_from].append(pip.name)
+                if not pip.is_directional:
+                    uphill_pips[pip.net_from].append(pip.name)
+
+        self.wire_info[allow_pseudo] = dict(
+            (wire, WireInfo(pips=pips[wire], sites=sites[wire]))
+            for wire in self.wires)
+        self.wire_adjacency[allow_pseudo] = dict(
+            (
+                wire,
+                WireAdjacency(
+                    uphill_pips=uphill_pips[wire],
+                    downhill_pips=downhill_pips[wire],
+                    sites=sites[wire])) for wire in self.wires)
+
     def get_wire_info(self, target_wire, allow_pseudo=False):
-        if len(self.wire_info) == 0:
-            for wire in self.wires:
-                pips = list()
-                sites = list()
-
-                for site in self.sites:
-                    for site_pin in site.site_pins:
-                        if site_pin.wire == wire:
-                            sites.append((site.name, site_pin.name))
-
-                for pip in self.pips:
-                    pseudo_filter = (not pip.is_pseudo) or allow_pseudo
-                    if (wire == pip.net_to
-                            or wire == pip.net_from) and pseudo_filter:
-                        pips.append(pip.name)
-
-                assert wire not in self.wire_info
-                self.wire_info[wire] = WireInfo(pips=pips, sites=sites)
-
-        return self.wire_info[target_wire]
+        """ Returns WireInfo of the pips and site pins connected to wire.
+
+        Pseudo pips are only included if allow_pseudo is True.
+        """
+        if allow_pseudo not in self.wire_info:
+            self._build_wire_index(allow_pseudo)
+
+        return self.wire_info[allow_pseudo][target_wire]
+
+    def get_wire_adjacency(self, target_wire, allow_pseudo=False):
+        """ Returns WireAdjacency of wire.
+
+        uphill_pips are the pips that can drive wire, downhill_pips the pips
+        wire can drive, a bidirectional pip is both.  sites are the
+        (site, site pin) connected to wire.
+
+        Pseudo pips are only included if allow_pseudo is True.
+        """
+        if allow_pseudo not in self.wire_adjacency:
+            self._build_wire_index(allow_pseudo)
+
+        return self.wire_adjacency[allow_pseudo][target_wire]
 
     def get_instance_sites(self, grid_info):
         """ get_sites returns abstract sites for all tiles of type.
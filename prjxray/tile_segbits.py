@@ -13,6 +13,7 @@ from prjxray import bitstream
 from prjxray.grid_types import BlockType
 from prjxray.util import OpenSafeFile
 import enum
+import numpy as np
 
 
 class PsuedoPipType(enum.Enum):
@@ -77,11 +78,190 @@ def read_segbits(f):
     return segbits
 
 
+class CompiledSegbits(object):
+    """ Segbits of one block type compiled into arrays for bulk matching.
+
+    Bits are addressed within a window covering the tile, where each frame
+    (word_column) of the tile is a row of window_bits bits, starting at the
+    first word of the tile.  The window is a flat boolean array with two
+    extra slots at the end, one always set and one always clear.
+
+    Each feature is described by a row in one_idx and a row in zero_idx,
+    holding the window indices of the bits that must be set and must be
+    clear respectively.  Rows are padded with the always set slot (one_idx)
+    and the always clear slot (zero_idx), so that a single gather and
+    reduction matches every feature of the tile type at once.
+
+    To avoid evaluating features that cannot match, an inverted index maps
+    each window bit to the features that require it to be set (a CSR
+    structure of bit_features_ptr and bit_features).  Only features
+    reachable from the set bits of a tile, plus the features without any
+    set bits (zero_features), are evaluated.
+
+    """
+
+    def __init__(self, segbits):
+        self.features = list(segbits.keys())
+
+        self.frames = 1
+        self.window_bits = 1
+        for segbit in segbits.values():
+            for bit in segbit:
+                self.frames = max(self.frames, bit.word_column + 1)
+                self.window_bits = max(self.window_bits, bit.word_bit + 1)
+
+        self.window_words = (
+            self.window_bits + bitstream.WORD_SIZE_BITS -
+            1) // bitstream.WORD_SIZE_BITS
+        self.window_size = self.frames * self.window_bits
+        self.set_slot = self.window_size
+        self.clear_slot = self.window_size + 1
+
+        n_features = len(self.features)
+        max_ones = 0
+        max_zeros = 0
+        for segbit in segbits.values():
+            n_ones = sum(1 for bit in segbit if bit.isset)
+            max_ones = max(max_ones, n_ones)
+            max_zeros = max(max_zeros, len(segbit) - n_ones)
+
+        self.one_idx = np.full(
+            (n_features, max_ones), self.set_slot, dtype=np.int32)
+        self.zero_idx = np.full(
+            (n_features, max_zeros), self.clear_slot, dtype=np.int32)
+
+        # Range of words within the tile used by each feature.  Features
+        # without bits get an empty range, so they pass any word_range check.
+        int32 = np.iinfo(np.int32)
+        self.word_min = np.full(n_features, int32.max, dtype=np.int32)
+        self.word_max = np.full(n_features, int32.min, dtype=np.int32)
+
+        # Bits set by each feature, used to report the matched bits.
+        self.one_bits = []
+
+        for feature_idx, feature in enumerate(self.features):
+            ones = []
+            zeros = []
+            words = []
+            for bit in segbits[feature]:
+                idx = bit.word_column * self.window_bits + bit.word_bit
+                words.append(bit.word_bit // bitstream.WORD_SIZE_BITS)
+                if bit.isset:
+                    ones.append(idx)
+                else:
+                    zeros.append(idx)
+
+            self.one_idx[feature_idx, :len(ones)] = ones
+            self.zero_idx[feature_idx, :len(zeros)] = zeros
+            if words:
+                self.word_min[feature_idx] = min(words)
+                self.word_max[feature_idx] = max(words)
+
+            self.one_bits.append(
+                tuple(
+                    (bit.word_column, bit.word_bit)
+                    for bit in segbits[feature]
+                    if bit.isset))
+
+        # Inverted index of window bit to features that require it set.
+        n_ones = (self.one_idx != self.set_slot).sum(axis=1)
+        bit_idx = self.one_idx[self.one_idx != self.set_slot]
+        feature_idx = np.repeat(np.arange(n_features, dtype=np.int32), n_ones)
+
+        order = np.argsort(bit_idx, kind='stable')
+        self.bit_features = feature_idx[order]
+        self.bit_features_ptr = np.zeros(self.window_size + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(bit_idx, minlength=self.window_size),
+            out=self.bit_features_ptr[1:])
+
+        self.zero_features = np.flatnonzero(n_ones == 0).astype(np.int32)
+
+    def window_from_bitdata(self, bits, bitdata):
+        """ Returns window for the tile at bits (grid.Bits) from bitdata.
+
+        bitdata is either a bitstream.Frames or a bitdata map, see
+        bitstream.load_bitdata for details on bitdata structure.
+
+        """
+        window = np.zeros(self.window_size + 2, dtype=bool)
+        window[self.set_slot] = True
+
+        if isinstance(bitdata, bitstream.Frames):
+            words = bitdata.window(
+                bits.base_address, self.frames, bits.offset, self.window_words)
+            window[:self.window_size] = bitstream.unpack_words(
+                words)[:, :self.window_bits].reshape(-1)
+            return window
+
+        for word_column in range(self.frames):
+            frame = bits.base_address + word_column
+            if frame not in bitdata:
+                continue
+
+            frame_words, frame_bits = bitdata[frame]
+            row = word_column * self.window_bits
+            for word in range(self.window_words):
+                if word + bits.offset not in frame_words:
+                    continue
+
+                base_bit = (word + bits.offset) * bitstream.WORD_SIZE_BITS
+                for word_bit in range(bitstream.WORD_SIZE_BITS):
+                    window_bit = word * bitstream.WORD_SIZE_BITS + word_bit
+                    if window_bit >= self.window_bits:
+                        break
+
+                    if base_bit + word_bit in frame_bits:
+                        window[row + window_bit] = True
+
+        return window
+
+    def candidates(self, window):
+        """ Returns sorted indices of features that may match window.
+
+        A feature may only match if one of its set bits is set in the
+        window, or if it has no set bits at all.
+
+        """
+        set_bits = np.flatnonzero(window[:self.window_size])
+
+        starts = self.bit_features_ptr[set_bits]
+        counts = self.bit_features_ptr[set_bits + 1] - starts
+        total = counts.sum()
+        if total == 0:
+            return self.zero_features
+
+        # Concatenate the bit_features ranges of every set bit.
+        offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+        reached = self.bit_features[offsets + np.arange(total)]
+
+        return np.union1d(reached, self.zero_features)
+
+    def match(self, window, word_range=None):
+        """ Returns indices of features matching window.
+
+        word_range - If not None, (first, last + 1) range of words in the
+                     window; features using bits outside of it are skipped.
+
+        """
+        candidates = self.candidates(window)
+
+        matched = window[self.one_idx[candidates]].all(axis=1)
+        matched &= ~window[self.zero_idx[candidates]].any(axis=1)
+
+        if word_range is not None:
+            matched &= self.word_min[candidates] >= word_range[0]
+            matched &= self.word_max[candidates] < word_range[1]
+
+        return candidates[matched]
+
+
 class TileSegbits(object):
     def __init__(self, tile_db):
         self.segbits = {}
         self.ppips = {}
         self.feature_addresses = {}
+        self.compiled = {}
 
         if tile_db.ppips is not None:
             with OpenSafeFile(tile_db.ppips) as f:
@@ -111,36 +291,80 @@ class TileSegbits(object):
                     self.feature_addresses[base_feature][int(
                         feature[sidx + 1:eidx])] = (block_type, feature)
 
-    def match_bitdata(self, block_type, bits, bitdata, match_filter=None):
+    def compile(self, block_type=None):
+        """ Compile segbits for matching, see CompiledSegbits.
+
+        Compiles all block types if block_type is None, otherwise returns
+        the CompiledSegbits of block_type.
+
+        """
+        if block_type is None:
+            for block_type in self.segbits:
+                self.compile(block_type)
+            return
+
+        if block_type not in self.compiled:
+            self.compiled[block_type] = CompiledSegbits(
+                self.segbits[block_type])
+
+        return self.compiled[block_type]
+
+    def match_bitdata(
+            self, block_type, bits, bitdata, match_filter=None,
+            word_range=None):
         """ Return matching features for tile bits data (grid.Bits) and bitdata.
 
-        See bitstream.load_bitdata for details on bitdata structure.
+        bitdata is either a bitstream.Frames or a bitdata map, see
+        bitstream.load_bitdata for details on bitdata structure.
+
+        match_filter - Optional function of (block_type, query_bit), features
+                       with any bit rejected by the filter are skipped.
+        word_range - Optional (first, last + 1) range of words relative to
+                     bits.offset, features with any bit outside of the range
+                     are skipped.
 
         """
 
         if block_type not in self.segbits:
             return
 
+        if match_filter is not None:
+            yield from self._match_bitdata_filtered(
+                block_type, bits, bitdata, match_filter)
+            return
+
+        compiled = self.compile(block_type)
+        window = compiled.window_from_bitdata(bits, bitdata)
+
+        base_bit = bits.offset * bitstream.WORD_SIZE_BITS
+        for feature_idx in compiled.match(window, word_range):
+            one_bits = compiled.one_bits[feature_idx]
+            bits_found = tuple(
+                (bits.base_address + word_column, base_bit + word_bit)
+                for word_column, word_bit in one_bits)
+
+            yield (bits_found, compiled.features[feature_idx])
+
+    def _match_bitdata_filtered(self, block_type, bits, bitdata, match_filter):
+        if isinstance(bitdata, bitstream.Frames):
+            is_set = bitdata.get_bit
+        else:
+
+            def is_set(frame, bitidx):
+                return frame in bitdata and bitidx in bitdata[frame][1]
+
         for feature, segbit in self.segbits[block_type].items():
             match = True
             skip = False
             for query_bit in segbit:
-                if match_filter is not None and not match_filter(block_type,
-                                                                 query_bit):
+                if not match_filter(block_type, query_bit):
                     skip = True
                     break
 
                 frame = bits.base_address + query_bit.word_column
                 bitidx = bits.offset * bitstream.WORD_SIZE_BITS + query_bit.word_bit
 
-                if frame not in bitdata:
-                    match = not query_bit.isset
-                    if match:
-                        continue
-                    else:
-                        break
-
-                found_bit = bitidx in bitdata[frame][1]
+                found_bit = is_set(frame, bitidx)
                 match = found_bit == query_bit.isset
 
                 if not match:
@@ -18,13 +18,17 @@ TileSegbitsAlias performs severals functions to achieve the alias:
 
 """
 
-from prjxray import bitstream
 from prjxray.grid_types import Bits
-from prjxray.tile_segbits import read_ppips
-from prjxray.util import OpenSafeFile
 
 
 class TileSegbitsAlias(object):
+    """ Segbits of tile_type aliased through the BitAlias of bits_map.
+
+    The bits passed to match_bitdata and feature_to_bits are used to locate
+    the tile, so one instance can be shared by every tile of tile_type with
+    the same aliases and word counts, see Grid.get_tile_segbits_at_tilename.
+    """
+
     def __init__(self, db, tile_type, bits_map):
         # Name of tile_type that is using the alias
         self.tile_type = tile_type
@@ -35,24 +39,11 @@ class TileSegbitsAlias(object):
         # BlockType -> BitAlias map
         self.alias = {}
 
-        self.bits_map = bits_map
-
-        # BlockType -> aliased Bits map
-        self.alias_bits_map = {}
-
         # aliased site name to site name map
         self.sites_rev_map = {}
 
         for block_type in bits_map:
             self.alias[block_type] = bits_map[block_type].alias
-            self.alias_bits_map[block_type] = Bits(
-                base_address=bits_map[block_type].base_address,
-                frames=bits_map[block_type].frames,
-                offset=bits_map[block_type].offset -
-                self.alias[block_type].start_offset,
-                words=bits_map[block_type].words,
-                alias=None,
-            )
 
             if self.alias_tile_type is None:
                 self.alias_tile_type = self.alias[block_type].tile_type
@@ -64,14 +55,19 @@ class TileSegbitsAlias(object):
                 assert alias_site not in self.sites_rev_map[block_type]
                 self.sites_rev_map[block_type][alias_site] = site
 
-        tile_db = db.tile_types[self.tile_type]
-        self.ppips = {}
-
-        if tile_db.ppips is not None:
-            with OpenSafeFile(tile_db.ppips) as f:
-                self.ppips = read_ppips(f)
+        self.ppips = db.get_tile_ppips(self.tile_type)
         self.tile_segbits = db.get_tile_segbits(self.alias_tile_type)
 
+    def get_alias_bits(self, block_type, bits):
+        """ Returns Bits of the aliased tile for tile bits (grid.Bits). """
+        return Bits(
+            base_address=bits.base_address,
+            frames=bits.frames,
+            offset=bits.offset - self.alias[block_type].start_offset,
+            words=bits.words,
+            alias=None,
+        )
+
     def map_feature_to_segbits(self, feature):
         """ Map from the output feature name to the aliased feature name. """
         parts = feature.split('.')
@@ -98,20 +94,15 @@ class TileSegbitsAlias(object):
 
         return '.'.join(parts)
 
-    def match_filter(self, block_type, query_bit):
-        word = query_bit.word_bit // bitstream.WORD_SIZE_BITS
-        real_word = word - self.alias[block_type].start_offset
-        if real_word < 0 or real_word >= self.bits_map[block_type].words:
-            return False
-
-        return True
-
     def match_bitdata(self, block_type, bits, bitdata):
-        alias_bits = self.alias_bits_map[block_type]
+        alias_bits = self.get_alias_bits(block_type, bits)
+
+        # Only match features with bits inside of the aliased tile.
+        start_offset = self.alias[block_type].start_offset
+        word_range = (start_offset, start_offset + bits.words)
 
         for bits_found, alias_feature in self.tile_segbits.match_bitdata(
-                block_type, alias_bits, bitdata,
-                match_filter=self.match_filter):
+                block_type, alias_bits, bitdata, word_range=word_range):
             feature = self.map_feature_from_segbits(alias_feature)
 
             yield (bits_found, feature)
@@ -120,7 +111,11 @@ class TileSegbitsAlias(object):
         if feature in self.ppips:
             return
 
+        alias_bits_map = {}
+        for block_type, bits in bits_map.items():
+            alias_bits_map[block_type] = self.get_alias_bits(block_type, bits)
+
         alias_feature = self.map_feature_to_segbits(feature)
         for block_type, bit in self.tile_segbits.feature_to_bits(
-                self.alias_bits_map, alias_feature, address):
+                alias_bits_map, alias_feature, address):
             yield block_type, bit
@@ -9,6 +9,7 @@
 #
 # SPDX-License-Identifier: ISC
 import fcntl
+import functools
 import math
 import os
 import random
@@ -83,6 +84,37 @@ def get_fabric():
     return ret
 
 
+def get_cache_dir():
+    """ Returns directory used to store caches derived from the database.
+
+    Defaults to ~/.cache/prjxray, and can be overridden with XRAY_CACHE_DIR.
+    """
+    ret = os.getenv("XRAY_CACHE_DIR", None)
+    if ret:
+        return ret
+
+    return os.path.join(os.path.expanduser("~"), ".cache", "prjxray")
+
+
+def get_env_flag(name, default=False):
+    """ Returns True if environment variable name is set to a true value.
+
+    Accepts 1/0, y/n, yes/no, true/false and on/off, in any case.  Unset or
+    empty variables return default.
+    """
+    value = os.getenv(name, "").strip().lower()
+    if not value:
+        return default
+
+    if value in ("1", "y", "yes", "true", "on"):
+        return True
+    if value in ("0", "n", "no", "false", "off"):
+        return False
+
+    raise ValueError(
+        "Invalid value {!r} for boolean {}".format(os.getenv(name), name))
+
+
 def get_part_information(db_root, part):
     filename = os.path.join(db_root, "mapping", "parts.yaml")
     assert os.path.isfile(filename), \
@@ -207,16 +239,37 @@ def slice_xy():
     return ((ms[0], ms[2] + 1), (ms[1], ms[3] + 1))
 
 
-def get_roi():
+@functools.lru_cache(maxsize=None)
+def _get_roi_database(db_root, part, use_cache):
     from .db import Database
+    db = Database(db_root, part)
+    db.grid(use_cache=use_cache)
+    return db
+
+
+def get_roi():
+    """ Returns Roi of the XRAY_ROI_GRID_* region of the database.
+
+    The Database and its Grid are shared by every call with the same database
+    root and part in a process, so generators calling get_roi several times
+    parse tilegrid.json once.  If XRAY_ROI_CACHE is set to 1, the grid is
+    also loaded from the cache directory (see grid.get_grid), which is shared
+    between processes.
+
+    """
     (x1, x2), (y1, y2) = roi_xy()
-    db = Database(get_db_root(), get_part())
+    db = _get_roi_database(
+        os.path.abspath(get_db_root()), get_part(),
+        get_env_flag('XRAY_ROI_CACHE'))
     return Roi(db=db, x1=x1, x2=x2, y1=y1, y2=y2)
 
 
+SITE_XY_RE = re.compile(r'.*_X([0-9]*)Y([0-9]*)')
+
+
 def gen_sites_xy(site_types):
     for _tile_name, site_name, _site_type in get_roi().gen_sites(site_types):
-        m = re.match(r'.*_X([0-9]*)Y([0-9]*)', site_name)
+        m = SITE_XY_RE.match(site_name)
         x, y = int(m.group(1)), int(m.group(2))
         yield (site_name, (x, y))
 
@@ -447,4 +500,3 @@ def add_bool_arg(parser, yes_arg, default=False, **kwargs):
         yes_arg, dest=dest, action='store_true', default=default, **kwargs)
     parser.add_argument(
         '--no-' + dashed, dest=dest, action='store_false', **kwargs)
-
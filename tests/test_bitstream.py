@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020  The Project X-Ray Authors.
+#
+# Use of this source code is governed by a ISC-style
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/ISC
+#
+# SPDX-License-Identifier: ISC
+
+import io
+import json
+import os
+import struct
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+
+from prjxray import bitstream
+
+PART = {
+    'global_clock_regions': {
+        'top': {
+            'rows': {
+                '0': {
+                    'configuration_buses': {
+                        'CLB_IO_CLK': {
+                            'configuration_columns': {
+                                '0': {
+                                    'frame_count': 2
+                                },
+                                '1': {
+                                    'frame_count': 1
+                                },
+                            }
+                        }
+                    }
+                },
+                '1': {
+                    'configuration_buses': {
+                        'CLB_IO_CLK': {
+                            'configuration_columns': {
+                                '0': {
+                                    'frame_count': 1
+                                },
+                            }
+                        }
+                    }
+                },
+            }
+        }
+    }
+}
+
+
+def type1(reg, words):
+    return [(1 << 29) | (2 << 27) | (reg << 13) | len(words)] + list(words)
+
+
+def frame(value):
+    return [value] * bitstream.FRAME_WORD_COUNT
+
+
+def to_bytes(words):
+    # Header bytes and dummy words before the sync word are skipped.
+    return b'header' + struct.pack(
+        '>{}I'.format(len(words) + 2), 0xffffffff, bitstream.SYNC_WORD, *words)
+
+
+class TestBitstream(TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        part_json = os.path.join(self.tmp.name, 'part.json')
+        with open(part_json, 'w') as f:
+            json.dump(PART, f)
+
+        self.frame_addresses = bitstream.get_part_frame_addresses(part_json)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_part_frame_addresses(self):
+        self.assertEqual(self.frame_addresses, [0x0, 0x1, 0x80, 0x20000])
+
+    def test_load_bitstream_frames(self):
+        fdri = frame(1) + frame(2) + frame(3) + frame(0) + frame(0) + frame(4)
+        words = type1(bitstream.REG_CMD, [bitstream.CMD_WCFG])
+        words += type1(bitstream.REG_FAR, [0])
+        words += type1(bitstream.REG_FDRI, [])
+        words += [(2 << 29) | (2 << 27) | len(fdri)] + fdri
+        words += type1(bitstream.REG_CMD, [bitstream.CMD_MFW])
+        words += type1(bitstream.REG_FAR, [0x1])
+        words += type1(bitstream.REG_MFWR, [0, 0])
+
+        frames = bitstream.load_bitstream_frames(
+            io.BytesIO(to_bytes(words)), self.frame_addresses)
+        self.assertEqual(
+            [(addr, words[0]) for addr, words in frames], [
+                (0x0, 1),
+                (0x1, 2),
+                (0x80, 3),
+                (0x20000, 4),
+                (0x1, 4),
+            ])
+
+        bitdata = bitstream.frames_to_bitdata(frames, frame_range=(0x0, 0x81))
+        self.assertEqual(sorted(bitdata.keys()), [0x0, 0x1, 0x80])
+        self.assertEqual(
+            bitdata[0x1][1],
+            set(
+                word * 32 + 2
+                for word in range(bitstream.FRAME_WORD_COUNT)
+                if word != bitstream.ECC_WORD))
+        self.assertNotIn(bitstream.ECC_WORD, bitdata[0x0][0])
+
+    def test_load_frm_frames(self):
+        frm = io.StringIO('0x00000080 0x00000000,0x00000005\n\n')
+        frames = bitstream.load_frm_frames(frm)
+        self.assertEqual(frames, [(0x80, (0, 5))])
+        self.assertEqual(
+            bitstream.frames_to_bitdata(frames), {0x80: ({1}, {32, 34})})
+
+    def test_frames_load_bits(self):
+        bits = io.StringIO(
+            'bit_00020500_000_08\n'
+            'bit_00020500_002_31\n'
+            'bit_00020481_001_00\n')
+        frames = bitstream.Frames.load_bits(bits)
+
+        self.assertEqual(list(frames), [0x20481, 0x20500])
+        self.assertTrue(frames.get_bit(0x20500, 95))
+        self.assertFalse(frames.get_bit(0x20500, 94))
+        self.assertFalse(frames.get_bit(0x20501, 95))
+        self.assertEqual(
+            list(frames.nonzero_words(0x20500).nonzero()[0]), [0, 2])
+        self.assertEqual(
+            list(frames.iter_bits()), [
+                (0x20481, 1, 0),
+                (0x20500, 0, 8),
+                (0x20500, 2, 31),
+            ])
+        self.assertEqual(
+            sorted(frames.iter_window_bits(0x20480, 2, 1, 2)), [(1, 0)])
+        self.assertEqual(
+            bitstream.Frames.from_bitdata(frames.to_bitdata()).words.tolist(),
+            frames.words.tolist())
+
+    def test_frames_window_clipped(self):
+        frames = bitstream.Frames([0x80])
+        frames.words[0, 0] = 1
+        frames.words[0, 1] = 2
+        frames.words[0, bitstream.FRAME_WORD_COUNT - 1] = 3
+
+        # Words before word 0 or after the last word of the frame read as
+        # zero.
+        self.assertEqual(
+            frames.window(0x80, 2, -2, 4).tolist(), [
+                [0, 0, 1, 2],
+                [0, 0, 0, 0],
+            ])
+        self.assertEqual(frames.window(0x80, 1, -2, 1).tolist(), [[0]])
+        self.assertEqual(
+            frames.window(0x80, 1, bitstream.FRAME_WORD_COUNT - 1, 2).tolist(),
+            [[3, 0]])
+        self.assertEqual(
+            sorted(frames.iter_window_bits(0x80, 1, -1, 2)), [(0, 32)])
+
+    def test_parse_frame_range(self):
+        self.assertEqual(
+            bitstream.parse_frame_range('0x00000000:0x0000007f'), (0, 0x80))
+
+
+if __name__ == '__main__':
+    main()
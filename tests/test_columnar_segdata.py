@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020  The Project X-Ray Authors.
+#
+# Use of this source code is governed by a ISC-style
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/ISC
+#
+# SPDX-License-Identifier: ISC
+
+import contextlib
+import io
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+
+import numpy as np
+
+from prjxray import columnar_segdata
+from prjxray import lms_solver
+
+SEGDATA_TEXT = """\
+seg 00020000_000
+bit 00_00
+bit 01_00
+bit 02_00
+tag TAG_A 1
+tag TAG_C 1
+seg 00020000_001
+bit 00_01
+tag TAG_C 0
+seg 00020000_002
+bit 00_01
+bit 00_01
+tag TAG_A 0
+tag TAG_B 1
+tag TAG_B 0
+seg 00020000_003
+tag TAG_B 1
+seg 00020000_004
+bit 00_00
+"""
+
+
+class TestColumnarSegdata(TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.text_file = os.path.join(self.tmp.name, "segdata_clbll_l.txt")
+        self.npz_file = os.path.join(self.tmp.name, "segdata_clbll_l.npz")
+        with open(self.text_file, "w") as f:
+            f.write(SEGDATA_TEXT)
+
+        columnar_segdata.write(
+            self.npz_file, columnar_segdata.read_text(self.text_file))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        segdata = columnar_segdata.read(self.npz_file)
+        self.assertEqual(segdata.segs.tolist()[1], "00020000_001")
+        self.assertEqual(
+            segdata.tag_names.tolist(), ["TAG_A", "TAG_B", "TAG_C"])
+
+        text_file = os.path.join(self.tmp.name, "round_trip.txt")
+        columnar_segdata.write_text(text_file, segdata)
+        with open(text_file) as f:
+            segments = list(columnar_segdata.iter_text_segments(f))
+
+        # Repeated bits are stored once, repeated tags keep their last value.
+        self.assertEqual(
+            segments[2],
+            ("00020000_002", ["00_01"], [("TAG_A", 0), ("TAG_B", 0)]))
+        for expected, actual in zip(columnar_segdata.read_text(text_file),
+                                    segdata):
+            np.testing.assert_array_equal(expected, actual)
+
+    def test_lms_solver(self):
+        all_tags = ["TAG_A", "TAG_B"]
+        all_bits = ["00_00", "00_01", "01_00"]
+
+        def tagfilter(tag):
+            return tag != "TAG_C"
+
+        text_segdata = lms_solver.load_data(self.text_file, tagfilter)
+        npz_segdata = lms_solver.load_data(self.npz_file, tagfilter)
+        self.assertEqual(
+            [data["seg"].split(":")[1] for data in text_segdata],
+            ["00020000_000", "00020000_002", "00020000_003"])
+        self.assertEqual(
+            [data["seg"].split(":")[1] for data in npz_segdata],
+            [data["seg"].split(":")[1] for data in text_segdata])
+
+        expected = lms_solver.encode_segdata(all_tags, all_bits, text_segdata)
+        actual = lms_solver.encode_columnar_segdata(
+            all_tags, all_bits, columnar_segdata.read(self.npz_file),
+            tagfilter)
+        self.assertEqual(actual.n_rows, expected.n_rows)
+        for expected_matrix, actual_matrix in zip(lms_solver.build_matrices(
+                all_tags, all_bits, expected), lms_solver.build_matrices(
+                    all_tags, all_bits, actual)):
+            np.testing.assert_array_equal(expected_matrix, actual_matrix)
+
+    def test_lms_solver_matrices(self):
+        columns = columnar_segdata.read(self.npz_file)
+        # Repeated tags of the text file are stored once in the columns.
+        segdata = lms_solver.load_data(self.npz_file) * 2
+
+        bits, tags = lms_solver.columnar_bits_and_tags(columns)
+        self.assertEqual(tags, {"TAG_A", "TAG_B", "TAG_C"})
+        self.assertEqual(bits, {"00_00", "00_01", "01_00", "02_00"})
+
+        all_tags = sorted(tags)
+        all_bits = sorted(bits)
+        encoded = lms_solver.concatenate_segdata_matrices(
+            [
+                lms_solver.encode_columnar_segdata(
+                    all_tags, all_bits, columns) for _ in range(2)
+            ])
+        self.assertEqual(encoded.n_rows, len(segdata))
+        self.assertEqual(
+            lms_solver.compute_tag_stats(all_tags, encoded),
+            lms_solver.compute_tag_stats(all_tags, segdata))
+
+        def solve(segdata):
+            with contextlib.redirect_stdout(io.StringIO()):
+                return lms_solver.solve_onebyone(
+                    all_tags,
+                    all_bits,
+                    segdata,
+                    solver=lms_solver.solve_tichonov,
+                    a=0.1)
+
+        for expected, actual in zip(solve(segdata), solve(encoded)):
+            np.testing.assert_array_equal(expected, actual)
+
+
+if __name__ == '__main__':
+    main()
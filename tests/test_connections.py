@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020  The Project X-Ray Authors.
+#
+# Use of this source code is governed by a ISC-style
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/ISC
+#
+# SPDX-License-Identifier: ISC
+
+from unittest import TestCase, main
+
+from prjxray.connections import Connections
+
+
+class TestConnections(TestCase):
+    def setUp(self):
+        # Checkerboard of tile types A and B, with a hole at X2Y2.
+        tilegrid = {}
+        for x in range(5):
+            for y in range(4):
+                if (x, y) == (2, 2):
+                    continue
+
+                tile_type = 'B' if (x + y) % 2 else 'A'
+                tilegrid['{}_X{}Y{}'.format(tile_type, x, y)] = {
+                    'type': tile_type,
+                    'grid_x': x + 10,
+                    'grid_y': y,
+                }
+
+        tileconn = [
+            {
+                'grid_deltas': [1, 0],
+                'tile_types': ['A', 'B'],
+                'wire_pairs': [['A0', 'B0'], ['A1', 'B1']],
+            },
+            {
+                'grid_deltas': [-1, 1],
+                'tile_types': ['B', 'B'],
+                'wire_pairs': [['B1', 'B0']],
+            },
+            {
+                'grid_deltas': [0, -2],
+                'tile_types': ['A', 'A'],
+                'wire_pairs': [['A0', 'A1']],
+            },
+        ]
+        tile_wires = {'A': ['A0', 'A1'], 'B': ['B0', 'B1', 'B2']}
+
+        self.connections = Connections(tilegrid, tileconn, tile_wires)
+
+    def test_get_connection_arrays(self):
+        connections = set()
+        for connection in self.connections.get_connection_arrays():
+            for tile_a, wire_a, tile_b, wire_b in zip(
+                    connection.tile_a, connection.wire_a, connection.tile_b,
+                    connection.wire_b):
+                tile_a = self.connections.tiles[tile_a]
+                tile_b = self.connections.tiles[tile_b]
+                connections.add(
+                    (
+                        tile_a, self.connections.tile_type_wires[
+                            self.connections.grid[tile_a]['type']][wire_a],
+                        tile_b, self.connections.tile_type_wires[
+                            self.connections.grid[tile_b]['type']][wire_b]))
+
+        expected = set(
+            (
+                connection.wire_a.tile, connection.wire_a.wire,
+                connection.wire_b.tile, connection.wire_b.wire)
+            for connection in self.connections.get_connections())
+
+        self.assertTrue(len(expected) > 0)
+        self.assertEqual(connections, expected)
+
+    def test_wire_pkeys(self):
+        tile_wire_base = self.connections.tile_wire_base
+        self.assertEqual(tile_wire_base[0], 0)
+        self.assertEqual(tile_wire_base[-1], 9 * 2 + 10 * 3)
+        self.assertEqual(
+            self.connections.wire_pkeys(1, 1).tolist(), tile_wire_base[1] + 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020  The Project X-Ray Authors.
+#
+# Use of this source code is governed by a ISC-style
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/ISC
+#
+# SPDX-License-Identifier: ISC
+
+import os
+import shutil
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main, mock
+
+from prjxray import db_snapshot
+from prjxray.db import Database
+from prjxray.grid_types import BlockType
+
+TEST_DB = os.path.join(
+    os.path.dirname(__file__), '..', 'utils', 'test_data', 'db')
+TEST_PART = 'xc7a200tffg1156-1'
+
+
+class TestDbSnapshot(TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+        env = mock.patch.dict(
+            os.environ,
+            {'XRAY_CACHE_DIR': os.path.join(self.tmp.name, 'cache')})
+        env.start()
+        self.addCleanup(env.stop)
+
+        self.db_root = os.path.join(self.tmp.name, 'db')
+        shutil.copytree(TEST_DB, self.db_root)
+
+    def test_snapshot_roundtrip(self):
+        db = Database(self.db_root, TEST_PART, use_snapshot=True)
+        self.assertTrue(
+            os.path.exists(db_snapshot.snapshot_path(self.db_root, TEST_PART)))
+
+        restored = Database(self.db_root, TEST_PART, use_snapshot=True)
+        self.assertIsNot(restored.grid(), db.grid())
+        self.assertIs(restored.grid().db, restored)
+        self.assertEqual(restored.tile_types, db.tile_types)
+        self.assertEqual(
+            list(restored.grid().tiles()), list(db.grid().tiles()))
+        self.assertEqual(
+            restored.get_tile_segbits('CLBLM_L').segbits,
+            db.get_tile_segbits('CLBLM_L').segbits)
+
+    def test_snapshot_invalidated(self):
+        Database(self.db_root, TEST_PART, use_snapshot=True)
+        key = db_snapshot.compute_key(self.db_root, TEST_PART, 'xc7a200t')
+
+        segbits = os.path.join(self.db_root, 'segbits_clblm_l.db')
+        with open(segbits, 'a') as f:
+            f.write('CLBLM_L.TEST_FEATURE 00_00\n')
+
+        self.assertNotEqual(
+            key, db_snapshot.compute_key(self.db_root, TEST_PART, 'xc7a200t'))
+        self.assertIsNone(
+            db_snapshot.load_snapshot(self.db_root, TEST_PART, 'xc7a200t'))
+
+        db = Database(self.db_root, TEST_PART, use_snapshot=True)
+        self.assertIn(
+            'CLBLM_L.TEST_FEATURE',
+            db.get_tile_segbits('CLBLM_L').segbits[BlockType.CLB_IO_CLK])
+
+    def test_cached_grid(self):
+        db = Database(self.db_root, TEST_PART)
+        grid = db.grid(use_cache=True)
+        self.assertIsNotNone(grid._grid_index)
+
+        restored = Database(self.db_root, TEST_PART)
+        restored_grid = restored.grid(use_cache=True)
+        self.assertIsNot(restored_grid, grid)
+        self.assertIs(restored_grid.db, restored)
+        self.assertIsNone(restored.tilegrid)
+        self.assertIsNotNone(restored_grid._grid_index)
+        self.assertEqual(list(restored_grid.tiles()), list(grid.tiles()))
+        self.assertEqual(
+            restored_grid.sites_in_rect(0, 58, 0, 155),
+            grid.sites_in_rect(0, 58, 0, 155))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020  The Project X-Ray Authors.
+#
+# Use of this source code is governed by a ISC-style
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/ISC
+#
+# SPDX-License-Identifier: ISC
+
+import os
+from unittest import TestCase, main
+
+from prjxray.db import Database
+from prjxray.fasm_assembler import FasmAssembler, FasmInconsistentBits
+
+TEST_DB = os.path.join(
+    os.path.dirname(__file__), '..', 'utils', 'test_data', 'db')
+TEST_PART = 'xc7a200tffg1156-1'
+
+
+class TestFasmAssembler(TestCase):
+    def setUp(self):
+        self.assembler = FasmAssembler(Database(TEST_DB, TEST_PART))
+
+    def test_get_frames_sparse(self):
+        self.assembler.frame_set(0x100, 3, 5, 'A')
+        self.assembler.frame_set(0x100, 3, 5, 'B')
+        self.assembler.frame_clear(0x100, 4, 0, 'C')
+        self.assembler.frame_clear(0x101, 0, 0, 'C')
+        self.assembler.frame_set(0x101, -1, 31, 'D')
+
+        frames = self.assembler.get_frames(sparse=True)
+        self.assertEqual(sorted(frames.keys()), [0x100, 0x101])
+        self.assertEqual(frames[0x100][3], 1 << 5)
+        self.assertEqual(sum(frames[0x100]), 1 << 5)
+        self.assertEqual(frames[0x101][100], 1 << 31)
+        self.assertEqual(sum(frames[0x101]), 1 << 31)
+
+    def test_inconsistent_bits(self):
+        self.assembler.frame_set(0x100, 3, 5, 'A')
+        self.assembler.frame_clear(0x100, 3, 6, 'B')
+
+        with self.assertRaisesRegex(FasmInconsistentBits,
+                                    'line "C" .* cleared by FASM line "B"'):
+            self.assembler.frame_set(0x100, 3, 6, 'C')
+
+        with self.assertRaisesRegex(FasmInconsistentBits,
+                                    'line "D" .* set by FASM line "A"'):
+            self.assembler.frame_clear(0x100, 3, 5, 'D')
+
+
+if __name__ == '__main__':
+    main()
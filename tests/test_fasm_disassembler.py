@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020  The Project X-Ray Authors.
+#
+# Use of this source code is governed by a ISC-style
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/ISC
+#
+# SPDX-License-Identifier: ISC
+
+import os
+from unittest import TestCase, main
+
+from prjxray import bitstream
+from prjxray.db import Database
+from prjxray.fasm_disassembler import FasmDisassembler
+
+TEST_DATA = os.path.join(os.path.dirname(__file__), '..', 'utils', 'test_data')
+TEST_PART = 'xc7a200tffg1156-1'
+
+
+class TestFasmDisassembler(TestCase):
+    def setUp(self):
+        self.disassembler = FasmDisassembler(
+            Database(os.path.join(TEST_DATA, 'db'), TEST_PART))
+
+        with open(os.path.join(TEST_DATA, 'lut_int', 'design.bits')) as f:
+            self.bitdata = bitstream.Frames.load_bits(f)
+
+        # Add a bit outside of any tile to get an unknown bit report.
+        self.bitdata.set_bit(next(iter(self.bitdata)), 100 * 32)
+
+    def find_features(self, **kwargs):
+        return list(
+            self.disassembler.find_features_in_bitstream(
+                self.bitdata, verbose=True, **kwargs))
+
+    def test_jobs(self):
+        fasm_lines = self.find_features()
+        self.assertTrue(
+            any(
+                fasm_line.annotations
+                and fasm_line.annotations[0].name == 'unknown_bit'
+                for fasm_line in fasm_lines))
+        self.assertEqual(self.find_features(jobs=2), fasm_lines)
+
+    def test_jobs_order(self):
+        with open(os.path.join(TEST_DATA, 'ff_int', 'design.bits')) as f:
+            self.bitdata = bitstream.Frames.load_bits(f)
+
+        fasm_lines = self.find_features()
+        self.assertGreater(len(fasm_lines), 1)
+        self.assertEqual(self.find_features(jobs=4), fasm_lines)
+
+
+if __name__ == '__main__':
+    main()
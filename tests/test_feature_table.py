@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020  The Project X-Ray Authors.
+#
+# Use of this source code is governed by a ISC-style
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/ISC
+#
+# SPDX-License-Identifier: ISC
+
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main, mock
+
+import numpy as np
+
+from prjxray import feature_table
+from prjxray.db import Database
+
+TEST_DB = os.path.join(
+    os.path.dirname(__file__), '..', 'utils', 'test_data', 'db')
+TEST_PART = 'xc7a200tffg1156-1'
+
+
+class TestFeatureTable(TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+        env = mock.patch.dict(os.environ, {'XRAY_CACHE_DIR': self.tmp.name})
+        env.start()
+        self.addCleanup(env.stop)
+
+        self.db = Database(TEST_DB, TEST_PART)
+
+    def test_matches_feature_to_bits(self):
+        grid = self.db.grid()
+        table = feature_table.FeatureTable.build(self.db)
+
+        checked_alias = False
+        for tile in grid.tiles():
+            gridinfo = grid.gridinfo_at_tilename(tile)
+            segbits = grid.get_tile_segbits_at_tilename(tile)
+            features, _, _ = table.get_tile_info(tile)
+
+            for feature, address in features:
+                expected = [
+                    (block_type, bit.word_column, bit.word_bit, bit.isset)
+                    for block_type, bit in segbits.feature_to_bits(
+                        gridinfo.bits, gridinfo.tile_type + '.' +
+                        feature, address)
+                ]
+                bits = [
+                    (block_type, frame, word_bit, bool(isset))
+                    for block_type, frame, word_bit, isset in table.
+                    feature_bits(tile, feature, address)
+                ]
+                self.assertEqual(bits, expected)
+
+                if tile == 'LIOB33_SING_X0Y0' and bits:
+                    checked_alias = True
+
+        self.assertTrue(checked_alias)
+        self.assertIsNone(
+            table.feature_bits('CLBLM_L_X10Y102', 'NOT_A_FEATURE'))
+
+    def test_cached(self):
+        table = feature_table.get_feature_table(self.db)
+        cached = feature_table.get_feature_table(self.db)
+
+        self.assertIsInstance(cached.bits, np.memmap)
+        self.assertEqual(cached.templates, table.templates)
+        self.assertEqual(cached.bits.tolist(), table.bits.tolist())
+
+
+if __name__ == '__main__':
+    main()
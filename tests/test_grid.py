@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020  The Project X-Ray Authors.
+#
+# Use of this source code is governed by a ISC-style
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/ISC
+#
+# SPDX-License-Identifier: ISC
+
+import os
+from unittest import TestCase, main
+
+from prjxray.db import Database
+from prjxray.overlay import Overlay
+from prjxray.roi import Roi
+
+TEST_DB = os.path.join(
+    os.path.dirname(__file__), '..', 'utils', 'test_data', 'db')
+TEST_PART = 'xc7a200tffg1156-1'
+
+
+class TestGrid(TestCase):
+    def setUp(self):
+        self.db = Database(TEST_DB, TEST_PART)
+        self.grid = self.db.grid()
+
+    def scan_tiles(self, in_rect, tile_types=None):
+        for tile in self.grid.tiles():
+            if not in_rect(self.grid.loc_of_tilename(tile)):
+                continue
+
+            gridinfo = self.grid.gridinfo_at_tilename(tile)
+            if tile_types is None or gridinfo.tile_type in tile_types:
+                yield tile
+
+    def scan_sites(self, in_rect, site_types=None):
+        for tile in self.scan_tiles(in_rect):
+            gridinfo = self.grid.gridinfo_at_tilename(tile)
+            for site, site_type in gridinfo.sites.items():
+                if site_types is None or site_type in site_types:
+                    yield (tile, site, site_type)
+
+    def test_roi(self):
+        x_min, x_max, y_min, y_max = self.grid.dims()
+        rects = [
+            (x_min, x_max, y_min, y_max),
+            (x_min - 10, x_max + 10, y_min - 10, y_max + 10),
+            (10, 58, 0, 51),
+            (30, 20, 0, 51),
+            (x_max + 1, x_max + 5, 0, 51),
+        ]
+        tile_types = ['CLBLL_L', 'CLBLM_R', 'INT_L', 'NOT_A_TILE']
+        site_types = ['SLICEL', 'SLICEM', 'RAMB18E1', 'NOT_A_SITE']
+
+        for x1, x2, y1, y2 in rects:
+            roi = Roi(self.db, x1, x2, y1, y2)
+            for tile_type_list in (None, tile_types):
+                self.assertEqual(
+                    list(roi.gen_tiles(tile_type_list)),
+                    list(self.scan_tiles(roi.tile_in_roi, tile_type_list)))
+
+            for site_type_list in (None, site_types):
+                self.assertEqual(
+                    list(roi.gen_sites(site_type_list)),
+                    list(self.scan_sites(roi.tile_in_roi, site_type_list)))
+
+    def test_overlay(self):
+        overlay = Overlay(
+            {
+                'pr1': (10, 58, 0, 51),
+                'pr2': (10, 58, 52, 103)
+            }, self.db)
+
+        self.assertEqual(
+            list(overlay.gen_tiles()),
+            list(self.scan_tiles(overlay.tile_in_roi)))
+        self.assertEqual(
+            list(overlay.gen_sites(['SLICEL'])),
+            list(self.scan_sites(overlay.tile_in_roi, ['SLICEL'])))
+
+    def test_type_and_clock_region(self):
+        for tile in self.grid.tiles():
+            gridinfo = self.grid.gridinfo_at_tilename(tile)
+            self.assertIn(tile, self.grid.tiles_of_type(gridinfo.tile_type))
+            for site, site_type in gridinfo.sites.items():
+                self.assertIn(
+                    (tile, site, site_type),
+                    self.grid.sites_of_type(site_type))
+            if gridinfo.clock_region is not None:
+                self.assertIn(
+                    tile,
+                    self.grid.tiles_in_clock_region(
+                        gridinfo.clock_region.name))
+
+        self.assertEqual(self.grid.tiles_of_type('NOT_A_TILE'), [])
+        self.assertEqual(self.grid.sites_of_type('NOT_A_SITE'), [])
+        self.assertEqual(self.grid.tiles_in_clock_region('X9Y9'), [])
+
+
+if __name__ == '__main__':
+    main()
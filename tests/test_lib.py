@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020  The Project X-Ray Authors.
+#
+# Use of this source code is governed by a ISC-style
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/ISC
+#
+# SPDX-License-Identifier: ISC
+
+import os
+import pickle
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+
+from prjxray.lib import NodeLookup
+
+NODES = {
+    'INT_L_X0Y1/EE2BEG0': [
+        {
+            'wire': 'INT_L_X0Y1/EE2BEG0'
+        },
+        {
+            'wire': 'INT_R_X1Y1/EE2A0'
+        },
+        {
+            'wire': 'INT_L_X2Y1/EE2END0'
+        },
+    ],
+    'CLBLM_L_X0Y1/CLBLM_L_A': [
+        {
+            'wire': 'CLBLM_L_X0Y1/CLBLM_L_A'
+        },
+        {
+            'wire': 'INT_L_X0Y1/LOGIC_OUTS_L8'
+        },
+    ],
+    'INT_L_X2Y1/LOGIC_OUTS_L8': [
+        {
+            'wire': 'INT_L_X2Y1/LOGIC_OUTS_L8'
+        },
+    ],
+}
+
+
+class TestNodeLookup(TestCase):
+    def check_lookup(self, node_lookup):
+        self.assertEqual(list(node_lookup.get_nodes()), sorted(NODES))
+
+        tiles = set()
+        for node, wires in NODES.items():
+            self.assertEqual(
+                node_lookup.wires_for_node(node),
+                tuple(wire['wire'] for wire in wires))
+
+            for wire in wires:
+                tile = wire['wire'].split('/')[0]
+                tiles.add(tile)
+                self.assertEqual(
+                    list(node_lookup.site_pin_node_to_wires(tile, node)), [
+                        w['wire'][len(tile) + 1:]
+                        for w in wires
+                        if w['wire'].startswith(tile + '/')
+                    ])
+
+        for tile in tiles:
+            self.assertEqual(
+                sorted(node_lookup.wires_for_tile(tile)),
+                sorted(
+                    wire['wire'][len(tile) + 1:]
+                    for wires in NODES.values()
+                    for wire in wires
+                    if wire['wire'].startswith(tile + '/')))
+
+        self.assertEqual(list(node_lookup.wires_for_tile('NO_TILE')), [])
+        self.assertEqual(
+            list(node_lookup.site_pin_node_to_wires('INT_L_X0Y1', None)), [])
+
+    def test_load_from_nodes(self):
+        node_lookup = NodeLookup()
+        node_lookup.load_from_nodes(NODES)
+        self.check_lookup(node_lookup)
+
+    def test_save_to_file(self):
+        node_lookup = NodeLookup()
+        node_lookup.load_from_nodes(NODES)
+
+        with TemporaryDirectory() as tmp:
+            fname = os.path.join(tmp, 'node_lookup')
+            node_lookup.save_to_file(fname)
+
+            node_lookup = NodeLookup()
+            node_lookup.load_from_file(fname)
+            self.check_lookup(node_lookup)
+
+            # Pickle of older versions.
+            fname = os.path.join(tmp, 'nodes.pickle')
+            with open(fname, 'wb') as f:
+                pickle.dump(NODES, f)
+
+            node_lookup = NodeLookup()
+            node_lookup.load_from_file(fname)
+            self.check_lookup(node_lookup)
+
+
+if __name__ == '__main__':
+    main()
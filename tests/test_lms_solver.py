@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020  The Project X-Ray Authors.
+#
+# Use of this source code is governed by a ISC-style
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/ISC
+#
+# SPDX-License-Identifier: ISC
+
+import contextlib
+import io
+import os
+import random
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+
+import numpy as np
+
+from prjxray import lms_solver
+
+ALL_TAGS = ["TAG_A", "TAG_B"]
+ALL_BITS = ["00_00", "00_01", "01_00"]
+SEGDATA = [
+    {
+        "seg": "seg0",
+        "bit": ["00_00", "01_00", "02_00"],
+        "tag": [("TAG_A", 1), ("TAG_C", 1)],
+    },
+    {
+        "seg": "seg1",
+        "bit": ["00_01", "00_01"],
+        "tag": [("TAG_A", 0), ("TAG_B", 1), ("TAG_B", 0)],
+    },
+    {
+        "seg": "seg2",
+        "bit": [],
+        "tag": [("TAG_B", 1)],
+    },
+]
+
+
+class TestLmsSolver(TestCase):
+    def test_build_matrices(self):
+        A, B = lms_solver.build_matrices(ALL_TAGS, ALL_BITS, SEGDATA, bias=0.5)
+
+        np.testing.assert_array_equal(
+            A, [
+                [+1, -1, +1],
+                [-1, +1, -1],
+                [-1, -1, -1],
+            ])
+        np.testing.assert_array_equal(
+            B, [
+                [+1.5, 0],
+                [-0.5, -0.5],
+                [0, +1.5],
+            ])
+
+    def test_build_matrices_encoded(self):
+        encoded = lms_solver.encode_segdata(ALL_TAGS, ALL_BITS, SEGDATA)
+        self.assertEqual(encoded.n_rows, len(SEGDATA))
+
+        expected = lms_solver.build_matrices(ALL_TAGS, ALL_BITS, SEGDATA)
+        actual = lms_solver.build_matrices(ALL_TAGS, ALL_BITS, encoded)
+        for expected_matrix, actual_matrix in zip(expected, actual):
+            np.testing.assert_array_equal(expected_matrix, actual_matrix)
+
+    def test_build_matrices_empty(self):
+        A, B = lms_solver.build_matrices(ALL_TAGS, ALL_BITS, [])
+        self.assertEqual(A.shape, (0, len(ALL_BITS)))
+        self.assertEqual(B.shape, (0, len(ALL_TAGS)))
+
+    def test_compute_bit_correlations(self):
+        W = np.array([
+            [+1, 0, +1],
+            [-1, 0, +1],
+        ])
+        C, exceptions = lms_solver.compute_bit_correlations(
+            ALL_TAGS, ALL_BITS, SEGDATA, W)
+
+        # TAG_A is 1 in seg0 and 0 in seg1, TAG_B is 0 in seg1 (last value)
+        # and 1 in seg2.
+        np.testing.assert_array_equal(C, [
+            [1.0, 0.0, 1.0],
+            [0.5, 0.0, 0.5],
+        ])
+        self.assertEqual(
+            exceptions, {
+                "TAG_A": {},
+                "TAG_B": {
+                    "00_00": [(0, 1, "seg1")],
+                    "01_00": [(0, 1, "seg2")],
+                },
+            })
+
+    def test_solve_onebyone(self):
+        rng = random.Random(0)
+        all_bits = ["00_%02d" % i for i in range(12)]
+        all_tags = ["TAG_%d" % i for i in range(6)]
+        segdata = []
+        for r in range(60):
+            tags = all_tags[:3] if r % 2 else all_tags[3:]
+            segdata.append(
+                {
+                    "seg": "seg%d" % r,
+                    "bit": rng.sample(all_bits, 4),
+                    "tag": [(tag, rng.randint(0, 1)) for tag in tags],
+                })
+
+        def solve(**kw):
+            with contextlib.redirect_stdout(io.StringIO()):
+                return lms_solver.solve_onebyone(
+                    all_tags,
+                    all_bits,
+                    segdata,
+                    solver=lms_solver.solve_tichonov,
+                    bias=0.1,
+                    a=0.01,
+                    **kw)
+
+        def solve_serial(solver, **kw):
+            X = np.empty((len(all_bits), len(all_tags)))
+            for i, tag in enumerate(all_tags):
+                tag_segdata = [
+                    data for data in segdata
+                    if tag in [t[0] for t in data["tag"]]
+                ]
+                X1, _ = solver([tag], all_bits, tag_segdata, **kw)
+                X[:, i] = X1[:, 0]
+            return X
+
+        X, E = solve()
+        np.testing.assert_array_equal(
+            X, solve_serial(lms_solver.solve_tichonov, bias=0.1, a=0.01))
+
+        X_jobs, E_jobs = solve(jobs=2)
+        np.testing.assert_array_equal(X, X_jobs)
+        np.testing.assert_array_equal(E, E_jobs)
+
+        X_batch, E_batch = solve(jobs=2, batch=True)
+        np.testing.assert_allclose(X, X_batch, atol=1e-9)
+        np.testing.assert_allclose(E, E_batch, atol=1e-9)
+
+    def test_normal_equations(self):
+        rng = random.Random(1)
+        all_bits = ["00_%02d" % i for i in range(10)]
+        all_tags = ["TAG_%d" % i for i in range(4)]
+        segdata = []
+        for r in range(40):
+            # Bits and tags appear progressively, so later batches add new
+            # columns to the accumulator.
+            segdata.append(
+                {
+                    "seg":
+                    "seg%d" % r,
+                    "bit":
+                    rng.sample(all_bits[:3 + r // 4], 3),
+                    "tag": [
+                        (tag, rng.randint(0, 1))
+                        for tag in all_tags[:1 + r // 12]
+                    ],
+                })
+
+        with TemporaryDirectory() as d:
+            file_name = os.path.join(d, "accumulator.npz")
+            accumulator = lms_solver.NormalEquations(
+                bias=0.1, tag_filter="TAG")
+            for start in range(0, len(segdata), 16):
+                accumulator.add_segdata(
+                    segdata[start:start + 16], "batch%d" % start)
+                accumulator.save(file_name)
+                accumulator = lms_solver.NormalEquations.load(file_name)
+
+        self.assertEqual(accumulator.files, ["batch0", "batch16", "batch32"])
+        self.assertEqual(accumulator.tag_filter, "TAG")
+        with self.assertRaises(AssertionError):
+            accumulator.add_segdata(segdata[:16], "batch0")
+
+        self.assertEqual(accumulator.n_rows, len(segdata))
+        self.assertEqual(sorted(accumulator.all_bits), all_bits)
+        self.assertEqual(accumulator.all_tags, all_tags)
+        self.assertEqual(
+            accumulator.tag_stats(),
+            lms_solver.compute_tag_stats(all_tags, segdata))
+
+        X, E = accumulator.solve(all_tags, all_bits, a=0.01)
+        X_direct, E_direct = lms_solver.solve_tichonov(
+            all_tags, all_bits, segdata, bias=0.1, a=0.01)
+        np.testing.assert_allclose(X, X_direct, atol=1e-9)
+        np.testing.assert_allclose(E, E_direct, atol=1e-6)
+
+        X, E = accumulator.solve(all_tags[1:], all_bits[2:])
+        X_direct, E_direct = lms_solver.solve_lms(
+            all_tags[1:], all_bits[2:], segdata, bias=0.1)
+        np.testing.assert_allclose(X, X_direct, atol=1e-9)
+        np.testing.assert_allclose(E, E_direct, atol=1e-6)
+
+
+if __name__ == '__main__':
+    main()
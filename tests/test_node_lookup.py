@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020  The Project X-Ray Authors.
+#
+# Use of this source code is governed by a ISC-style
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/ISC
+#
+# SPDX-License-Identifier: ISC
+
+import contextlib
+import io
+import json
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+
+from prjxray.node_lookup import NodeLookup
+
+TILES = {
+    'INT_L': ['INT_L_X0Y0', 'INT_L_X0Y1'],
+    'CLBLL_L': ['CLBLL_L_X1Y0'],
+}
+
+# Node name -> wires of the node.  INT_L_X0Y1 has no wires.
+NODES = {
+    'INT_L_X0Y0/EE2BEG0': ['INT_L_X0Y0/EE2BEG0', 'CLBLL_L_X1Y0/CLBLL_EE2A0'],
+    'INT_L_X0Y0/IMUX0': ['INT_L_X0Y0/IMUX0', 'CLBLL_L_X1Y0/CLBLL_L_A1'],
+    'INT_L_X0Y0/LOGIC_OUTS0': [
+        'CLBLL_L_X1Y0/CLBLL_L_A',
+        'INT_L_X0Y0/LOGIC_OUTS0',
+        'CLBLL_L_X1Y0/CLBLL_L_AMUX',
+    ],
+    'INT_L_X0Y0/GND_WIRE': ['INT_L_X0Y0/GND_WIRE'],
+}
+
+
+class TestNodeLookup(TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+
+        self.tiles = {}
+        for tile_type, tiles in TILES.items():
+            self.tiles[tile_type] = []
+            for tile in tiles:
+                fname = os.path.join(
+                    self.tmp.name, 'tile_{}.json5'.format(tile))
+                with open(fname, 'w') as f:
+                    json.dump({'tile': tile}, f)
+                self.tiles[tile_type].append(fname)
+
+        self.nodes = []
+        for idx, (node, wires) in enumerate(NODES.items()):
+            fname = os.path.join(self.tmp.name, 'node_{}.json5'.format(idx))
+            with open(fname, 'w') as f:
+                json.dump(
+                    {
+                        'node': node,
+                        'wires': [{
+                            'wire': wire
+                        } for wire in wires],
+                    }, f)
+            self.nodes.append(fname)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self, name, processes):
+        node_lookup = NodeLookup(os.path.join(self.tmp.name, name))
+        with contextlib.redirect_stderr(io.StringIO()):
+            node_lookup.build_database(
+                nodes=self.nodes, tiles=self.tiles, processes=processes)
+
+        return node_lookup
+
+    def check_queries(self, node_lookup):
+        all_tiles = [tile for tiles in TILES.values() for tile in tiles]
+        for tile in all_tiles:
+            expected = tuple(
+                wire[len(tile) + 1:]
+                for wires in NODES.values()
+                for wire in wires
+                if wire.startswith(tile + '/'))
+            self.assertEqual(tuple(node_lookup.wires_for_tile(tile)), expected)
+
+            # The batched queries match the per node and per tile queries.
+            node_wires = node_lookup.site_pin_nodes_to_wires(
+                tile,
+                list(NODES) + [None, 'NOT_A_NODE'])
+            for node in NODES:
+                wires = tuple(node_lookup.site_pin_node_to_wires(tile, node))
+                self.assertEqual(node_wires.get(node, ()), wires)
+            self.assertNotIn(None, node_wires)
+            self.assertNotIn('NOT_A_NODE', node_wires)
+
+        self.assertEqual(
+            node_lookup.wires_for_tiles(all_tiles + ['NOT_A_TILE']),
+            dict(
+                (tile, tuple(node_lookup.wires_for_tile(tile)))
+                for tile in all_tiles + ['NOT_A_TILE']))
+
+        self.assertEqual(
+            node_lookup.site_pin_nodes_to_wires(
+                'CLBLL_L_X1Y0', ['INT_L_X0Y0/LOGIC_OUTS0']),
+            {'INT_L_X0Y0/LOGIC_OUTS0': ('CLBLL_L_A', 'CLBLL_L_AMUX')})
+        self.assertEqual(
+            node_lookup.site_pin_nodes_to_wires('NOT_A_TILE', list(NODES)), {})
+
+    def test_build_database(self):
+        self.check_queries(self.build('nodes.db', processes=1))
+
+    def test_build_database_processes(self):
+        self.check_queries(self.build('nodes.db', processes=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020  The Project X-Ray Authors.
+#
+# Use of this source code is governed by a ISC-style
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/ISC
+#
+# SPDX-License-Identifier: ISC
+
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main, mock
+
+import numpy as np
+
+from prjxray.connections import Connections
+from prjxray.grid import Grid
+from prjxray.node_model import NodeModel, get_node_model
+
+N_TILES = 50
+
+
+def make_node_model(progressbar=None):
+    """ Row of tiles, where wire E of a tile connects to wire W of the next
+    tile.  Every tile also has an unconnected LOCAL wire. """
+    tilegrid = {}
+    for x in range(N_TILES):
+        tilegrid['T_X{}Y0'.format(x)] = {
+            'type': 'T',
+            'grid_x': x,
+            'grid_y': 0,
+            'sites': {},
+            'prohibited_sites': [],
+        }
+
+    tileconn = [
+        {
+            'grid_deltas': [1, 0],
+            'tile_types': ['T', 'T'],
+            'wire_pairs': [['E', 'W']],
+        }
+    ]
+    tile_wires = {'T': ['W', 'E', 'LOCAL']}
+
+    return NodeModel(
+        grid=Grid(None, tilegrid),
+        connections=Connections(tilegrid, tileconn, tile_wires),
+        tile_wires=tile_wires,
+        node_wires={
+            'specific_node_wires': ['T_X0Y0/W'],
+            'node_pattern_wires': {
+                'T': ['E']
+            },
+        },
+        progressbar=progressbar)
+
+
+class FakeDatabase(object):
+    """ The parts of Database used by get_node_model. """
+
+    def __init__(self, db_root):
+        self.db_root = db_root
+        self.part = 'part'
+        self.fabric = 'fabric'
+        self.built = 0
+
+    def grid(self):
+        return None
+
+    def node_model(self, progressbar):
+        self.built += 1
+        return make_node_model(progressbar)
+
+
+class TestNodeModel(TestCase):
+    def check_nodes(self, node_model):
+        expected_nodes = {
+            ('T_X0Y0', 'W'): [('T_X0Y0', 'W')],
+            ('T_X{}Y0'.format(N_TILES - 1), 'E'):
+            [('T_X{}Y0'.format(N_TILES - 1), 'E')],
+        }
+        for x in range(N_TILES):
+            tile = 'T_X{}Y0'.format(x)
+            expected_nodes[(tile, 'LOCAL')] = [(tile, 'LOCAL')]
+
+            if x + 1 < N_TILES:
+                expected_nodes[(tile, 'E')] = [
+                    (tile, 'E'), ('T_X{}Y0'.format(x + 1), 'W')
+                ]
+
+        self.assertEqual(set(node_model.get_nodes()), set(expected_nodes))
+        for node, wires in expected_nodes.items():
+            self.assertEqual(
+                sorted(node_model.get_wires_for_node(*node)), sorted(wires))
+            for wire in wires:
+                self.assertEqual(node_model.get_node_for_wire(*wire), node)
+
+        with self.assertRaises(KeyError):
+            node_model.get_wires_for_node('T_X1Y0', 'W')
+
+    def test_nodes(self):
+        self.check_nodes(make_node_model())
+
+    def test_tables(self):
+        tables = make_node_model().get_tables()
+        self.check_nodes(
+            NodeModel(
+                grid=None,
+                connections=None,
+                tile_wires=None,
+                node_wires=None,
+                tables=tables))
+
+    def test_get_node_model(self):
+        with TemporaryDirectory() as tmp, mock.patch.dict(
+                os.environ, {'XRAY_CACHE_DIR': os.path.join(tmp, 'cache')}):
+            db = FakeDatabase(tmp)
+            self.check_nodes(get_node_model(db))
+            self.assertEqual(db.built, 1)
+
+            node_model = get_node_model(db)
+            self.assertEqual(db.built, 1)
+            self.assertIsInstance(node_model.wire_node, np.memmap)
+            self.check_nodes(node_model)
+
+            # Files the node model is not built from do not invalidate it.
+            with open(os.path.join(tmp, 'segbits_t.db'), 'w') as f:
+                f.write('T.FEATURE 00_00\n')
+            self.check_nodes(get_node_model(db))
+            self.assertEqual(db.built, 1)
+
+            os.mkdir(os.path.join(tmp, 'fabric'))
+            with open(os.path.join(tmp, 'fabric', 'tileconn.json'), 'w') as f:
+                f.write('[]')
+            self.check_nodes(get_node_model(db))
+            self.assertEqual(db.built, 2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020  The Project X-Ray Authors.
+#
+# Use of this source code is governed by a ISC-style
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/ISC
+#
+# SPDX-License-Identifier: ISC
+
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main, mock
+
+import numpy as np
+
+from prjxray.connections import Connections
+from prjxray.grid import Grid
+from prjxray.node_model import NodeModel
+from prjxray.routing_graph import RoutingGraph, get_routing_graph
+from prjxray.tile import Pip, PipTiming
+
+N_TILES = 10
+
+TIMING = PipTiming(delays=None, drive_resistance=1, internal_capacitance=2)
+
+PIPS = (
+    Pip(
+        name='T.W->>LOCAL',
+        net_to='LOCAL',
+        net_from='W',
+        can_invert=True,
+        is_directional=True,
+        is_pseudo=False,
+        is_pass_transistor=False,
+        timing=TIMING,
+        backward_timing=None),
+    Pip(
+        name='T.LOCAL<<->>E',
+        net_to='E',
+        net_from='LOCAL',
+        can_invert=False,
+        is_directional=False,
+        is_pseudo=True,
+        is_pass_transistor=False,
+        timing=None,
+        backward_timing=TIMING),
+    Pip(
+        name='T.MISSING->>E',
+        net_to='E',
+        net_from='MISSING',
+        can_invert=False,
+        is_directional=True,
+        is_pseudo=False,
+        is_pass_transistor=False,
+        timing=None,
+        backward_timing=None),
+)
+
+
+class FakeTile(object):
+    def get_pips(self):
+        return PIPS
+
+
+class FakeDatabase(object):
+    """ Row of tiles, where wire E of a tile connects to wire W of the next
+    tile. """
+
+    def __init__(self, db_root):
+        self.db_root = db_root
+        self.part = 'part'
+        self.fabric = 'fabric'
+
+    def grid(self):
+        return None
+
+    def get_tile_type(self, tile_type):
+        assert tile_type == 'T'
+        return FakeTile()
+
+    def node_model(self, progressbar, use_cache=False):
+        tilegrid = {}
+        for x in range(N_TILES):
+            tilegrid['T_X{}Y0'.format(x)] = {
+                'type': 'T',
+                'grid_x': x,
+                'grid_y': 0,
+                'sites': {},
+                'prohibited_sites': [],
+            }
+
+        tileconn = [
+            {
+                'grid_deltas': [1, 0],
+                'tile_types': ['T', 'T'],
+                'wire_pairs': [['E', 'W']],
+            }
+        ]
+        tile_wires = {'T': ['W', 'E', 'LOCAL']}
+
+        return NodeModel(
+            grid=Grid(None, tilegrid),
+            connections=Connections(tilegrid, tileconn, tile_wires),
+            tile_wires=tile_wires,
+            node_wires={
+                'specific_node_wires': [],
+                'node_pattern_wires': {
+                    'T': ['E']
+                },
+            },
+            progressbar=progressbar)
+
+
+class TestRoutingGraph(TestCase):
+    def check_graph(self, graph):
+        node_model = graph.node_model
+
+        expected = set()
+        for x in range(N_TILES):
+            tile = 'T_X{}Y0'.format(x)
+            w = node_model.get_node_id(tile, 'W')
+            e = node_model.get_node_id(tile, 'E')
+            local = node_model.get_node_id(tile, 'LOCAL')
+
+            expected.add((w, local, tile, 'T.W->>LOCAL', True, False, False))
+            expected.add((local, e, tile, 'T.LOCAL<<->>E', False, True, False))
+            expected.add((e, local, tile, 'T.LOCAL<<->>E', False, True, True))
+
+        edges = set()
+        n_nodes = len(node_model.get_nodes())
+        for node in range(n_nodes):
+            self.assertEqual(
+                list(graph.get_successors(node)),
+                [graph.edge_dst[edge] for edge in graph.get_edges(node)])
+
+            for edge in graph.get_edges(node):
+                pip_tile, pip = graph.get_pip(edge)
+                edges.add(
+                    (
+                        node, graph.edge_dst[edge], pip_tile, pip,
+                        bool(graph.edge_can_invert[edge]),
+                        bool(graph.edge_is_pseudo[edge]),
+                        bool(graph.edge_is_backward[edge])))
+
+                if pip == 'T.W->>LOCAL' or graph.edge_is_backward[edge]:
+                    self.assertEqual(graph.get_pip_timing(edge), TIMING)
+                else:
+                    self.assertIsNone(graph.get_pip_timing(edge))
+
+        self.assertEqual(edges, expected)
+
+    def test_build(self):
+        db = FakeDatabase(None)
+        self.check_graph(RoutingGraph.build(db, db.node_model(None)))
+
+    def test_get_routing_graph(self):
+        with TemporaryDirectory() as tmp, mock.patch.dict(
+                os.environ, {'XRAY_CACHE_DIR': os.path.join(tmp, 'cache')}):
+            db = FakeDatabase(tmp)
+            self.check_graph(get_routing_graph(db))
+
+            graph = get_routing_graph(db)
+            self.assertIsInstance(graph.edge_dst, np.memmap)
+            self.check_graph(graph)
+
+
+if __name__ == '__main__':
+    main()
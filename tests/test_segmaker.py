@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020  The Project X-Ray Authors.
+#
+# Use of this source code is governed by a ISC-style
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/ISC
+#
+# SPDX-License-Identifier: ISC
+
+import contextlib
+import io
+import json
+import os
+import shutil
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main, mock
+
+from prjxray import db_snapshot
+from prjxray import segmaker
+
+TEST_DB = os.path.join(
+    os.path.dirname(__file__), '..', 'utils', 'test_data', 'db')
+TEST_FABRIC = 'xc7a200t'
+
+BITS = """\
+bit_00020503_004_07
+bit_00020503_005_01
+bit_00020503_007_00
+"""
+
+
+class TestSegmaker(TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+        env = mock.patch.dict(
+            os.environ,
+            {'XRAY_CACHE_DIR': os.path.join(self.tmp.name, 'cache')})
+        env.start()
+        self.addCleanup(env.stop)
+
+        self.bitsfile = os.path.join(self.tmp.name, 'design.bits')
+        with open(self.bitsfile, 'w') as f:
+            f.write(BITS)
+
+    def compile(self, use_cache):
+        with contextlib.redirect_stdout(io.StringIO()):
+            segmk = segmaker.Segmaker(
+                self.bitsfile,
+                db_root=TEST_DB,
+                fabric=TEST_FABRIC,
+                use_cache=use_cache)
+            segmk.add_site_tag('SLICE_X13Y102', 'AFF.ZINI', 1)
+            segmk.add_site_tag('SLICE_X13Y102', 'AFF.ZINI', 0)
+            segmk.add_site_tag('IOB_X0Y2', 'PULLTYPE.NONE', 1)
+            segmk.add_tile_tag('LIOB33_X0Y1', 'IN_USE', 0)
+            segmk.compile()
+
+        return segmk.segments_by_type
+
+    def test_compile(self):
+        segments_by_type = self.compile(use_cache=False)
+        tilegrid = segmaker.get_tile_table(TEST_DB, TEST_FABRIC).tilegrid
+        self.assertEqual(
+            list(segments_by_type),
+            list(dict.fromkeys(tile['type'] for tile in tilegrid.values())))
+
+        self.assertEqual(
+            segments_by_type['CLBLM_L'], {
+                '00020500_004': {
+                    'bits': {'03_07', '03_33'},
+                    'tags': {
+                        'CLB.SLICE_X1.AFF.ZINI': 0
+                    },
+                    'offset': 4,
+                    'words': 2,
+                    'frames': 36,
+                }
+            })
+        self.assertEqual(
+            segments_by_type['LIOB33']['00400000_002']['tags'], {
+                'IOB33.IN_USE': 0,
+                'IOB33.IOB_Y0.PULLTYPE.NONE': 1,
+            })
+        self.assertEqual(segments_by_type['INT_L'], {})
+
+        # The cached tile table gives the same result.
+        self.assertEqual(self.compile(use_cache=True), segments_by_type)
+        self.assertEqual(self.compile(use_cache=True), segments_by_type)
+
+    def test_tile_table_cache_key(self):
+        db_root = os.path.join(self.tmp.name, 'db')
+        shutil.copytree(TEST_DB, db_root)
+        path = db_snapshot.cache_path(db_root, TEST_FABRIC, 'segmaker_tiles')
+
+        table = segmaker.get_tile_table(db_root, TEST_FABRIC, use_cache=True)
+        stamp = os.stat(path).st_mtime_ns
+
+        # Only tilegrid.json is read, so other database files do not make the
+        # cached table stale.
+        with open(os.path.join(db_root, 'segbits_liob33.db'), 'a') as f:
+            f.write('LIOB33.IOB_Y0.UNUSED 00_65\n')
+        self.assertEqual(
+            segmaker.get_tile_table(db_root, TEST_FABRIC, use_cache=True),
+            table)
+        self.assertEqual(os.stat(path).st_mtime_ns, stamp)
+
+        tilegrid_file = os.path.join(db_root, TEST_FABRIC, 'tilegrid.json')
+        with open(tilegrid_file) as f:
+            tilegrid = json.load(f)
+        tile = next(iter(tilegrid))
+        del tilegrid[tile]
+        with open(tilegrid_file, 'w') as f:
+            json.dump(tilegrid, f)
+
+        table = segmaker.get_tile_table(db_root, TEST_FABRIC, use_cache=True)
+        self.assertNotIn(tile, table.tilegrid)
+
+    def test_names(self):
+        self.assertEqual(segmaker.normalize_tile_type('CLBLM_L'), 'CLB')
+        self.assertEqual(
+            segmaker.normalize_tile_type('RIOI3_TBYTESRC'), 'IOI3')
+        self.assertEqual(segmaker.site_key('SLICE_X12Y102'), 'SLICE_X0')
+        self.assertEqual(segmaker.site_key('RAMB18_X0Y41'), 'RAMB18_Y1')
+        self.assertEqual(segmaker.site_key('BUFR_X1Y3'), 'BUFR')
+        self.assertIsNone(segmaker.site_key('IOB_X0'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020  The Project X-Ray Authors.
+#
+# Use of this source code is governed by a ISC-style
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/ISC
+#
+# SPDX-License-Identifier: ISC
+
+import os
+import pickle
+from unittest import TestCase, main
+
+from prjxray.db import Database
+
+TEST_DB = os.path.join(
+    os.path.dirname(__file__), '..', 'utils', 'test_data', 'db')
+TEST_PART = 'xc7a200tffg1156-1'
+
+
+class TestSegmentMap(TestCase):
+    def setUp(self):
+        self.grid = Database(TEST_DB, TEST_PART).grid()
+        self.segment_map = self.grid.get_segment_map()
+        self.bits_infos = list(self.grid.iter_all_frames())
+
+    def check_frame(self, segment_map, frame):
+        def key(bits_info):
+            return (bits_info.tile, bits_info.block_type.value)
+
+        expected = [
+            bits_info for bits_info in self.bits_infos
+            if bits_info.bits.base_address <= frame <
+            bits_info.bits.base_address + bits_info.bits.frames
+        ]
+        self.assertEqual(
+            sorted(segment_map.segment_info_for_frame(frame), key=key),
+            sorted(expected, key=key))
+
+        for word in (0, 50, 100):
+            self.assertEqual(
+                sorted(
+                    segment_map.segment_info_for_word(frame, word), key=key),
+                sorted(
+                    (
+                        bits_info for bits_info in expected
+                        if bits_info.bits.offset <= word <
+                        bits_info.bits.offset + bits_info.bits.words),
+                    key=key))
+
+    def test_segment_info_for_frame(self):
+        for bits_info in self.bits_infos:
+            base_address = bits_info.bits.base_address
+            for frame in range(base_address - 1,
+                               base_address + bits_info.bits.frames + 1):
+                self.check_frame(self.segment_map, frame)
+
+    def test_pickle(self):
+        segment_map = pickle.loads(pickle.dumps(self.segment_map))
+        for frame in self.segment_map.frames:
+            self.check_frame(segment_map, frame)
+
+
+if __name__ == '__main__':
+    main()
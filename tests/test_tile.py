@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020  The Project X-Ray Authors.
+#
+# Use of this source code is governed by a ISC-style
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/ISC
+#
+# SPDX-License-Identifier: ISC
+
+import os
+from unittest import TestCase, main
+
+from prjxray.db import Database
+
+TEST_DB = os.path.join(
+    os.path.dirname(__file__), '..', 'utils', 'test_data', 'db')
+TEST_PART = 'xc7a200tffg1156-1'
+
+
+class TestTile(TestCase):
+    def setUp(self):
+        self.db = Database(TEST_DB, TEST_PART)
+
+    def check_wire_info(self, tile, allow_pseudo):
+        for wire in tile.get_wires():
+            sites = [
+                (site.name, site_pin.name)
+                for site in tile.get_sites()
+                for site_pin in site.site_pins
+                if site_pin.wire == wire
+            ]
+            pips = [
+                pip for pip in tile.get_pips()
+                if wire in (pip.net_to, pip.net_from) and (
+                    allow_pseudo or not pip.is_pseudo)
+            ]
+
+            wire_info = tile.get_wire_info(wire, allow_pseudo=allow_pseudo)
+            self.assertEqual(wire_info.sites, sites)
+            self.assertEqual(wire_info.pips, [pip.name for pip in pips])
+
+            adjacency = tile.get_wire_adjacency(
+                wire, allow_pseudo=allow_pseudo)
+            self.assertEqual(adjacency.sites, sites)
+            self.assertEqual(
+                adjacency.uphill_pips, [
+                    pip.name
+                    for pip in pips
+                    if pip.net_to == wire or not pip.is_directional
+                ])
+            self.assertEqual(
+                adjacency.downhill_pips, [
+                    pip.name
+                    for pip in pips
+                    if pip.net_from == wire or not pip.is_directional
+                ])
+
+    def test_get_wire_info(self):
+        tile = self.db.get_tile_type('HCLK_IOI3')
+        self.assertTrue(any(pip.is_pseudo for pip in tile.get_pips()))
+
+        # Both pseudo pip filters are cached separately.
+        for allow_pseudo in (False, True, False):
+            self.check_wire_info(tile, allow_pseudo)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020  The Project X-Ray Authors.
+#
+# Use of this source code is governed by a ISC-style
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/ISC
+#
+# SPDX-License-Identifier: ISC
+
+from unittest import TestCase, main
+
+from prjxray import bitstream
+from prjxray.grid_types import BlockType, Bits
+from prjxray.tile import TileDbs
+from prjxray.tile_segbits import TileSegbits, read_segbits
+
+SEGBITS = """
+TILE.A 00_00 01_33
+TILE.B 00_00 !01_33
+TILE.C !02_05
+TILE.D 03_63
+TILE.E[0] 00_01
+TILE.E[1] 00_02
+"""
+
+
+def make_bitdata(bits):
+    bitdata = {}
+    for frame, bitidx in bits:
+        if frame not in bitdata:
+            bitdata[frame] = set(), set()
+
+        bitdata[frame][0].add(bitidx // 32)
+        bitdata[frame][1].add(bitidx)
+
+    return bitdata
+
+
+class TestTileSegbits(TestCase):
+    def setUp(self):
+        self.segbits = TileSegbits(
+            TileDbs(
+                segbits=None,
+                block_ram_segbits=None,
+                ppips=None,
+                mask=None,
+                tile_type=None))
+        self.segbits.segbits[BlockType.CLB_IO_CLK] = read_segbits(
+            SEGBITS.strip().split('\n'))
+        self.bits = Bits(
+            base_address=0x100, frames=4, offset=2, words=2, alias=None)
+
+    def match(self, bits, **kwargs):
+        return sorted(
+            self.segbits.match_bitdata(
+                BlockType.CLB_IO_CLK, self.bits, make_bitdata(bits), **kwargs),
+            key=lambda match: match[1])
+
+    def test_match_empty(self):
+        self.assertEqual(self.match([]), [((), 'TILE.C')])
+
+    def test_match_bits(self):
+        self.assertEqual(
+            self.match([(0x100, 64), (0x101, 97), (0x103, 127)]), [
+                (((0x100, 64), (0x101, 97)), 'TILE.A'),
+                ((), 'TILE.C'),
+                (((0x103, 127), ), 'TILE.D'),
+            ])
+        self.assertEqual(
+            self.match([(0x100, 64), (0x100, 66), (0x102, 69)]), [
+                (((0x100, 64), ), 'TILE.B'),
+                (((0x100, 66), ), 'TILE.E[1]'),
+            ])
+
+    def test_match_frames(self):
+        bits = [(0x100, 64), (0x101, 97), (0x103, 127), (0x100, 66)]
+        self.assertEqual(
+            sorted(
+                self.segbits.match_bitdata(
+                    BlockType.CLB_IO_CLK, self.bits,
+                    bitstream.Frames.from_bitdata(make_bitdata(bits)))),
+            sorted(self.match(bits)))
+
+    def test_match_word_range(self):
+        self.assertEqual(
+            self.match([(0x100, 64), (0x101, 97)], word_range=(0, 1)),
+            [((), 'TILE.C')])
+
+    def test_candidates(self):
+        compiled = self.segbits.compile(BlockType.CLB_IO_CLK)
+        features = compiled.features
+
+        window = compiled.window_from_bitdata(self.bits, {})
+        self.assertEqual(
+            [features[idx] for idx in compiled.candidates(window)], ['TILE.C'])
+
+        window = compiled.window_from_bitdata(
+            self.bits, make_bitdata([(0x100, 64)]))
+        self.assertEqual(
+            [features[idx] for idx in compiled.candidates(window)],
+            ['TILE.A', 'TILE.B', 'TILE.C'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020  The Project X-Ray Authors.
+#
+# Use of this source code is governed by a ISC-style
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/ISC
+#
+# SPDX-License-Identifier: ISC
+
+import os
+import shutil
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+
+from prjxray import bitstream
+from prjxray.db import Database
+from prjxray.grid_types import BlockType
+from prjxray.tile_segbits_alias import TileSegbitsAlias
+
+TEST_DB = os.path.join(
+    os.path.dirname(__file__), '..', 'utils', 'test_data', 'db')
+TEST_PART = 'xc7a200tffg1156-1'
+TILE = 'LIOB33_SING_X0Y0'
+
+
+class TestTileSegbitsAlias(TestCase):
+    def setUp(self):
+        self.db = Database(TEST_DB, TEST_PART)
+        self.grid = self.db.grid()
+
+    def test_cached(self):
+        segbits = self.grid.get_tile_segbits_at_tilename(TILE)
+        self.assertIsInstance(segbits, TileSegbitsAlias)
+        self.assertIs(segbits, self.grid.get_tile_segbits_at_tilename(TILE))
+        self.assertIs(segbits.ppips, self.db.get_tile_ppips('LIOB33_SING'))
+
+    def test_uses_passed_bits(self):
+        gridinfo = self.grid.gridinfo_at_tilename(TILE)
+        segbits = self.grid.get_tile_segbits_at_tilename(TILE)
+
+        bits = gridinfo.bits[BlockType.CLB_IO_CLK]
+        moved_bits_map = {
+            BlockType.CLB_IO_CLK:
+            bits._replace(base_address=bits.base_address + 0x80)
+        }
+        fresh = TileSegbitsAlias(self.db, gridinfo.tile_type, moved_bits_map)
+
+        for feature in fresh.tile_segbits.segbits[BlockType.CLB_IO_CLK]:
+            feature = fresh.map_feature_from_segbits(feature)
+            self.assertEqual(
+                list(segbits.feature_to_bits(moved_bits_map, feature)),
+                list(fresh.feature_to_bits(moved_bits_map, feature)))
+
+    def test_match_below_word_zero(self):
+        # The LIOB33 alias of LIOB33_SING starts at word 2, so the window of
+        # the aliased tile starts 2 words before the tile.
+        with TemporaryDirectory() as tmp:
+            db_root = os.path.join(tmp, 'db')
+            shutil.copytree(TEST_DB, db_root)
+            with open(os.path.join(db_root, 'segbits_liob33.db'), 'a') as f:
+                f.write('LIOB33.IOB_Y0.ALIASED 00_65\n')
+
+            db = Database(db_root, TEST_PART)
+            grid = db.grid()
+            segbits = grid.get_tile_segbits_at_tilename(TILE)
+            bits = grid.gridinfo_at_tilename(TILE).bits[BlockType.CLB_IO_CLK]
+
+            frame = bits.base_address
+            frames = bitstream.Frames([frame])
+            frames.set_bit(frame, 1)
+            # Words at the end of the frame are not part of the window.
+            last_word = bitstream.FRAME_WORD_COUNT - 1
+            frames.set_bit(frame, last_word * bitstream.WORD_SIZE_BITS + 1)
+            frames.set_bit(frame, (last_word - 1) * bitstream.WORD_SIZE_BITS)
+
+            expected = [(((frame, 1), ), 'LIOB33_SING.IOB_Y0.ALIASED')]
+            for bitdata in (frames, frames.to_bitdata()):
+                matches = segbits.match_bitdata(
+                    BlockType.CLB_IO_CLK, bits, bitdata)
+                self.assertEqual(list(matches), expected)
+
+    def test_match_empty_feature(self):
+        # A feature without bits uses no words, so it is never outside of the
+        # aliased tile.
+        db = Database(TEST_DB, TEST_PART)
+        grid = db.grid()
+        segbits = grid.get_tile_segbits_at_tilename(TILE)
+        bits = grid.gridinfo_at_tilename(TILE).bits[BlockType.CLB_IO_CLK]
+
+        tile_segbits = segbits.tile_segbits
+        tile_segbits.segbits[BlockType.CLB_IO_CLK]['LIOB33.IOB_Y0.EMPTY'] = []
+        tile_segbits.compiled.pop(BlockType.CLB_IO_CLK, None)
+
+        frames = bitstream.Frames([bits.base_address])
+        expected = [((), 'LIOB33_SING.IOB_Y0.EMPTY')]
+        for bitdata in (frames, frames.to_bitdata()):
+            matches = segbits.match_bitdata(
+                BlockType.CLB_IO_CLK, bits, bitdata)
+            self.assertEqual(list(matches), expected)
+
+
+if __name__ == '__main__':
+    main()
@@ -13,7 +13,7 @@ from os import environ, getcwd, chdir, mkdir, environ
 import json
 from tempfile import TemporaryDirectory
 from contextlib import contextmanager
-from unittest import TestCase, main
+from unittest import TestCase, main, mock
 
 # Setup location of database file to a relative term so it can be generated
 # in the current subdirectory, which will be a temporary one, to allow concurent
@@ -21,7 +21,7 @@ from unittest import TestCase, main
 environ['XRAY_DATABASE_ROOT'] = '.'
 environ['XRAY_PART'] = 'xc7a200tffg1156-1'
 
-from prjxray.util import get_roi, get_db_root
+from prjxray.util import get_roi, get_db_root, get_env_flag, gen_sites_xy
 from prjxray.overlay import Overlay
 from prjxray.grid_types import GridLoc
 
@@ -80,6 +80,46 @@ class TestUtil(TestCase):
             self.assertListEqual(
                 list(get_roi().gen_sites()), [('ATILE', 'FOO', 'BAR')])
 
+    def test_get_roi_shared(self):
+        tilegrid = {
+            "ATILE": {
+                "grid_x": 10,
+                "grid_y": 10,
+                "sites": {
+                    "SLICE_X1Y2": "SLICEL"
+                },
+                "prohibited_sites": [],
+                "type": "CLBLL_L"
+            }
+        }
+        with setup_database(tilegrid):
+            roi = get_roi()
+            self.assertIs(get_roi().grid, roi.grid)
+            self.assertEqual(
+                list(gen_sites_xy(['SLICEL'])), [('SLICE_X1Y2', (1, 2))])
+
+            environ['XRAY_ROI_GRID_X1'] = '11'
+            try:
+                other_roi = get_roi()
+            finally:
+                del environ['XRAY_ROI_GRID_X1']
+            self.assertIs(other_roi.grid, roi.grid)
+            self.assertEqual(list(other_roi.gen_tiles()), [])
+
+    def test_get_env_flag(self):
+        for value, expected in (('1', True), ('Y', True), ('yes', True),
+                                ('0', False), ('n', False), ('off', False)):
+            with mock.patch.dict(environ, {'XRAY_TEST_FLAG': value}):
+                self.assertIs(get_env_flag('XRAY_TEST_FLAG'), expected)
+
+        with mock.patch.dict(environ, {'XRAY_TEST_FLAG': ''}):
+            self.assertFalse(get_env_flag('XRAY_TEST_FLAG'))
+            self.assertTrue(get_env_flag('XRAY_TEST_FLAG', default=True))
+
+        with mock.patch.dict(environ, {'XRAY_TEST_FLAG': 'maybe'}):
+            with self.assertRaises(ValueError):
+                get_env_flag('XRAY_TEST_FLAG')
+
     def test_in_roi_overlay(self):
         region_dict = {}
         region_dict['pr1'] = (10, 58, 0, 51)
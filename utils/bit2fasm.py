@@ -19,7 +19,7 @@ import fasm.output
 from prjxray import fasm_disassembler
 from prjxray import bitstream
 from prjxray.db import Database
-from prjxray.util import OpenSafeFile
+from prjxray.util import OpenSafeFile, add_bool_arg
 import subprocess
 import tempfile
 
@@ -37,16 +37,45 @@ def bit_to_bits(bitread, part_yaml, bit_file, bits_file, frame_range=None):
         shell=True)
 
 
-def bits_to_fasm(db_root, part, bits_file, verbose, canonical):
-    db = Database(db_root, part)
-    grid = db.grid()
-    disassembler = fasm_disassembler.FasmDisassembler(db)
+def bit_to_frames(part_json, bit_file, frame_range=None):
+    """ Decodes bit file (binary) or frm file (ASCII) without bitread.
+
+    Same output as bitread -z -y, returned as bitstream.Frames.
+    """
+    if bit_file.endswith('.frm'):
+        with OpenSafeFile(bit_file) as f:
+            frames = bitstream.load_frm_frames(f)
+    else:
+        with OpenSafeFile(bit_file, 'rb') as f:
+            frames = bitstream.load_bitstream_frames(
+                f, bitstream.get_part_frame_addresses(part_json))
+
+    if frame_range:
+        frame_range = bitstream.parse_frame_range(frame_range)
 
+    return bitstream.Frames.from_frames(frames, frame_range=frame_range)
+
+
+def bits_to_fasm(
+        db_root, part, bits_file, verbose, canonical, use_snapshot=False,
+        jobs=1):
     with OpenSafeFile(bits_file) as f:
-        bitdata = bitstream.load_bitdata(f)
+        bitdata = bitstream.Frames.load_bits(f)
+
+    bitdata_to_fasm(
+        db_root, part, bitdata, verbose, canonical, use_snapshot, jobs)
+
+
+def bitdata_to_fasm(
+        db_root, part, bitdata, verbose, canonical, use_snapshot=False,
+        jobs=1):
+    db = Database(db_root, part, use_snapshot=use_snapshot)
+    grid = db.grid()
+    disassembler = fasm_disassembler.FasmDisassembler(db)
 
     model = fasm.output.merge_and_sort(
-        disassembler.find_features_in_bitstream(bitdata, verbose=verbose),
+        disassembler.find_features_in_bitstream(
+            bitdata, verbose=verbose, jobs=jobs),
         zero_function=disassembler.is_zero_feature,
         sort_key=grid.tile_key,
     )
@@ -102,8 +131,36 @@ def main():
         action='store_true')
     parser.add_argument(
         '--canonical', help='Output canonical bitstream.', action='store_true')
+    add_bool_arg(
+        parser,
+        '--db-snapshot',
+        default=False,
+        help="Load the database from a cached binary snapshot (see "
+        "util.get_cache_dir), keyed on the size and modification time of "
+        "the database files")
+    parser.add_argument(
+        '--native',
+        help="Decode bit_file (.bit or .frm) in Python instead of bitread.",
+        action='store_true')
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=1,
+        help="Number of processes used to decode tiles.")
     args = parser.parse_args()
 
+    if args.native:
+        bitdata = bit_to_frames(
+            part_json=os.path.join(args.db_root, args.part, "part.json"),
+            bit_file=args.bit_file,
+            frame_range=args.frame_range,
+        )
+
+        bitdata_to_fasm(
+            args.db_root, args.part, bitdata, args.verbose, args.canonical,
+            args.db_snapshot, args.jobs)
+        return
+
     with contextlib.ExitStack() as stack:
         if args.bits_file:
             bits_file = stack.enter_context(open(args.bits_file, 'wb'))
@@ -120,7 +177,7 @@ def main():
 
         bits_to_fasm(
             args.db_root, args.part, bits_file.name, args.verbose,
-            args.canonical)
+            args.canonical, args.db_snapshot, args.jobs)
 
 
 if __name__ == '__main__':
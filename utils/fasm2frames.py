@@ -20,7 +20,7 @@ import csv
 
 from collections import defaultdict
 
-from prjxray import fasm_assembler, util
+from prjxray import fasm_assembler, feature_table, util
 from prjxray.db import Database
 from prjxray.roi import Roi
 from prjxray.util import OpenSafeFile
@@ -118,9 +118,15 @@ def run(
         sparse=False,
         roi=None,
         debug=False,
-        emit_pudc_b_pullup=False):
-    db = Database(db_root, part)
-    assembler = fasm_assembler.FasmAssembler(db)
+        emit_pudc_b_pullup=False,
+        use_snapshot=False):
+    db = Database(db_root, part, use_snapshot=use_snapshot)
+
+    table = None
+    if use_snapshot and part is not None:
+        table = feature_table.get_feature_table(db)
+
+    assembler = fasm_assembler.FasmAssembler(db, feature_table=table)
 
     set_features = set()
 
@@ -134,7 +140,8 @@ def run(
     bank_to_tile = defaultdict(lambda: set())
 
     if part is not None:
-        with OpenSafeFile(os.path.join(db_root, part, "package_pins.csv"), "r") as fp:
+        with OpenSafeFile(os.path.join(db_root, part, "package_pins.csv"),
+                          "r") as fp:
             reader = csv.DictReader(fp)
             package_pins = [l for l in reader]
 
@@ -293,6 +300,13 @@ def main():
         action='store_true')
     parser.add_argument(
         '--debug', action='store_true', help="Print debug dump")
+    util.add_bool_arg(
+        parser,
+        '--db-snapshot',
+        default=False,
+        help="Load the database from a cached binary snapshot (see "
+        "util.get_cache_dir), keyed on the size and modification time of "
+        "the database files")
     parser.add_argument('fn_in', help='Input FPGA assembly (.fasm) file')
     parser.add_argument(
         'fn_out',
@@ -309,7 +323,8 @@ def main():
         sparse=args.sparse,
         roi=args.roi,
         debug=args.debug,
-        emit_pudc_b_pullup=args.emit_pudc_b_pullup)
+        emit_pudc_b_pullup=args.emit_pudc_b_pullup,
+        use_snapshot=args.db_snapshot)
 
 
 if __name__ == '__main__':
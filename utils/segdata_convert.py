@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020  The Project X-Ray Authors.
+#
+# Use of this source code is governed by a ISC-style
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/ISC
+#
+# SPDX-License-Identifier: ISC
+'''
+Converts segdata text files to columnar segdata files, or back.
+
+segdata_<type>.txt is converted to segdata_<type>.npz next to it, with
+--to-text segdata_<type>.npz is converted to segdata_<type>.txt.
+'''
+
+import os
+
+from prjxray import columnar_segdata
+
+
+def run(files, to_text=False, verbose=False):
+    for file_name in files:
+        base, _ = os.path.splitext(file_name)
+        if to_text:
+            out_name = base + ".txt"
+            columnar_segdata.write_text(
+                out_name, columnar_segdata.read(file_name))
+        else:
+            out_name = base + ".npz"
+            columnar_segdata.write(
+                out_name, columnar_segdata.read_text(file_name))
+
+        if verbose:
+            print("%s -> %s" % (file_name, out_name))
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Convert segdata text files to columnar segdata files')
+    parser.add_argument('--verbose', action='store_true', help='')
+    parser.add_argument(
+        '--to-text',
+        action='store_true',
+        help='Convert columnar segdata files to text files')
+    parser.add_argument('files', nargs='+', help='Segdata files to convert')
+    args = parser.parse_args()
+
+    run(args.files, to_text=args.to_text, verbose=args.verbose)
+
+
+if __name__ == '__main__':
+    main()
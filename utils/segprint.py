@@ -16,7 +16,6 @@ Ex: BRAM_L_X6Y100:CLB_IO_CLK
 '''
 
 import sys, os, json, re
-import copy
 from prjxray import bitstream
 from prjxray import db as prjxraydb
 from prjxray.util import OpenSafeFile, parse_tagbit, db_root_arg, part_arg
@@ -79,30 +78,15 @@ def mk_segbits(seginfo, bitdata):
     Given a tile memory region (seginfo), return list of bits in that region
 
     seginfo: mk_segments()s object supplying address range
-    bitdata: all bits in the entire bitstream
+    bitdata: all bits in the entire bitstream (bitstream.Frames)
     '''
 
-    segbits = set()
-
     block = seginfo["block"]
-    baseaddr = int(block["baseaddr"], 0)
-    frames = block["frames"]
-    word_offset = block["offset"]
-    words = block["words"]
 
-    for frame in range(baseaddr, baseaddr + frames):
-        if frame not in bitdata:
-            continue
-        for wordidx in range(word_offset, word_offset + words):
-            if wordidx not in bitdata[frame]:
-                continue
-            for bitidx in bitdata[frame][wordidx]:
-                frame_addr = frame - baseaddr
-                bit_addr = 32 * (wordidx - word_offset) + bitidx
-                #segbits.add( "%02d_%02d" % (frame_addr, word_addr))
-                segbits.add((frame_addr, bit_addr))
-
-    return segbits
+    return set(
+        bitdata.iter_window_bits(
+            int(block["baseaddr"], 0), block["frames"], block["offset"],
+            block["words"]))
 
 
 def gen_tilegrid_masks(tiles):
@@ -121,27 +105,23 @@ def print_unknown_bits(tiles, bitdata):
     Print bits not covered by known tiles
 
     tiles: tilegrid json
-    bitdata[addr][word] = set of bit indices (0 to 31)
+    bitdata: all bits in the entire bitstream (bitstream.Frames)
     '''
-    # Start with an open set and remove elements as we find them
-    tocheck = copy.deepcopy(bitdata)
+    # Start with all bits and clear the words covered by tiles
+    tocheck = bitstream.Frames(bitdata.addresses, bitdata.words.copy())
 
     for addr_min, addr_max_p1, word_min, word_max_p1 in gen_tilegrid_masks(
             tiles):
         for addr in range(addr_min, addr_max_p1):
-            if addr not in tocheck:
+            words = tocheck.frame_words(addr)
+            if words is None:
                 continue
-            for word in range(word_min, word_max_p1):
-                if word not in tocheck[addr]:
-                    continue
-                del tocheck[addr][word]
+            words[word_min:word_max_p1] = 0
 
     # print uncovered locations
     print('Non-database bits:')
-    for frame in sorted(tocheck.keys()):
-        for wordidx in sorted(tocheck[frame].keys()):
-            for bitidx in sorted(tocheck[frame][wordidx]):
-                print("bit_%08x_%03d_%02d" % (frame, wordidx, bitidx))
+    for frame, wordidx, bitidx in tocheck.iter_bits():
+        print("bit_%08x_%03d_%02d" % (frame, wordidx, bitidx))
 
 
 def tagmatch(entry, segbits):
@@ -450,7 +430,7 @@ def run(
     tiles = load_tiles(db_root, part)
     segments = mk_segments(tiles)
     with OpenSafeFile(bits_file) as f:
-        bitdata = bitstream.load_bitdata2(f)
+        bitdata = bitstream.Frames.load_bits(f)
 
     if flag_unknown_bits:
         print_unknown_bits(tiles, bitdata)
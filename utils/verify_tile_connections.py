@@ -11,56 +11,51 @@
 from __future__ import print_function
 import prjxray.db
 import prjxray.lib
+from prjxray.node_model import group_wires
 import argparse
 import datetime
 import progressbar
 import multiprocessing
 import pyjson5 as json5
 import json
+import numpy as np
 import sys
 from prjxray.util import OpenSafeFile, db_root_arg, part_arg
 
 
-def full_wire_name(wire_in_grid):
-    return '{}/{}'.format(wire_in_grid.tile, wire_in_grid.wire)
-
-
-def make_connection(wires, connection):
-    wire_a = full_wire_name(connection.wire_a)
-    wire_b = full_wire_name(connection.wire_b)
-
-    if wire_a not in wires:
-        wires[wire_a] = set((wire_a, ))
-
-    if wire_b not in wires:
-        wires[wire_b] = set((wire_b, ))
-
-    wire_a_set = wires[wire_a]
-    wire_b_set = wires[wire_b]
-
-    if wire_a_set is wire_b_set:
-        return
-
-    wire_a_set |= wire_b_set
-
-    for wire in wire_a_set:
-        wires[wire] = wire_a_set
-
-
 def make_connections(db_root, part):
     db = prjxray.db.Database(db_root, part)
     c = db.connections()
 
-    wires = {}
-    for connection in c.get_connections():
-        make_connection(wires, connection)
+    def iter_connected_pkeys():
+        for connection in c.get_connection_arrays():
+            yield (
+                c.wire_pkeys(connection.tile_a, connection.wire_a),
+                c.wire_pkeys(connection.tile_b, connection.wire_b))
+
+    wire_pkeys, node_starts, node_ends = group_wires(
+        int(c.tile_wire_base[-1]), iter_connected_pkeys())
+
+    # Only wires with connections are part of the generated nodes.
+    connected = node_ends - node_starts > 1
+    node_starts = node_starts[connected].tolist()
+    node_ends = node_ends[connected].tolist()
+
+    wire_tiles = np.searchsorted(
+        c.tile_wire_base, wire_pkeys, side='right') - 1
+    wire_indices = (wire_pkeys - c.tile_wire_base[wire_tiles]).tolist()
+    wire_tiles = wire_tiles.tolist()
 
-    nodes = {}
+    def full_wire_name(idx):
+        tile = c.tiles[wire_tiles[idx]]
+        wire = c.tile_type_wires[c.grid[tile]['type']][wire_indices[idx]]
+        return '{}/{}'.format(tile, wire)
 
-    for wire_node in wires.values():
-        nodes[id(wire_node)] = wire_node
+    nodes = []
+    for start, end in zip(node_starts, node_ends):
+        nodes.append(set(full_wire_name(idx) for idx in range(start, end)))
 
-    return nodes.values()
+    return nodes
 
 
 def read_json5(fname):